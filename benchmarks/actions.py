@@ -0,0 +1,190 @@
+"""
+Microbenchmarks of the built-in actions: each one runs alone through an `ActionContext` over
+synthetic documents of growing size, for several JSONPath shapes, reporting time and memory.
+
+    python -m benchmarks.actions
+    python -m benchmarks.actions --actions redact pseudonymize_email --sizes 1KB 1MB 50MB
+    python -m benchmarks.actions --baseline benchmarks/results/actions-<earlier run>.json
+
+Once a combination takes longer than --budget seconds, its larger sizes are skipped.
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import os
+import platform
+import statistics
+import time
+import tracemalloc
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+from starlette.datastructures import MutableHeaders
+
+import guardette.default_actions  # noqa: F401
+from benchmarks.load import git_commit
+from benchmarks.payloads import items_document
+from guardette.actions import Action, ActionContext, action_registry
+from guardette.config import ConfigManager
+from guardette.datastructures import ProxyRequest, ProxyResponse
+from guardette.secrets import ConfigSecretsManager
+from guardette.version import VERSION
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# pattern -> JSONPath template, `{field}` being the field the action targets
+PATTERNS = {
+    "wildcard": "$.items[*].{field}",
+    "recursive": "$..{field}",
+    "filter": "$.items[?(@.state == 'open')].{field}",
+}
+
+# action kind -> (targeted field, extra settings)
+ACTIONS: dict[str, tuple[str, dict[str, Any]]] = {
+    "redact": ("body", {}),
+    "nullify": ("body", {}),
+    "remove": ("body", {}),
+    "redact_regex": ("body", {"regex_pattern": r"\b(token|customer)\b"}),
+    "filter_regex": ("body", {"regex_pattern": r"\b\w{6,}\b", "delimiter": " "}),
+    "redact_secrets": ("body", {}),
+    "pseudonymize_email": ("email", {}),
+}
+
+DEFAULT_SIZES = ("1KB", "100KB", "1MB", "10MB", "50MB")
+
+_UNITS = {"KB": 1024, "MB": 1024**2, "GB": 1024**3}
+
+
+def parse_size(value: str) -> int:
+    value = value.strip().upper()
+    for unit, factor in _UNITS.items():
+        if value.endswith(unit):
+            return int(float(value.removesuffix(unit)) * factor)
+    return int(value)
+
+
+def make_action(kind: str, pattern: str) -> Action:
+    field, settings = ACTIONS[kind]
+    return action_registry.get_action_cls(kind).model_validate(
+        {"json_paths": [PATTERNS[pattern].format(field=field)], **settings}
+    )
+
+
+def make_context(config: ConfigManager, json_data: Any) -> ActionContext:
+    return ActionContext(
+        config=config,
+        secrets=ConfigSecretsManager(config),
+        request=ProxyRequest(url="http://benchmark", headers=MutableHeaders(), json_data=None),
+        response=ProxyResponse(status_code=200, headers=MutableHeaders(), json_data=json_data),
+    )
+
+
+async def run_once(action: Action, config: ConfigManager, document: Any, trace_memory: bool) -> tuple[float, int]:
+    """Runs the action on a fresh copy of `document`, returning (seconds, peak bytes allocated)."""
+    ctx = make_context(config, copy.deepcopy(document))
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    await action.response(ctx)
+    elapsed = time.perf_counter() - start
+    peak = 0
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return elapsed, peak
+
+
+async def bench(args: argparse.Namespace) -> list[dict]:
+    config = ConfigManager()
+    documents = {size: items_document(size) for size in args.sizes}
+    results = []
+    for kind in args.actions:
+        for pattern in args.patterns:
+            action = make_action(kind, pattern)
+            # Warm-up: compiles and caches the JSONPath expression.
+            await run_once(action, config, items_document(1024), trace_memory=False)
+            over_budget = False
+            for size, document in documents.items():
+                result = {"action": kind, "pattern": pattern, "size_bytes": size, "items": len(document["items"])}
+                if over_budget:
+                    results.append({**result, "skipped": True})
+                    continue
+                timings = [
+                    (await run_once(action, config, document, trace_memory=False))[0] for _ in range(args.repeat)
+                ]
+                _, peak = await run_once(action, config, document, trace_memory=True)
+                median = statistics.median(timings)
+                result |= {
+                    "min_ms": round(min(timings) * 1000, 3),
+                    "median_ms": round(median * 1000, 3),
+                    "mb_per_sec": round(size / 1024**2 / median, 2) if median else None,
+                    "peak_alloc_bytes": peak,
+                }
+                print(
+                    f"{kind:<20} {pattern:<10} {size:>10} B  median {result['median_ms']:>10} ms  "
+                    f"{result['mb_per_sec']} MB/s  peak alloc {peak / 1024**2:.1f} MiB"
+                )
+                results.append(result)
+                over_budget = median > args.budget
+    return results
+
+
+def compare(results: list[dict], baseline_path: Path):
+    baseline = {
+        (r["action"], r["pattern"], r["size_bytes"]): r
+        for r in json.loads(baseline_path.read_text())["results"]
+        if not r.get("skipped")
+    }
+    print(f"\nCompared to {baseline_path}:")
+    for result in results:
+        before = baseline.get((result["action"], result["pattern"], result["size_bytes"]))
+        if before is None or result.get("skipped"):
+            continue
+        changes = [
+            f"{key} {(result[key] - before[key]) / before[key]:+.1%}"
+            for key in ("median_ms", "peak_alloc_bytes")
+            if before.get(key)
+        ]
+        print(f"{result['action']:<20} {result['pattern']:<10} {result['size_bytes']:>10} B  {'  '.join(changes)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--actions", nargs="+", choices=list(ACTIONS), default=list(ACTIONS))
+    parser.add_argument("--patterns", nargs="+", choices=list(PATTERNS), default=list(PATTERNS))
+    parser.add_argument("--sizes", nargs="+", type=parse_size, default=list(map(parse_size, DEFAULT_SIZES)))
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per combination")
+    parser.add_argument("--budget", type=float, default=10.0, help="Seconds per run before larger sizes are skipped")
+    parser.add_argument("--output", type=Path, help="Defaults to benchmarks/results/actions-<timestamp>.json")
+    parser.add_argument("--baseline", type=Path, help="Earlier results to compare against")
+    args = parser.parse_args()
+    args.sizes = sorted(args.sizes)
+    os.environ.setdefault("CLIENT_SECRET", "benchmark")
+    os.environ.setdefault("PSEUDONYMIZE_SALT", "benchmark")
+
+    results = asyncio.run(bench(args))
+
+    now = datetime.now(UTC)
+    output = args.output or ROOT / "benchmarks" / "results" / f"actions-{now:%Y%m%dT%H%M%SZ}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    report = {
+        "guardette_version": VERSION,
+        "commit": git_commit(),
+        "timestamp": now.isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "results": results,
+    }
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\nResults saved to {output}")
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
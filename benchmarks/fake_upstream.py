@@ -0,0 +1,59 @@
+"""
+A local upstream serving synthetic GitHub, Jira and GitLab payloads with a configurable latency and size.
+
+    python -m benchmarks.fake_upstream --port 8901 --latency-ms 20 --size-kb 64
+
+`latency_ms` and `size_kb` query parameters override the defaults per request.
+"""
+
+import argparse
+import asyncio
+from functools import cache
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+from benchmarks.payloads import sized
+
+ROUTES = {
+    "github": "/repos/{owner}/{repo}/issues",
+    "jira": "/rest/api/3/search",
+    "gitlab": "/api/v4/projects/{id}/merge_requests",
+}
+
+
+@cache
+def _payload(kind: str, size_kb: int) -> bytes:
+    return sized(kind, size_kb * 1024)
+
+
+def make_app(latency_ms: float = 0.0, size_kb: int = 16) -> Starlette:
+    def endpoint(kind: str):
+        async def serve(request: Request) -> Response:
+            delay = float(request.query_params.get("latency_ms", latency_ms)) / 1000
+            if delay:
+                await asyncio.sleep(delay)
+            body = _payload(kind, int(request.query_params.get("size_kb", size_kb)))
+            return Response(body, media_type="application/json")
+
+        return serve
+
+    return Starlette(routes=[Route(path, endpoint(kind)) for kind, path in ROUTES.items()])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--size-kb", type=int, default=16)
+    args = parser.parse_args()
+
+    uvicorn.run(make_app(args.latency_ms, args.size_kb), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+End-to-end load benchmark: runs `main:app` against a local fake upstream for several policy
+profiles and reports throughput, latency percentiles and memory use.
+
+    python -m benchmarks.load --concurrency 32 --duration 10 --size-kb 64
+    python -m benchmarks.load --baseline benchmarks/results/previous.json
+
+Every profile gets a fresh Guardette process, so their RSS figures don't mix.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+import httpx
+import yaml
+
+from benchmarks.fake_upstream import ROUTES
+from guardette.version import VERSION
+
+ROOT = Path(__file__).resolve().parent.parent
+CLIENT_SECRET = "benchmark"  # noqa: S105
+
+PATHS = {
+    "github": "/repos/octo/repo/issues",
+    "jira": "/rest/api/3/search",
+    "gitlab": "/api/v4/projects/1/merge_requests",
+}
+
+# profile -> endpoint -> actions
+PROFILES: dict[str, dict[str, list[dict[str, Any]]]] = {
+    "noop": {"github": [], "jira": [], "gitlab": []},
+    "redact": {
+        "github": [{"kind": "redact", "json_paths": ["$[*].title", "$[*].body"]}],
+        "jira": [{"kind": "redact", "json_paths": ["$.issues[*].fields.summary", "$.issues[*].fields.description"]}],
+        "gitlab": [{"kind": "redact", "json_paths": ["$[*].title", "$[*].description"]}],
+    },
+    "pseudonymize_email": {
+        "github": [{"kind": "pseudonymize_email", "json_paths": ["$[*].user.email", "$[*].assignees[*].email"]}],
+        "jira": [{"kind": "pseudonymize_email", "json_paths": ["$..email"]}],
+        "gitlab": [{"kind": "pseudonymize_email", "json_paths": ["$[*].author.email", "$[*].reviewers[*].email"]}],
+    },
+    "redact_secrets": {
+        "github": [{"kind": "redact_secrets", "json_paths": ["$[*].body"]}],
+        "jira": [{"kind": "redact_secrets", "json_paths": ["$.issues[*].fields.description"]}],
+        "gitlab": [{"kind": "redact_secrets", "json_paths": ["$[*].description"]}],
+    },
+}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def make_policy(profile: str, upstream_host: str) -> dict[str, Any]:
+    return {
+        "version": "1",
+        "sources": [
+            {
+                "host": upstream_host,
+                "scheme": "http",
+                "rules": [
+                    {"route": f"GET {ROUTES[endpoint]}", "actions": actions}
+                    for endpoint, actions in PROFILES[profile].items()
+                ],
+            }
+        ],
+    }
+
+
+def rss_bytes(pid: int) -> dict[str, int | None]:
+    """Current and peak resident memory of a process (Linux only; None elsewhere)."""
+    result: dict[str, int | None] = {"rss_bytes": None, "peak_rss_bytes": None}
+    try:
+        status = Path(f"/proc/{pid}/status").read_text()
+    except OSError:
+        return result
+    for line in status.splitlines():
+        key, _, value = line.partition(":")
+        if key in ("VmRSS", "VmHWM"):
+            result["rss_bytes" if key == "VmRSS" else "peak_rss_bytes"] = int(value.split()[0]) * 1024
+    return result
+
+
+@contextmanager
+def process(args: list[str], env: dict[str, str] | None = None):
+    proc = subprocess.Popen(args, cwd=ROOT, env={**os.environ, **(env or {})})  # noqa: S603
+    try:
+        yield proc
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def wait_ready(url: str, headers: dict[str, str] | None = None, timeout_secs: float = 30.0):
+    deadline = time.monotonic() + timeout_secs
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, headers=headers, timeout=1).status_code < 500:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout_secs}s")
+
+
+def percentile(sorted_values: list[float], q: float) -> float | None:
+    if not sorted_values:
+        return None
+    return sorted_values[max(math.ceil(q * len(sorted_values)) - 1, 0)]
+
+
+async def drive(base_url: str, path: str, headers: dict[str, str], concurrency: int, duration: float) -> dict:
+    """Sends requests from `concurrency` workers for `duration` seconds, each as soon as its last one finished."""
+    latencies: list[float] = []
+    errors = 0
+
+    async def worker(client: httpx.AsyncClient, deadline: float):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                response = await client.get(path, headers=headers)
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            if response.status_code != 200:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*[worker(client, deadline) for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        **{
+            f"p{int(q * 100)}_ms": round(value * 1000, 2) if (value := percentile(latencies, q)) is not None else None
+            for q in (0.5, 0.95, 0.99)
+        },
+    }
+
+
+def run_profile(profile: str, upstream_host: str, args: argparse.Namespace) -> list[dict]:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    headers = {"Authorization": CLIENT_SECRET, "X-Guardette-Host": upstream_host}
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        policy_path = Path(tmp) / "policy.yml"
+        policy_path.write_text(yaml.safe_dump(make_policy(profile, upstream_host)))
+        env = {
+            "GUARDETTE_POLICY_PATH": str(policy_path),
+            "CLIENT_SECRET": CLIENT_SECRET,
+            "PSEUDONYMIZE_SALT": "benchmark",
+            "LOG_LEVEL": "WARNING",
+            "PYTHONPATH": os.pathsep.join([str(ROOT / "src"), os.environ.get("PYTHONPATH", "")]),
+        }
+        server = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"]
+        with process(server, env) as proc:
+            wait_ready(f"{base_url}/_guardette/meta", headers={"Authorization": CLIENT_SECRET})
+            for endpoint in args.endpoints:
+                path = f"{PATHS[endpoint]}?size_kb={args.size_kb}&latency_ms={args.latency_ms}"
+                if args.warmup:
+                    asyncio.run(drive(base_url, path, headers, args.concurrency, args.warmup))
+                stats = asyncio.run(drive(base_url, path, headers, args.concurrency, args.duration))
+                result = {"profile": profile, "endpoint": endpoint, **stats, **rss_bytes(proc.pid)}
+                print(
+                    f"{profile:<20} {endpoint:<8} {result['rps']:>9} rps  p50 {result['p50_ms']} ms  "
+                    f"p95 {result['p95_ms']} ms  p99 {result['p99_ms']} ms  errors {result['errors']}"
+                )
+                results.append(result)
+    return results
+
+
+def compare(results: list[dict], baseline_path: Path):
+    baseline = {(r["profile"], r["endpoint"]): r for r in json.loads(baseline_path.read_text())["results"]}
+    print(f"\nCompared to {baseline_path}:")
+    for result in results:
+        before = baseline.get((result["profile"], result["endpoint"]))
+        if before is None:
+            continue
+        changes = [
+            f"{key} {(result[key] - before[key]) / before[key]:+.1%}"
+            for key in ("rps", "p50_ms", "p95_ms", "p99_ms", "peak_rss_bytes")
+            if before.get(key) and result.get(key) is not None
+        ]
+        print(f"{result['profile']:<20} {result['endpoint']:<8} {'  '.join(changes)}")
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],  # noqa: S607
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", nargs="+", choices=list(PROFILES), default=list(PROFILES))
+    parser.add_argument("--endpoints", nargs="+", choices=list(PATHS), default=list(PATHS))
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per profile and endpoint")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds of unmeasured load beforehand")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latency of the fake upstream")
+    parser.add_argument("--size-kb", type=int, default=64, help="Size of the fake upstream's responses")
+    parser.add_argument("--output", type=Path, help="Defaults to benchmarks/results/<timestamp>.json")
+    parser.add_argument("--baseline", type=Path, help="Earlier results to compare against")
+    args = parser.parse_args()
+
+    upstream_port = free_port()
+    upstream_host = f"127.0.0.1:{upstream_port}"
+    results = []
+    upstream = [sys.executable, "-m", "benchmarks.fake_upstream", "--port", str(upstream_port)]
+    with process(upstream):
+        wait_ready(f"http://{upstream_host}{PATHS['jira']}")
+        for profile in args.profiles:
+            results.extend(run_profile(profile, upstream_host, args))
+
+    now = datetime.now(UTC)
+    output = args.output or ROOT / "benchmarks" / "results" / f"{now:%Y%m%dT%H%M%SZ}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    report = {
+        "guardette_version": VERSION,
+        "commit": git_commit(),
+        "timestamp": now.isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "results": results,
+    }
+    output.write_text(json.dumps(report, indent=2, default=str))
+    print(f"\nResults saved to {output}")
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+Replays exchanges recorded with `RECORD_FILE` against the current build: the recorded upstream
+responses are served from local stubs, and the recorded client requests are sent again through a
+fresh `main:app` running the given policy, at the recorded pace or faster.
+
+    python -m benchmarks.replay exchanges.jsonl --policy policy.yml
+    python -m benchmarks.replay exchanges.jsonl --policy policy.yml --speed 10
+    python -m benchmarks.replay exchanges.jsonl --policy policy.yml --speed 0 --concurrency 32
+    python -m benchmarks.replay exchanges.jsonl --policy policy.yml --baseline benchmarks/results/replay-<earlier>.json
+
+Each response is checked against the recorded status, and against the earlier run's with --baseline.
+Digests are only checked for exchanges recorded with RECORD_RAW_BODIES (otherwise the recorded upstream
+bodies already went through the actions, and the replay runs them again) and answered from a buffered
+response, and only match if PSEUDONYMIZE_SALT is the one they were recorded with. Stubs answer streamed
+and passthrough responses, recorded by size, with a whitespace-padded `{}` of that size. Source `auth`
+is dropped from the replayed policy, as stubs take no credentials.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from collections.abc import Iterable
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlsplit
+
+import httpx
+import uvicorn
+import yaml
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+from benchmarks.load import CLIENT_SECRET, ROOT, free_port, git_commit, percentile, process, rss_bytes, wait_ready
+from guardette.recording import body_digest, decode_body
+from guardette.version import VERSION
+
+STUB_METHODS = ["GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"]
+
+# Recorded client headers not sent again: the replay client negotiates its own encoding, and the
+# responses are compared in full rather than revalidated.
+SKIPPED_REQUEST_HEADERS = {"accept-encoding", "host", "if-none-match", "if-modified-since"}
+
+
+def load_exchanges(path: Path) -> list[dict[str, Any]]:
+    with path.open() as f:
+        return sorted((json.loads(line) for line in f if line.strip()), key=lambda e: e["time"])
+
+
+def upstream_responses(exchanges: Iterable[dict[str, Any]]) -> dict[str, dict[tuple[str, str, str], dict]]:
+    """host -> (method, path, query) -> the last upstream response recorded for it."""
+    responses: dict[str, dict[tuple[str, str, str], dict]] = {}
+    for exchange in exchanges:
+        upstream = exchange["upstream"]
+        if upstream is None:
+            continue
+        url = urlsplit(upstream["url"])
+        key = (exchange["request"]["method"], url.path, url.query)
+        responses.setdefault(exchange["request"]["host"], {})[key] = upstream
+    return responses
+
+
+def stub_body(upstream: dict[str, Any]) -> bytes:
+    """The recorded body, or for responses recorded by size, an empty JSON object padded to that size."""
+    if "size" not in upstream:
+        return decode_body(upstream)
+    size = upstream["size"]
+    return b"{" + b" " * (size - 2) + b"}" if size >= 2 else b" " * size
+
+
+def make_stub(responses: dict[tuple[str, str, str], dict], latency: bool) -> Starlette:
+    async def serve(request: Request) -> Response:
+        upstream = responses.get((request.method, request.url.path, request.url.query))
+        if upstream is None:
+            return Response(b'{"message": "Not recorded"}', status_code=404, media_type="application/json")
+        if latency and upstream["elapsed_ms"]:
+            await asyncio.sleep(upstream["elapsed_ms"] / 1000)
+        return Response(stub_body(upstream), status_code=upstream["status_code"], headers=upstream["headers"])
+
+    return Starlette(routes=[Route("/{path:path}", serve, methods=STUB_METHODS)])
+
+
+async def serve_stubs(recording: Path, ports: dict[str, int], latency: bool):
+    responses = upstream_responses(load_exchanges(recording))
+    servers = [
+        uvicorn.Server(uvicorn.Config(make_stub(responses.get(host, {}), latency), port=port, log_level="warning"))
+        for host, port in ports.items()
+    ]
+    await asyncio.gather(*[server.serve() for server in servers])
+
+
+def make_policy(policy_path: Path, stub_hosts: dict[str, str]) -> dict[str, Any]:
+    policy = yaml.safe_load(policy_path.read_text())
+    for source in policy["sources"]:
+        if source["host"] in stub_hosts:
+            source["host"] = stub_hosts[source["host"]]
+            source["scheme"] = "http"
+            source.pop("auth", None)
+    return policy
+
+
+async def drive(
+    base_url: str,
+    exchanges: list[dict[str, Any]],
+    stub_hosts: dict[str, str],
+    speed: float,
+    concurrency: int,
+) -> list[dict[str, Any]]:
+    """Sends every recorded request at its recorded offset divided by `speed` (0: as fast as possible)."""
+    results: list[dict[str, Any]] = [{} for _ in exchanges]
+    semaphore = asyncio.Semaphore(concurrency)
+    first = exchanges[0]["time"] if exchanges else 0.0
+
+    async def send(client: httpx.AsyncClient, index: int, exchange: dict[str, Any], start: float):
+        request = exchange["request"]
+        if speed:
+            await asyncio.sleep(max(start + (exchange["time"] - first) / speed - time.perf_counter(), 0))
+        headers = {k: v for k, v in request["headers"].items() if k not in SKIPPED_REQUEST_HEADERS}
+        headers |= {"Authorization": CLIENT_SECRET, "X-Guardette-Host": stub_hosts[request["host"]]}
+        async with semaphore:
+            sent = time.perf_counter()
+            try:
+                response = await client.request(
+                    request["method"],
+                    request["path"],
+                    params=request["query"] or None,
+                    headers=headers,
+                    content=decode_body(request) or None,
+                )
+            except httpx.HTTPError as e:
+                results[index] = {"index": index, "error": str(e)}
+                return
+            latency = time.perf_counter() - sent
+        results[index] = {
+            "index": index,
+            "status_code": response.status_code,
+            "sha256": body_digest(response.content),
+            "latency_ms": round(latency * 1000, 3),
+        }
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*[send(client, i, exchange, start) for i, exchange in enumerate(exchanges)])
+    return results
+
+
+def recorded_result(index: int, exchange: dict[str, Any]) -> dict[str, Any]:
+    """`exchange` as recorded, in the form of a replay result."""
+    result = {"index": index, "latency_ms": exchange["elapsed_ms"], **exchange["response"]}
+    if not exchange.get("raw_bodies"):
+        # The recorded upstream body already went through the actions, which the replay runs again.
+        result["sha256"] = None
+    return result
+
+
+def summarize(results: list[dict], expected: list[dict]) -> dict[str, Any]:
+    """
+    Latency percentiles of `results`, and the indices whose response differs from `expected`: by status,
+    and by digest where `expected` has one.
+    """
+    latencies = sorted(r["latency_ms"] for r in results if "latency_ms" in r)
+    mismatches = [
+        r["index"]
+        for r, e in zip(results, expected, strict=True)
+        if "error" in r
+        or r["status_code"] != e.get("status_code")
+        or (e.get("sha256") is not None and r["sha256"] != e["sha256"])
+    ]
+    return {
+        "requests": len(results),
+        "errors": sum("error" in r for r in results),
+        "mismatches": len(mismatches),
+        "mismatched_indices": mismatches[:100],
+        "unchecked_digests": sum(e.get("sha256") is None for e in expected),
+        **{f"p{int(q * 100)}_ms": percentile(latencies, q) for q in (0.5, 0.95, 0.99)},
+    }
+
+
+def report_line(label: str, summary: dict[str, Any]) -> str:
+    return (
+        f"{label:<10} {summary['requests']:>7} requests  p50 {summary['p50_ms']} ms  p95 {summary['p95_ms']} ms  "
+        f"p99 {summary['p99_ms']} ms  errors {summary['errors']}  mismatches {summary['mismatches']}  "
+        f"unchecked digests {summary['unchecked_digests']}"
+    )
+
+
+def replay(args: argparse.Namespace, exchanges: list[dict[str, Any]]) -> tuple[list[dict], dict[str, int | None]]:
+    """Starts the stubs and a Guardette process, replays `exchanges` through it and returns the results and its RSS."""
+    ports = {host: free_port() for host in {e["request"]["host"] for e in exchanges}}
+    stub_hosts = {host: f"127.0.0.1:{port}" for host, port in ports.items()}
+    stub = [sys.executable, "-m", "benchmarks.replay", str(args.recording)]
+    stub += ["--stub-ports", ",".join(f"{h}={p}" for h, p in ports.items())]
+    if args.no_upstream_latency:
+        stub.append("--no-upstream-latency")
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory() as tmp, process(stub):
+        policy_path = Path(tmp) / "policy.yml"
+        policy_path.write_text(yaml.safe_dump(make_policy(args.policy, stub_hosts)))
+        env = {
+            "GUARDETTE_POLICY_PATH": str(policy_path),
+            "CLIENT_SECRET": CLIENT_SECRET,
+            "SECRET_MANAGER": "default",
+            "RECORD_FILE": "",
+            "LOG_LEVEL": "WARNING",
+            "PYTHONPATH": os.pathsep.join([str(ROOT / "src"), os.environ.get("PYTHONPATH", "")]),
+        }
+        server = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"]
+        with process(server, env) as proc:
+            for stub_host in stub_hosts.values():
+                wait_ready(f"http://{stub_host}/")
+            wait_ready(f"{base_url}/_guardette/meta", headers={"Authorization": CLIENT_SECRET})
+            results = asyncio.run(drive(base_url, exchanges, stub_hosts, args.speed, args.concurrency))
+            return results, rss_bytes(proc.pid)
+
+
+def compare(results: list[dict], summary: dict[str, Any], baseline_path: Path):
+    baseline = json.loads(baseline_path.read_text())
+    if len(baseline["results"]) != len(results):
+        print(f"\n{baseline_path} replayed a different recording; not comparing.")
+        return
+    before, differing = baseline["summary"], summarize(results, baseline["results"])["mismatches"]
+    changes = [
+        f"{key} {(summary[key] - before[key]) / before[key]:+.1%}"
+        for key in ("p50_ms", "p95_ms", "p99_ms", "peak_rss_bytes")
+        if before.get(key) and summary.get(key) is not None
+    ]
+    print(f"\nCompared to {baseline_path}:")
+    print(f"{'  '.join(changes)}  responses differing from the baseline's: {differing}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recording", type=Path, help="JSONL file written with RECORD_FILE")
+    parser.add_argument("--policy", type=Path, default=os.environ.get("GUARDETTE_POLICY_PATH"))
+    parser.add_argument("--speed", type=float, default=1.0, help="Pace relative to the recording; 0 for no pauses")
+    parser.add_argument("--concurrency", type=int, default=64, help="Most requests in flight at once")
+    parser.add_argument("--no-upstream-latency", action="store_true", help="Stubs answer without the recorded delay")
+    parser.add_argument("--output", type=Path, help="Defaults to benchmarks/results/replay-<timestamp>.json")
+    parser.add_argument("--baseline", type=Path, help="Earlier replay results to compare against")
+    parser.add_argument("--stub-ports", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stub_ports:
+        # Runs as the stub process `replay` starts.
+        ports = dict(item.rsplit("=", 1) for item in args.stub_ports.split(","))
+        asyncio.run(serve_stubs(args.recording, {h: int(p) for h, p in ports.items()}, not args.no_upstream_latency))
+        return
+    if args.policy is None:
+        parser.error("--policy (or GUARDETTE_POLICY_PATH) is required")
+
+    exchanges = load_exchanges(args.recording)
+    results, memory = replay(args, exchanges)
+
+    recorded = [recorded_result(i, exchange) for i, exchange in enumerate(exchanges)]
+    summary = {**summarize(results, recorded), **memory}
+    print(report_line("recorded", summarize(recorded, recorded)))
+    print(report_line("replayed", summary))
+
+    now = datetime.now(UTC)
+    output = args.output or ROOT / "benchmarks" / "results" / f"replay-{now:%Y%m%dT%H%M%SZ}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    report = {
+        "guardette_version": VERSION,
+        "commit": git_commit(),
+        "timestamp": now.isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "stub_ports")},
+        "summary": summary,
+        "results": results,
+    }
+    output.write_text(json.dumps(report, indent=2, default=str))
+    print(f"\nResults saved to {output}")
+
+    if args.baseline:
+        compare(results, summary, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,42 @@
 from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, ClassVar
 
-from jsonpath_ng.ext import parse
 from pydantic import BaseModel
 
 from guardette.config import ConfigManager
 from guardette.datastructures import ProxyRequest, ProxyResponse
+from guardette.jsonpath import JsonPath
+from guardette.metrics import CacheStats
 from guardette.secrets import SecretsManager
 
+if TYPE_CHECKING:
+    from guardette.executors import ActionExecutor
+
 _json_path_cache = {}
+json_path_cache_stats = CacheStats()
+
+# Returned by `Action.updater` for actions that delete what their paths select.
+REMOVE = object()
+
+
+def get_json_path_expr(path) -> JsonPath:
+    expr = _json_path_cache.get(path)
+    if expr is None:
+        json_path_cache_stats.miss()
+        expr = _json_path_cache[path] = JsonPath(path)
+    else:
+        json_path_cache_stats.hit()
+    return expr
+
+
+def update_json_path(data, path, updater):
+    expr = get_json_path_expr(path)
+    expr.update(data, updater)
+
+
+def filter_json_path(data, path, filter_fn):
+    expr = get_json_path_expr(path)
+    expr.filter(filter_fn, data)
 
 
 @dataclass
@@ -16,31 +45,88 @@ class ActionContext:
     secrets: SecretsManager
     request: ProxyRequest
     response: ProxyResponse
+    # Where CPU-bound actions run their transform; inline on the event loop when unset.
+    executor: "ActionExecutor | None" = None
 
     def get_json_path_expr(self, path):
-        expr = _json_path_cache.get(path)
-        if expr is None:
-            expr = _json_path_cache[path] = parse(path)
-        return expr
+        return get_json_path_expr(path)
 
     def update_json_path(self, data, path, updater):
-        expr = self.get_json_path_expr(path)
-        expr.update(data, updater)
+        update_json_path(data, path, updater)
 
     def filter_json_path(self, data, path, filter_fn):
-        expr = self.get_json_path_expr(path)
-        expr.filter(filter_fn, data)
+        filter_json_path(data, path, filter_fn)
+
+    async def run_cpu_bound(self, action: "CpuBoundAction", json_data: Any, params: dict[str, Any]) -> Any:
+        if self.executor is None:
+            return action.transform(json_data, self.config, params)
+        return await self.executor.run(action.transform, json_data, self.config, params)
 
 
 class Action(BaseModel):
+    # Name the action is registered under, which policies refer to it by.
+    kind: ClassVar[str | None] = None
+    # Set by actions whose response hook only modifies the values selected by their `json_paths`,
+    # which lets the proxy apply them to a large array element by element while it streams.
+    streamable: ClassVar[bool] = False
+    # Set by actions whose response hook is pure CPU work, so the proxy runs it off the event loop.
+    # See `CpuBoundAction`.
+    cpu_bound: ClassVar[bool] = False
+    # Set by actions whose response hook does nothing but apply what `updater` returns to each of
+    # their `json_paths`, which lets the proxy apply consecutive fusable actions of a rule in one
+    # traversal of the document. See `guardette.fusion`.
+    fusable: ClassVar[bool] = False
+
     @classmethod
     def validate_config(cls, config: ConfigManager):
         pass
 
+    @property
+    def phase_name(self) -> str:
+        """Name the action's hooks are timed and traced under."""
+        return f"action.{self.kind}"
+
+    @classmethod
+    def has_request_hook(cls) -> bool:
+        return cls.request is not Action.request
+
+    @classmethod
+    def has_response_hook(cls) -> bool:
+        return cls.response is not Action.response
+
     async def request(self, ctx: ActionContext): ...
 
     async def response(self, ctx: ActionContext): ...
 
+    def updater(self, config: ConfigManager, params: dict[str, Any]) -> Any:
+        """
+        What a fusable action passes `update_json_path` for each of its paths: a value, or a
+        `(value, parent, key)` callable returning one, acting on that value alone. `REMOVE` when it
+        filters them out instead. `params` are what `prepare` returned for CPU-bound actions.
+        """
+        raise NotImplementedError
+
+
+class CpuBoundAction(Action):
+    """
+    Base for actions that do heavy CPU work on the response data. `transform` runs in the proxy's
+    action executor (a thread or process pool), so it can't touch the `ActionContext`: anything
+    that needs the event loop, such as secrets, is gathered by `prepare` and handed over in `params`.
+    """
+
+    cpu_bound = True
+
+    async def prepare(self, ctx: ActionContext) -> dict[str, Any]:  # noqa: ARG002
+        return {}
+
+    def transform(self, json_data: Any, config: ConfigManager, params: dict[str, Any]) -> Any:
+        """Transforms `json_data` (in place or not) and returns the result."""
+        raise NotImplementedError
+
+    async def response(self, ctx: ActionContext):
+        params = await self.prepare(ctx)
+        ctx.response.json_data = await ctx.run_cpu_bound(self, ctx.response.json_data, params)
+
 
 class ActionRegistry:
     def __init__(self):
@@ -55,6 +141,7 @@ class ActionRegistry:
                 raise KeyError(f"Action already exists: '{kind}'")
 
             self.actions[kind] = action
+            action.kind = kind
             return action
 
         return decorator
@@ -3,6 +3,7 @@ from collections.abc import Awaitable, Callable, Iterable
 from dataclasses import dataclass
 from typing import TypedDict
 
+from guardette import tracing
 from guardette.config import ConfigManager
 from guardette.datastructures import ProxyRequest
 from guardette.secrets import SecretsManager
@@ -67,13 +68,14 @@ class AuthHandlerRegistry:
             prefix = f"auth_{kind}_{subkind}"
 
         record = self.handlers[kind]
-        secret_params: dict[str, str] = dict(
-            zip(
-                record["secret_keys"],
-                await asyncio.gather(*[secrets.get(f"{prefix}_{k}".upper()) for k in record["secret_keys"]]),
-                strict=True,
+        with tracing.span("auth.secrets", kind=kinddef):
+            secret_params: dict[str, str] = dict(
+                zip(
+                    record["secret_keys"],
+                    await asyncio.gather(*[secrets.get(f"{prefix}_{k}".upper()) for k in record["secret_keys"]]),
+                    strict=True,
+                )
             )
-        )
 
         config_params = dict(
             zip(
@@ -83,13 +85,14 @@ class AuthHandlerRegistry:
             )
         )
 
-        return await record["handler"](
-            AuthContext(
-                request=request,
-                secret_params=secret_params,
-                config_params=config_params,
+        with tracing.span("auth.handler", kind=kinddef):
+            return await record["handler"](
+                AuthContext(
+                    request=request,
+                    secret_params=secret_params,
+                    config_params=config_params,
+                )
             )
-        )
 
 
 auth_registry = AuthHandlerRegistry()
@@ -0,0 +1,64 @@
+import contextlib
+from typing import Any
+
+from pydantic import BaseModel, Field, field_validator
+from starlette.responses import Response
+
+from guardette.json_codec import JsonCodec
+
+# Sub-requests carry no body, so only methods that don't take one can be batched.
+BATCH_METHODS = {"GET", "HEAD", "OPTIONS", "DELETE"}
+
+# Headers that describe how a sub-response was framed, not its content.
+_OMIT_RESPONSE_HEADERS = {"content-length", "content-encoding", "transfer-encoding", "vary"}
+
+
+class BatchRequest(BaseModel):
+    method: str = "GET"
+    host: str
+    path: str
+    query: str = ""
+
+    @field_validator("method")
+    @classmethod
+    def validate_method(cls, value: str) -> str:
+        value = value.upper()
+        if value not in BATCH_METHODS:
+            raise ValueError(f"Method must be one of {', '.join(sorted(BATCH_METHODS))}")
+        return value
+
+    @field_validator("path")
+    @classmethod
+    def validate_path(cls, value: str) -> str:
+        if not value.startswith("/") or value.startswith("/_guardette/"):
+            raise ValueError("Path must be absolute and not a Guardette route")
+        return value
+
+
+class Batch(BaseModel):
+    requests: list[BatchRequest] = Field(min_length=1)
+
+
+async def read_body(response: Response) -> bytes:
+    """
+    Collects the body of a (possibly streaming) response, running its background task (closing the
+    upstream response) even when reading the body fails.
+    """
+    try:
+        if hasattr(response, "body_iterator"):
+            return b"".join([chunk async for chunk in response.body_iterator])
+        return response.body
+    finally:
+        if response.background is not None:
+            await response.background()
+
+
+def batch_result(index: int, response: Response, body: bytes, codec: JsonCodec) -> dict[str, Any]:
+    headers = {k: v for k, v in response.headers.items() if k not in _OMIT_RESPONSE_HEADERS}
+    content: Any = None
+    if body:
+        content = body.decode(errors="replace")
+        if "json" in headers.get("content-type", ""):
+            with contextlib.suppress(ValueError):
+                content = codec.loads(body)
+    return {"index": index, "status": response.status_code, "headers": headers, "body": content}
@@ -0,0 +1,188 @@
+import asyncio
+import mmap
+import tempfile
+from collections.abc import AsyncIterable, AsyncIterator
+
+import httpx
+
+from guardette.exceptions import ResponseTooLargeException
+
+
+class MemoryBudget:
+    """
+    Bytes of upstream bodies held in memory across in-flight requests. A body only starts being read
+    while the total leaves room for it (or nothing else is buffered), so a burst of large responses
+    waits, unread, in the upstream connections instead of all landing in memory at once.
+
+    Bodies are admitted as a whole rather than chunk by chunk: admission reserves their declared size
+    up front, and a body being read never waits on another, so two of them can't end up each holding
+    half the budget and waiting for the other.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.in_use = 0
+        self.peak = 0
+        self.waits = 0
+        self._waiters: list[asyncio.Future] = []
+
+    def _has_room(self, expected_bytes: int) -> bool:
+        return self.in_use == 0 or self.in_use + expected_bytes <= self.max_bytes
+
+    async def admit(self, expected_bytes: int = 0):
+        """
+        Waits until a body of `expected_bytes` (0 when unknown) fits in the budget, then reserves them
+        for it: the body's `UpstreamBody` holds the reservation and releases it.
+        """
+        if not self._has_room(expected_bytes):
+            self.waits += 1
+            while not self._has_room(expected_bytes):
+                waiter = asyncio.get_running_loop().create_future()
+                self._waiters.append(waiter)
+                await waiter
+        self.add(expected_bytes)
+
+    def add(self, n: int):
+        self.in_use += n
+        self.peak = max(self.peak, self.in_use)
+
+    def release(self, n: int):
+        self.in_use -= n
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def stats(self) -> dict[str, int]:
+        return {"max_bytes": self.max_bytes, "in_use": self.in_use, "peak": self.peak, "waits": self.waits}
+
+
+class UpstreamBody:
+    """
+    An upstream body being read: held in memory, or once larger than `spill_bytes` (when set), in an
+    anonymous temporary file that is memory-mapped for parsing, so it sits in the page cache rather
+    than on the heap.
+    """
+
+    def __init__(self, spill_bytes: int = 0, budget: MemoryBudget | None = None, reserved_bytes: int = 0):
+        self.size = 0
+        self._spill_bytes = spill_bytes
+        self._budget = budget
+        self._chunks: list[bytes] = []
+        self._memory_bytes = 0
+        # Bytes counted in the budget for this body: what `admit` reserved, or what it holds once larger.
+        self._held_bytes = reserved_bytes
+        self._file = None
+        self._mmap: mmap.mmap | None = None
+        self._view: memoryview | None = None
+
+    @property
+    def spilled(self) -> bool:
+        return self._file is not None
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self._file is not None:
+            self._file.write(chunk)
+            return
+        self._chunks.append(chunk)
+        self._memory_bytes += len(chunk)
+        if self._budget is not None and self._memory_bytes > self._held_bytes:
+            self._budget.add(self._memory_bytes - self._held_bytes)
+            self._held_bytes = self._memory_bytes
+        if self._spill_bytes and self.size > self._spill_bytes:
+            self._file = tempfile.TemporaryFile()  # noqa: SIM115
+            self._file.writelines(self._chunks)
+            self._chunks = []
+            self._release_memory()
+
+    def _release_memory(self):
+        if self._budget is not None and self._held_bytes:
+            self._budget.release(self._held_bytes)
+        self._memory_bytes = self._held_bytes = 0
+
+    def settle(self):
+        """Gives back what was reserved for the body beyond what it turned out to hold in memory."""
+        if self._budget is not None and self._held_bytes > self._memory_bytes:
+            self._budget.release(self._held_bytes - self._memory_bytes)
+            self._held_bytes = self._memory_bytes
+
+    def view(self) -> bytes | memoryview:
+        """The whole body, without copying it out of the temporary file when it was spilled."""
+        if self._file is None:
+            if len(self._chunks) > 1:
+                self._chunks = [b"".join(self._chunks)]
+            return self._chunks[0] if self._chunks else b""
+        if self._view is None:
+            self._file.flush()
+            if self.size == 0:
+                return b""
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._mmap)
+        return self._view
+
+    def getvalue(self) -> bytes:
+        view = self.view()
+        return view if isinstance(view, bytes) else bytes(view)
+
+    def close(self):
+        if self._view is not None:
+            self._view.release()
+            self._mmap.close()
+            self._view = self._mmap = None
+        if self._file is not None:
+            self._file.close()
+        self._chunks = []
+        self._release_memory()
+
+
+def _too_large(max_bytes: int) -> ResponseTooLargeException:
+    return ResponseTooLargeException(f"Upstream response exceeds the limit of {max_bytes} bytes.")
+
+
+def check_declared_size(response: httpx.Response, max_bytes: int | None):
+    """Refuses a response before reading its body when its Content-Length is already over the limit."""
+    content_length = response.headers.get("content-length", "")
+    if max_bytes and content_length.isdigit() and int(content_length) > max_bytes:
+        raise _too_large(max_bytes)
+
+
+async def read_upstream_body(
+    response: httpx.Response,
+    max_bytes: int | None = None,
+    spill_bytes: int = 0,
+    budget: MemoryBudget | None = None,
+) -> UpstreamBody:
+    """
+    Reads and decodes an upstream body, failing as soon as it grows past `max_bytes`. With a
+    `budget`, waits for room in it first.
+    """
+    check_declared_size(response, max_bytes)
+    reserved_bytes = 0
+    if budget is not None:
+        content_length = response.headers.get("content-length", "")
+        reserved_bytes = int(content_length) if content_length.isdigit() else 0
+        if spill_bytes:
+            # Only this much of the body is ever held in memory.
+            reserved_bytes = min(reserved_bytes, spill_bytes)
+        await budget.admit(reserved_bytes)
+
+    body = UpstreamBody(spill_bytes, budget, reserved_bytes)
+    try:
+        async for chunk in limit_stream(response.aiter_bytes(), max_bytes):
+            body.write(chunk)
+    except BaseException:
+        body.close()
+        raise
+    body.settle()
+    return body
+
+
+async def limit_stream(chunks: AsyncIterable[bytes], max_bytes: int | None) -> AsyncIterator[bytes]:
+    """Relays `chunks`, failing once more than `max_bytes` went through."""
+    size = 0
+    async for chunk in chunks:
+        size += len(chunk)
+        if max_bytes and size > max_bytes:
+            raise _too_large(max_bytes)
+        yield chunk
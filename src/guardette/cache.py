@@ -0,0 +1,115 @@
+import hashlib
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import NamedTuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from guardette.datastructures import BufferedResponse, ProxyRequest
+
+# Forwarded headers left out of the key: they identify or trace one request without changing its response.
+UNKEYED_HEADERS = frozenset({"traceparent", "tracestate", "x-request-id", "x-correlation-id"})
+
+
+class CacheKey(NamedTuple):
+    host: str
+    method: str
+    path: str
+    query: str
+    # sha256 over the headers sent upstream, so credentials are never held in the key itself.
+    identity: str
+
+
+def make_cache_key(host: str, method: str, proxy_request: ProxyRequest) -> CacheKey:
+    url = urlsplit(proxy_request.url)
+    query = urlencode(sorted(parse_qsl(url.query, keep_blank_values=True)))
+    # Every header that reaches the upstream may change its answer (credentials, `Accept`, API version
+    # headers, ...), so requests only share a cached or in-flight response when they send the same ones.
+    headers = sorted(
+        (name.lower(), value) for name, value in proxy_request.headers.items() if name.lower() not in UNKEYED_HEADERS
+    )
+    identity = hashlib.sha256()
+    for name, value in headers:
+        identity.update(f"{name}:{value}\n".encode())
+    return CacheKey(host=host, method=method, path=url.path, query=query, identity=identity.hexdigest())
+
+
+class _Entry(NamedTuple):
+    response: BufferedResponse
+    size: int
+    expiry_time: float
+
+
+class ResponseCache:
+    """LRU cache of transformed responses with a TTL, bounded by entry count and total body size."""
+
+    def __init__(self, ttl_secs: float, max_entries: int, max_bytes: int):
+        self.ttl_secs = ttl_secs
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.revalidations = 0
+
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> BufferedResponse | None:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expiry_time <= time.monotonic():
+            # Expired entries with upstream validators stay around (until evicted) to be revalidated.
+            if not entry.response.validators:
+                self._remove(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.response
+
+    def get_stale(self, key: Hashable) -> BufferedResponse | None:
+        """Returns an expired entry that can be revalidated with the upstream."""
+        entry = self._entries.get(key)
+        if entry is None or not entry.response.validators:
+            return None
+        return entry.response
+
+    def refresh(self, key: Hashable):
+        """Marks an entry fresh again for another TTL, after the upstream confirmed it is unchanged."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        self._entries[key] = entry._replace(expiry_time=time.monotonic() + self.ttl_secs)
+        self._entries.move_to_end(key)
+        self.revalidations += 1
+
+    def set(self, key: Hashable, response: BufferedResponse):
+        size = len(response.body) + sum(len(k) + len(v) for k, v in response.headers.items())
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = _Entry(response=response, size=size, expiry_time=time.monotonic() + self.ttl_secs)
+        self.size += size
+        while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key)
+        self.size -= entry.size
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "revalidations": self.revalidations,
+        }
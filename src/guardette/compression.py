@@ -0,0 +1,119 @@
+import zlib
+from collections.abc import AsyncIterable, AsyncIterator, Callable
+from typing import Protocol
+
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class Encoder(Protocol):
+    def compress(self, data: bytes) -> bytes: ...
+
+    def finish(self) -> bytes: ...
+
+
+class _GzipEncoder:
+    def __init__(self, level: int):
+        self._z = zlib.compressobj(min(max(level, 1), 9), zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        # Sync flush so every chunk handed to the client is decodable right away.
+        return self._z.compress(data) + self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._z.flush()
+
+
+class _BrotliEncoder:
+    def __init__(self, level: int):
+        self._c = brotli.Compressor(quality=min(max(level, 0), 11))
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.process(data) + self._c.flush()
+
+    def finish(self) -> bytes:
+        return self._c.finish()
+
+
+class _ZstdEncoder:
+    def __init__(self, level: int):
+        self._c = zstandard.ZstdCompressor(level=min(max(level, 1), 22)).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.compress(data) + self._c.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._c.flush()
+
+
+# Encodings Guardette can produce, most preferred first. brotli and zstd depend on optional packages.
+ENCODERS: dict[str, Callable[[int], Encoder]] = {
+    **({"zstd": _ZstdEncoder} if zstandard is not None else {}),
+    **({"br": _BrotliEncoder} if brotli is not None else {}),
+    "gzip": _GzipEncoder,
+}
+
+# Encodings httpx can decode with the packages installed; requested from upstreams whenever the
+# body is parsed by Guardette rather than relayed as-is.
+UPSTREAM_ACCEPT_ENCODING = ", ".join([*ENCODERS, "deflate"])
+
+
+def negotiate(accept_encoding: str | None, encodings: tuple[str, ...]) -> str | None:
+    """Picks the encoding for a response from the client's `Accept-Encoding` header, or None for identity."""
+    if not accept_encoding:
+        return None
+
+    qualities: dict[str, float] = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[name.strip()] = q
+
+    best, best_q = None, 0.0
+    for name in encodings:
+        if name not in ENCODERS:
+            continue
+        q = qualities.get(name, qualities.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def compress_response(response: Response, encoding: str | None, level: int, min_bytes: int) -> Response:
+    """Compresses a buffered response body in place when an encoding was negotiated and it is big enough."""
+    response.headers.append("vary", "Accept-Encoding")
+    if encoding is None or len(response.body) < min_bytes or "content-encoding" in response.headers:
+        return response
+
+    encoder = ENCODERS[encoding](level)
+    response.body = encoder.compress(response.body) + encoder.finish()
+    response.headers["content-encoding"] = encoding
+    response.headers["content-length"] = str(len(response.body))
+    return response
+
+
+async def compress_stream(chunks: AsyncIterable[bytes], encoding: str, level: int) -> AsyncIterator[bytes]:
+    encoder = ENCODERS[encoding](level)
+    async for chunk in chunks:
+        if data := encoder.compress(chunk):
+            yield data
+    yield encoder.finish()
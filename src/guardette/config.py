@@ -12,6 +12,35 @@ class ConfigManager:
         self.SECRET_MANAGER: str = os.environ.get("SECRET_MANAGER", "default")
         self.PROXY_CLIENT_TIMEOUT_SECS: int = int(os.environ.get("PROXY_CLIENT_TIMEOUT_SECS", "60"))
         self.SECRET_MANAGER_CACHE_TTL_SECS: int = int(os.environ.get("SECRET_MANAGER_CACHE_TTL_SECS", "120"))
+        self.BATCH_MAX_REQUESTS: int = int(os.environ.get("BATCH_MAX_REQUESTS", "1000"))
+        self.BATCH_MAX_CONCURRENCY: int = int(os.environ.get("BATCH_MAX_CONCURRENCY", "16"))
+        self.PREFETCH_MAX_CONCURRENCY: int = int(os.environ.get("PREFETCH_MAX_CONCURRENCY", "8"))
+        self.ACTION_EXECUTOR: str = os.environ.get("ACTION_EXECUTOR", "thread")
+        self.ACTION_EXECUTOR_WORKERS: int | None = int(os.environ.get("ACTION_EXECUTOR_WORKERS", "0")) or None
+        self.ACTION_EXECUTOR_MIN_BYTES: int = int(os.environ.get("ACTION_EXECUTOR_MIN_BYTES", "65536"))
+        self.SERVER_TIMING: bool = os.environ.get("SERVER_TIMING", "false").lower() in ("1", "true")
+        self.LOG_SUCCESS_SAMPLE_RATE: float = float(os.environ.get("LOG_SUCCESS_SAMPLE_RATE", "1.0"))
+        self.TRACE_EXPORTER: str = os.environ.get("TRACE_EXPORTER", "none")
+        self.TRACE_FILE: str = os.environ.get("TRACE_FILE", "guardette-traces.jsonl")
+        self.TRACE_SAMPLE_RATE: float = float(os.environ.get("TRACE_SAMPLE_RATE", "1.0"))
+        self.POLICY_RELOAD_INTERVAL_SECS: float = float(os.environ.get("POLICY_RELOAD_INTERVAL_SECS", "0"))
+        self.RECORD_FILE: str = os.environ.get("RECORD_FILE", "")
+        self.RECORD_SAMPLE_RATE: float = float(os.environ.get("RECORD_SAMPLE_RATE", "1.0"))
+        self.RECORD_RAW_BODIES: bool = os.environ.get("RECORD_RAW_BODIES", "false").lower() in ("1", "true")
+        self.JSON_CODEC: str = os.environ.get("JSON_CODEC", "auto")
+        self.RESPONSE_MAX_BYTES: int = int(os.environ.get("RESPONSE_MAX_BYTES", "0"))
+        self.BUFFER_BUDGET_BYTES: int = int(os.environ.get("BUFFER_BUDGET_BYTES", "0"))
+        self.BUFFER_SPILL_BYTES: int = int(os.environ.get("BUFFER_SPILL_BYTES", "0"))
+        self.STREAM_TRANSFORM_MIN_BYTES: int = int(os.environ.get("STREAM_TRANSFORM_MIN_BYTES", "1048576"))
+        self.RESPONSE_COMPRESSION_ENCODINGS: tuple[str, ...] = tuple(
+            [
+                e.strip().lower()
+                for e in os.environ.get("RESPONSE_COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",")
+                if e
+            ]
+        )
+        self.RESPONSE_COMPRESSION_LEVEL: int = int(os.environ.get("RESPONSE_COMPRESSION_LEVEL", "6"))
+        self.RESPONSE_COMPRESSION_MIN_BYTES: int = int(os.environ.get("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
         self.PSEUDONYMIZE_EMAIL_DOMAINS_ALLOWLIST: tuple[str, ...] = tuple(
             [d.lower() for d in os.environ.get("PSEUDONYMIZE_EMAIL_DOMAINS_ALLOWLIST", "").split(",") if d]
         )
@@ -1,3 +1,5 @@
 PROXY_HOST_HEADER = "X-Guardette-Host"
 
 PROXY_ERROR_HEADER = "X-Guardette-Error"
+
+PROXY_CACHE_HEADER = "X-Guardette-Cache"
@@ -1,4 +1,5 @@
-from dataclasses import dataclass
+from collections.abc import AsyncIterable
+from dataclasses import dataclass, field
 from typing import Any
 
 from starlette.datastructures import MutableHeaders
@@ -9,6 +10,8 @@ class ProxyRequest:
     url: str
     headers: MutableHeaders
     json_data: Any
+    # Body sent upstream: the client's raw bytes, or `json_data` re-encoded once request hooks ran.
+    content: bytes | AsyncIterable[bytes] | None = None
 
 
 @dataclass
@@ -16,3 +19,17 @@ class ProxyResponse:
     status_code: int
     headers: MutableHeaders
     json_data: Any
+
+
+@dataclass
+class BufferedResponse:
+    """A fully transformed response, rendered to bytes and ready to be sent (or cached)."""
+
+    status_code: int
+    headers: MutableHeaders
+    body: bytes
+    # Conditional request headers (If-None-Match / If-Modified-Since) that revalidate the upstream
+    # response this was rendered from.
+    validators: dict[str, str] = field(default_factory=dict)
+    # Upstream URL of the next page, for paginated responses of rules with prefetching enabled.
+    next_url: str | None = None
@@ -2,13 +2,17 @@ import re
 
 from pydantic import ConfigDict, Field, PrivateAttr, model_validator
 
-from guardette.actions import Action, ActionContext, action_registry
+from guardette.actions import CpuBoundAction, action_registry, update_json_path
+from guardette.config import ConfigManager
 
 
 @action_registry.register("filter_regex")
-class FilterRegex(Action):
+class FilterRegex(CpuBoundAction):
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
+    streamable = True
+    fusable = True
+
     json_paths: list[str]
     regex_pattern: str
     delimiter: str = Field(default="")
@@ -22,10 +26,15 @@ class FilterRegex(Action):
             raise ValueError(f"Invalid regex pattern '{self.regex_pattern}'") from e
         return self
 
-    async def response(self, ctx: ActionContext):
+    def updater(self, config: ConfigManager, params):  # noqa: ARG002
         def updater(text, _data, _k):
             matches = self._compiled_pattern.findall(text)
             return self.delimiter.join(matches)
 
+        return updater
+
+    def transform(self, json_data, config: ConfigManager, params):
+        updater = self.updater(config, params)
         for path in self.json_paths:
-            ctx.update_json_path(ctx.response.json_data, path, updater)
+            update_json_path(json_data, path, updater)
+        return json_data
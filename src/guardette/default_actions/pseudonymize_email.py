@@ -1,13 +1,16 @@
 import base64
 import hashlib
 
-from guardette.actions import Action, ActionContext, action_registry
+from guardette.actions import ActionContext, CpuBoundAction, action_registry, update_json_path
 from guardette.config import ConfigManager
 from guardette.exceptions import ConfigurationException
 
 
 @action_registry.register("pseudonymize_email")
-class PseudonymizeEmail(Action):
+class PseudonymizeEmail(CpuBoundAction):
+    streamable = True
+    fusable = True
+
     json_paths: list[str]
 
     @classmethod
@@ -18,8 +21,11 @@ class PseudonymizeEmail(Action):
                 "when pseudonymize_email action is configured."
             )
 
-    async def response(self, ctx: ActionContext):
-        salt = await ctx.secrets.get("PSEUDONYMIZE_SALT")
+    async def prepare(self, ctx: ActionContext):
+        return {"salt": await ctx.secrets.get("PSEUDONYMIZE_SALT")}
+
+    def updater(self, config: ConfigManager, params):
+        salt = params["salt"]
 
         def updater(email, _data, _k):
             if not isinstance(email, str):
@@ -30,12 +36,17 @@ class PseudonymizeEmail(Action):
             except ValueError:
                 return email
 
-            if domain in ctx.config.PSEUDONYMIZE_EMAIL_DOMAINS_ALLOWLIST:
+            if domain in config.PSEUDONYMIZE_EMAIL_DOMAINS_ALLOWLIST:
                 return email
 
             username_hash = base64.b32encode(hashlib.sha256((username + salt).encode()).digest()).decode().rstrip("=")
             domain_hash = base64.b32encode(hashlib.sha256((domain + salt).encode()).digest()).decode().rstrip("=")
             return f"u-{username_hash}@d-{domain_hash}.invalid".lower()
 
+        return updater
+
+    def transform(self, json_data, config: ConfigManager, params):
+        updater = self.updater(config, params)
         for path in self.json_paths:
-            ctx.update_json_path(ctx.response.json_data, path, updater)
+            update_json_path(json_data, path, updater)
+        return json_data
@@ -1,10 +1,20 @@
+from typing import Any
+
 from guardette.actions import Action, ActionContext, action_registry
+from guardette.config import ConfigManager
 
 
 @action_registry.register("redact")
 class RedactAction(Action):
+    streamable = True
+    fusable = True
+
     json_paths: list[str]
 
+    def updater(self, config: ConfigManager, params: dict[str, Any]):  # noqa: ARG002
+        return config.REDACT_TOKEN
+
     async def response(self, ctx: ActionContext):
+        updater = self.updater(ctx.config, {})
         for path in self.json_paths:
-            ctx.update_json_path(ctx.response.json_data, path, ctx.config.REDACT_TOKEN)
+            ctx.update_json_path(ctx.response.json_data, path, updater)
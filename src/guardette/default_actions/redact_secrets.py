@@ -1,10 +1,16 @@
+import threading
 from contextlib import contextmanager
 
 from detect_secrets.core.scan import _process_line_based_plugins
 from detect_secrets.plugins.base import RegexBasedDetector
 from detect_secrets.settings import default_settings
 
-from guardette.actions import Action, ActionContext, action_registry
+from guardette.actions import CpuBoundAction, action_registry, update_json_path
+from guardette.config import ConfigManager
+
+# detect-secrets keeps its settings (and the patch below) in process-wide state, so scans running
+# in executor threads take turns.
+_scan_lock = threading.Lock()
 
 
 @contextmanager
@@ -29,11 +35,14 @@ def _full_match_regex_detectors():
 
 
 @action_registry.register("redact_secrets")
-class RedactSecrets(Action):
+class RedactSecrets(CpuBoundAction):
+    streamable = True
+    # Not fusable: its scans need `_scan_lock` and detect-secrets' settings held around the traversal.
+
     json_paths: list[str]
 
-    async def response(self, ctx: ActionContext):
-        token = ctx.config.REDACT_TOKEN
+    def transform(self, json_data, config: ConfigManager, params):  # noqa: ARG002
+        token = config.REDACT_TOKEN
 
         def updater(value, _parent, _key):
             if not isinstance(value, str) or not value:
@@ -52,9 +61,10 @@ class RedactSecrets(Action):
                     redacted = redacted.replace(sv, token)
             return redacted
 
-        with default_settings() as settings, _full_match_regex_detectors():
+        with _scan_lock, default_settings() as settings, _full_match_regex_detectors():
             # Always redact, even if upstream content contains an
             # `# pragma: allowlist secret` directive.
             settings.disable_filters("detect_secrets.filters.allowlist.is_line_allowlisted")
             for path in self.json_paths:
-                ctx.update_json_path(ctx.response.json_data, path, updater)
+                update_json_path(json_data, path, updater)
+        return json_data
@@ -1,10 +1,19 @@
-from guardette.actions import Action, ActionContext, action_registry
+from typing import Any
+
+from guardette.actions import REMOVE, Action, ActionContext, action_registry
+from guardette.config import ConfigManager
 
 
 @action_registry.register("remove")
 class RemoveAction(Action):
+    streamable = True
+    fusable = True
+
     json_paths: list[str]
 
+    def updater(self, config: ConfigManager, params: dict[str, Any]):  # noqa: ARG002
+        return REMOVE
+
     async def response(self, ctx: ActionContext):
         for path in self.json_paths:
             ctx.filter_json_path(ctx.response.json_data, path, lambda _d: True)
@@ -5,6 +5,7 @@ import httpx
 
 from guardette.auth import AuthContext, auth_registry
 from guardette.exceptions import AuthHandlerAuthException
+from guardette.metrics import CacheStats
 
 _TOKEN_EXPIRY_BUFFER_SECS = 60
 
@@ -20,6 +21,7 @@ class _CachedToken(NamedTuple):
 
 
 _token_cache: dict[_TokenCacheKey, _CachedToken] = {}
+token_cache_stats = CacheStats()
 
 
 @auth_registry.register(
@@ -38,8 +40,10 @@ async def oauth2_client_credentials(ctx: AuthContext):
     cache_key = _TokenCacheKey(token_url=token_url, client_id=client_id)
     cached = _token_cache.get(cache_key)
     if cached and cached.expiry_time > time.time():
+        token_cache_stats.hit()
         access_token = cached.access_token
     else:
+        token_cache_stats.miss()
         async with httpx.AsyncClient() as client:
             # RFC 6749 ยง2.3.1: HTTP Basic auth is the primary client authentication
             # method; sending client_id/client_secret in the body is a fallback for
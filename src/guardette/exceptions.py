@@ -10,6 +10,10 @@ class MatchNotFoundException(GuardetteException):
     pass
 
 
+class InvalidRequestException(GuardetteException):
+    pass
+
+
 class ConfigurationException(GuardetteException):
     pass
 
@@ -32,3 +36,15 @@ class ProxyClientTimeoutException(GuardetteException):
 
 class TransformationException(GuardetteException):
     pass
+
+
+class UpstreamRateLimitedException(GuardetteException):
+    pass
+
+
+class ResponseTooLargeException(GuardetteException):
+    pass
+
+
+class InvalidPolicyException(GuardetteException):
+    pass
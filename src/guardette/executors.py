@@ -0,0 +1,64 @@
+import asyncio
+import multiprocessing
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any
+
+from guardette.config import ConfigManager
+from guardette.exceptions import ConfigurationException
+from guardette.json_codec import JsonCodec, get_json_codec
+
+ACTION_EXECUTORS = ("inline", "thread", "process")
+
+Transform = Callable[[Any, ConfigManager, dict[str, Any]], Any]
+
+
+def _run_encoded(transform: Transform, data: bytes, codec_name: str, config: ConfigManager, params: dict) -> bytes:
+    codec = get_json_codec(codec_name)
+    return codec.dumps(transform(codec.loads(data), config, params))
+
+
+class ActionExecutor:
+    """
+    Runs the transforms of CPU-bound actions off the event loop. Threads share the response data
+    as-is; worker processes receive and return it as encoded JSON, which is much cheaper to move
+    between processes than a pickled object graph.
+    """
+
+    def __init__(self, kind: str, max_workers: int | None, codec: JsonCodec):
+        if kind not in ACTION_EXECUTORS:
+            raise ConfigurationException(
+                f"Invalid action executor '{kind}'. Must be one of: {', '.join(ACTION_EXECUTORS)}."
+            )
+        self.kind = kind
+        self.max_workers = max_workers
+        self.codec = codec
+        self._pool: Executor | None = None
+
+    @property
+    def pool(self) -> Executor:
+        if self._pool is None:
+            if self.kind == "process":
+                # Forking a process that runs an event loop and open sockets is unsafe.
+                self._pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="guardette-action")
+        return self._pool
+
+    async def run(self, transform: Transform, json_data: Any, config: ConfigManager, params: dict[str, Any]) -> Any:
+        if self.kind == "inline":
+            return transform(json_data, config, params)
+
+        loop = asyncio.get_running_loop()
+        if self.kind == "thread":
+            return await loop.run_in_executor(self.pool, transform, json_data, config, params)
+
+        data = await loop.run_in_executor(
+            self.pool, _run_encoded, transform, self.codec.dumps(json_data), self.codec.name, config, params
+        )
+        return self.codec.loads(data)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,285 @@
+"""Applies the JSONPath updates of several actions in one traversal of a document."""
+
+from functools import lru_cache
+from typing import Any
+
+from jsonpath_ng.jsonpath import Child, Descendants, Fields, JSONPath, Root, Slice
+
+from guardette.actions import REMOVE, Action, ActionContext, CpuBoundAction, get_json_path_expr
+from guardette.config import ConfigManager
+from guardette.jsonpath import CompiledNode, compile_node
+
+# Step standing for `..`: the rest of the path applies to this node and every container below it.
+_DESCEND = object()
+
+_compiled_paths: dict[str, tuple | None] = {}
+
+
+def _flatten(expr: JSONPath) -> list | None:
+    expr_type = type(expr)
+    if expr_type is Root:
+        return []
+    if expr_type is Fields or (expr_type is Slice and expr.start is None and expr.end is None and expr.step is None):
+        return [expr]
+    if expr_type is Child:
+        left, right = _flatten(expr.left), _flatten(expr.right)
+        return None if left is None or right is None else left + right
+    if expr_type is Descendants:
+        left, right = _flatten(expr.left), _flatten(expr.right)
+        # Only `..<field>`: what follows `..` is then a no-op on values that aren't containers.
+        if left is None or not right or type(right[0]) is not Fields:
+            return None
+        return [*left, _DESCEND, *right]
+    return None
+
+
+def compile_path(path: str) -> tuple | None:
+    """The steps of `path`, or None when a fused traversal can't follow it."""
+    if path not in _compiled_paths:
+        try:
+            steps = _flatten(get_json_path_expr(path).expr)
+        except Exception:
+            # Left for the action to fail on when it runs.
+            steps = None
+        _compiled_paths[path] = tuple(steps) if steps else None
+    return _compiled_paths[path]
+
+
+def _remove(_value) -> bool:
+    return True
+
+
+def _apply(last_step: CompiledNode, updater: Any, data: Any):
+    # What `update`/`filter` do to each node the path before its last step selects.
+    if updater is REMOVE:
+        last_step.filter(_remove, data)
+    else:
+        last_step.update(data, updater)
+
+
+# What a node is, as far as where paths go from it is concerned.
+_DICT, _LIST, _NONE, _SCALAR = range(4)
+
+
+def _kind(data: Any) -> int:
+    if isinstance(data, dict):
+        return _DICT
+    if isinstance(data, list):
+        return _LIST
+    return _NONE if data is None else _SCALAR
+
+
+class _State:
+    """
+    The cursors (path index, step index) reaching a node. Its plans, one per kind of node, list in
+    order the paths to update there (by index) and the walks into the node's children. A walk into
+    a dict is `(named, default)`, the states of its children by key, and a walk into a list
+    `(state, state)`: each pair holds the state of a child that is a container, then of one that isn't.
+    """
+
+    __slots__ = ("cursors", "plans")
+
+    def __init__(self, cursors: tuple):
+        self.cursors = cursors
+        self.plans: list[tuple | None] = [None] * 4
+
+
+class _Program:
+    """The paths of a fused run, compiled into states as a traversal reaches them."""
+
+    def __init__(self, paths: tuple[str, ...]):
+        self.steps = [compile_path(path) for path in paths]
+        self.last_steps = [compile_node(steps[-1]) for steps in self.steps]
+        self._states: dict[tuple, _State] = {}
+        self.root = self._state([(i, 0) for i in range(len(paths))])
+
+    def _state(self, cursors: list) -> _State | None:
+        if not cursors:
+            return None
+        key = tuple(sorted(cursors))
+        state = self._states.get(key)
+        if state is None:
+            state = self._states.setdefault(key, _State(key))
+        return state
+
+    def _expand(self, cursors, kind: int, here: list, below: list):
+        for cursor in cursors:
+            i, step = cursor
+            steps = self.steps[i]
+            node = steps[step]
+            if node is _DESCEND:
+                if kind in (_DICT, _LIST):
+                    below.append(cursor)
+                    self._expand([(i, step + 1)], kind, here, below)
+            elif step == len(steps) - 1:
+                here.append(cursor)
+            elif type(node) is Slice:
+                if kind == _LIST:
+                    below.append(cursor)
+                elif kind != _NONE:
+                    # jsonpath_ng's `[*]` treats any other value as a list of one.
+                    self._expand([(i, step + 1)], kind, here, below)
+            elif kind == _DICT:
+                below.append(cursor)
+
+    def _walk(self, cursors: list, kind: int) -> tuple:
+        descend = [cursor for cursor in cursors if self.steps[cursor[0]][cursor[1]] is _DESCEND]
+        if kind == _LIST:
+            each = [(i, step + 1) for i, step in cursors if self.steps[i][step] is not _DESCEND]
+            return self._state(each + descend), self._state(each)
+        named: dict[str, list] = {}
+        every = []
+        for i, step in cursors:
+            node = self.steps[i][step]
+            if node is _DESCEND:
+                continue
+            if "*" in node.fields:
+                every.append((i, step + 1))
+            else:
+                for name in node.fields:
+                    named.setdefault(name, []).append((i, step + 1))
+        default = (self._state(every + descend), self._state(every))
+        return (
+            {name: (self._state(c + every + descend), self._state(c + every)) for name, c in named.items()},
+            default,
+        )
+
+    def plan(self, state: _State, kind: int) -> tuple:
+        plan = state.plans[kind]
+        if plan is None:
+            here: list = []
+            below: list = []
+            self._expand(state.cursors, kind, here, below)
+            here.sort()
+            below.sort()
+            # Walks into the children are split around the updates applying here, so that each path
+            # sees this node as it is after the earlier paths' updates, and before the later ones'.
+            entries = []
+            start = 0
+            for i, _ in here:
+                end = start
+                while end < len(below) and below[end][0] < i:
+                    end += 1
+                if end > start:
+                    entries.append(self._walk(below[start:end], kind))
+                    start = end
+                entries.append(i)
+            if start < len(below):
+                entries.append(self._walk(below[start:], kind))
+            plan = state.plans[kind] = tuple(entries)
+        return plan
+
+
+def _visit(program: _Program, updaters: list, data: Any, state: _State):
+    kind = _kind(data)
+    for entry in program.plan(state, kind):
+        if type(entry) is int:
+            _apply(program.last_steps[entry], updaters[entry], data)
+        elif kind == _LIST:
+            for child in data:
+                _visit_child(program, updaters, child, entry)
+        else:
+            named, default = entry
+            if default == (None, None):
+                for name, states in named.items():
+                    if name in data:
+                        _visit_child(program, updaters, data[name], states)
+            else:
+                for name, child in data.items():
+                    _visit_child(program, updaters, child, named.get(name, default))
+
+
+def _visit_child(program: _Program, updaters: list, child: Any, states: tuple):
+    state = states[0] if isinstance(child, dict | list) else states[1]
+    if state is not None:
+        _visit(program, updaters, child, state)
+
+
+@lru_cache(maxsize=256)
+def _program(paths: tuple[str, ...]) -> _Program:
+    return _Program(paths)
+
+
+def apply_updates(data: Any, updates: list[tuple[str, Any]]):
+    """
+    Applies `(path, updater)` pairs to `data` in place, as if passed to `update_json_path` (or
+    `filter_json_path` for `REMOVE`) one after the other. Every path must compile.
+
+    One walk carries a cursor per path down the document. At every node, the updates ending there
+    and the walks into its children are ordered by index, so a path sees each node after the earlier
+    paths changed it and before the later ones do. Unlike jsonpath_ng, which finds everything a path
+    selects before updating any of it, the walk doesn't go back into values a path replaced itself
+    (nested `items` under `$..items[*]`), which only shows in jsonpath_ng no longer failing on them.
+    """
+    program = _program(tuple(path for path, _ in updates))
+    _visit(program, [updater for _, updater in updates], data, program.root)
+
+
+class FusedActions(CpuBoundAction):
+    """Consecutive fusable actions of a rule, applied in one traversal."""
+
+    kind = "fused"
+
+    actions: list[Action]
+
+    @property
+    def phase_name(self) -> str:
+        # After the kinds it applies (`action.redact+pseudonymize_email`), so a fused run of one kind
+        # is timed as that action would be on its own.
+        return "action." + "+".join(dict.fromkeys(action.kind for action in self.actions))
+
+    async def prepare(self, ctx: ActionContext) -> dict[str, Any]:
+        return {
+            "params": [
+                await action.prepare(ctx) if isinstance(action, CpuBoundAction) else {} for action in self.actions
+            ]
+        }
+
+    def transform(self, json_data: Any, config: ConfigManager, params: dict[str, Any]) -> Any:
+        updates = []
+        for action, action_params in zip(self.actions, params["params"], strict=True):
+            updater = action.updater(config, action_params)
+            updates.extend((path, updater) for path in action.json_paths)
+        apply_updates(json_data, updates)
+        return json_data
+
+    async def response(self, ctx: ActionContext):
+        params = await self.prepare(ctx)
+        if any(action.cpu_bound for action in self.actions):
+            ctx.response.json_data = await ctx.run_cpu_bound(self, ctx.response.json_data, params)
+        else:
+            # Only as much work as the actions would have done on the event loop on their own.
+            ctx.response.json_data = self.transform(ctx.response.json_data, ctx.config, params)
+
+
+def _can_fuse(action: Action) -> bool:
+    json_paths = getattr(action, "json_paths", None)
+    return action.fusable and bool(json_paths) and all(compile_path(path) is not None for path in json_paths)
+
+
+def fuse_actions(actions: list[Action]) -> list[Action]:
+    """
+    The response actions among `actions`, in order, with each run of consecutive fusable ones that
+    touches more than one path merged into a `FusedActions`. Actions with a path the traversal can't
+    follow (filters, indices and slices, the root itself) run on their own in between.
+    """
+    fused: list[Action] = []
+    run: list[Action] = []
+
+    def flush():
+        if sum(len(action.json_paths) for action in run) > 1:
+            fused.append(FusedActions(actions=list(run)))
+        else:
+            fused.extend(run)
+        run.clear()
+
+    for action in actions:
+        if not action.has_response_hook():
+            continue
+        if _can_fuse(action):
+            run.append(action)
+        else:
+            flush()
+            fused.append(action)
+    flush()
+    return fused
@@ -0,0 +1,88 @@
+import json
+import re
+from typing import Any, Protocol
+
+from guardette.exceptions import ConfigurationException
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+class JsonCodec(Protocol):
+    name: str
+
+    def loads(self, data: bytes | memoryview) -> Any: ...
+
+    def dumps(self, value: Any) -> bytes: ...
+
+
+class StdlibJsonCodec:
+    name = "stdlib"
+
+    def loads(self, data: bytes | memoryview) -> Any:
+        # json only takes str, bytes and bytearray.
+        return json.loads(bytes(data) if isinstance(data, memoryview) else data)
+
+    def dumps(self, value: Any) -> bytes:
+        # Same rendering as starlette's JSONResponse.
+        return json.dumps(value, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+# Digits of an integer orjson can't hold exactly (outside of int64/uint64), which it parses as a float.
+# Also matches long digit runs in strings and fractions, which only cost a slower parse.
+_WIDE_INTEGER = re.compile(rb"-\d{19}|\d{20}")
+
+
+class OrjsonCodec:
+    name = "orjson"
+
+    def loads(self, data: bytes | memoryview) -> Any:
+        if _WIDE_INTEGER.search(data):
+            return StdlibJsonCodec().loads(data)
+        return orjson.loads(data)
+
+    def dumps(self, value: Any) -> bytes:
+        try:
+            return orjson.dumps(value)
+        except orjson.JSONEncodeError:
+            # e.g. integers wider than 64 bits, which the stdlib encoder still handles.
+            return StdlibJsonCodec().dumps(value)
+
+
+class MsgspecCodec:
+    name = "msgspec"
+
+    def __init__(self):
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder()
+
+    def loads(self, data: bytes | memoryview) -> Any:
+        return self._decoder.decode(data)
+
+    def dumps(self, value: Any) -> bytes:
+        return self._encoder.encode(value)
+
+
+JSON_CODECS: dict[str, type[JsonCodec]] = {
+    **({"orjson": OrjsonCodec} if orjson is not None else {}),
+    **({"msgspec": MsgspecCodec} if msgspec is not None else {}),
+    "stdlib": StdlibJsonCodec,
+}
+
+
+def get_json_codec(name: str) -> JsonCodec:
+    """Returns the named codec; `auto` picks the fastest one installed (orjson, msgspec, then stdlib)."""
+    if name == "auto":
+        return next(iter(JSON_CODECS.values()))()
+    if name not in JSON_CODECS:
+        raise ConfigurationException(
+            f"JSON codec '{name}' is not available. Installed codecs: {', '.join(JSON_CODECS)}."
+        )
+    return JSON_CODECS[name]()
@@ -0,0 +1,360 @@
+"""JSONPath expressions parsed by jsonpath_ng and compiled to closures over plain dicts and lists."""
+
+from collections.abc import Callable
+from typing import Any, NamedTuple
+
+from jsonpath_ng.ext import parse
+from jsonpath_ng.ext.filter import OPERATOR_MAP, Expression, Filter
+from jsonpath_ng.jsonpath import Child, Descendants, Fields, Index, JSONPath, Root, Slice, This
+
+
+class CompiledNode(NamedTuple):
+    # Values the node selects from a value.
+    find: Callable[[Any], list]
+    # Replaces what the node selects in a value: `update(data, val)`, as in jsonpath_ng.
+    update: Callable[[Any, Any], None]
+    # Removes what the node selects in a value where `fn` is true: `filter(fn, data)`.
+    filter: Callable[[Callable[[Any], bool], Any], None]
+
+
+class JsonPath:
+    """
+    A parsed path, with jsonpath_ng's `update(data, val)`, `filter(fn, data)` and `find(data)`.
+    `values(data)` returns the selected values themselves, without `DatumInContext` wrappers.
+
+    Paths in the subset `compile_node` handles skip the `DatumInContext` jsonpath_ng wraps every
+    visited node in; anything else (`$` alone, slices, unions, extensions such as `len`) runs
+    through jsonpath_ng.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.expr = parse(path)
+        self._node = None if type(self.expr) is Root else compile_node(self.expr, at_root=True)
+
+    @property
+    def compiled(self) -> bool:
+        return self._node is not None
+
+    def find(self, data) -> list:
+        # `DatumInContext`s (with paths and parents) are only built by jsonpath_ng.
+        return self.expr.find(data)
+
+    def values(self, data) -> list:
+        if self._node is None:
+            return [datum.value for datum in self.expr.find(data)]
+        return self._node.find(data)
+
+    def update(self, data, val):
+        if self._node is None:
+            return self.expr.update(data, val)
+        self._node.update(data, val)
+        return data
+
+    def filter(self, fn, data):
+        if self._node is None:
+            return self.expr.filter(fn, data)
+        self._node.filter(fn, data)
+        return data
+
+    def __str__(self):
+        return self.path
+
+    def __repr__(self):
+        return f"JsonPath({self.path!r}, compiled={self.compiled})"
+
+
+def compile_node(node: JSONPath, at_root: bool = False) -> CompiledNode | None:
+    """
+    Compiles a jsonpath_ng expression (keys, `[*]`, indices, `..` and `[?(...)]` filters comparing a
+    value to a literal) into a `find`, an `update` and a `filter` closure, or returns None when it is
+    outside that subset. `at_root` is set for expressions evaluated against the whole document.
+
+    The closures keep jsonpath_ng's quirks (`[*]` treating a non-list as a list of one, filters
+    ignoring what callable updaters return, ...) by handing values of shapes they don't handle
+    themselves to the node they were compiled from.
+    """
+    node_type = type(node)
+    if node_type is Root:
+        return _root() if at_root else None
+    if node_type in _LEAVES:
+        return _LEAVES[node_type](node)
+    if node_type is Child and at_root and type(node.left) is Root:
+        return compile_node(node.right)
+    if node_type in (Child, Descendants):
+        left = compile_node(node.left, at_root)
+        right = compile_node(node.right)
+        if left is None or right is None:
+            return None
+        return _child(left, right) if node_type is Child else _descendants(left, right)
+    return None
+
+
+def _root() -> CompiledNode:
+    # Only ever what `..` starts from at the top of the document: `$` alone isn't compiled (jsonpath_ng's
+    # `Root.update` returns the new value instead of changing anything), and `$.<rest>` is just <rest>.
+    def find(data):
+        return [data]
+
+    return CompiledNode(find, None, None)
+
+
+def _this(_node: This) -> CompiledNode:
+    def find(data):
+        return [data]
+
+    def update(data, val):
+        pass
+
+    def filter_(fn, data):
+        pass
+
+    return CompiledNode(find, update, filter_)
+
+
+def _fields(node: Fields) -> CompiledNode:
+    names = node.fields
+    every = "*" in names
+
+    if every:
+
+        def find(data):
+            return list(data.values()) if isinstance(data, dict) else []
+
+    elif len(names) == 1:
+        [name] = names
+
+        def find(data):
+            return [data[name]] if isinstance(data, dict) and name in data else []
+
+    else:
+
+        def find(data):
+            return [data[name] for name in names if name in data] if isinstance(data, dict) else []
+
+    def update(data, val):
+        if not isinstance(data, dict):
+            return
+        if callable(val):
+            for name in tuple(data) if every else names:
+                if name in data:
+                    result = val(data[name], data, name)
+                    if result is not None:
+                        data[name] = result
+        else:
+            for name in tuple(data) if every else names:
+                if name in data:
+                    data[name] = val
+
+    def filter_(fn, data):
+        if isinstance(data, dict):
+            for name in tuple(data) if every else names:
+                if name in data and fn(data[name]):
+                    data.pop(name)
+
+    return CompiledNode(find, update, filter_)
+
+
+def _star(node: Slice) -> CompiledNode | None:
+    if node.start is not None or node.end is not None or node.step is not None:
+        return None
+
+    # jsonpath_ng treats `None` as empty and dicts and scalars as a list of one; those go to `node`.
+    def find(data):
+        if isinstance(data, list):
+            return list(data)
+        if data is None:
+            return []
+        return [datum.value for datum in node.find(data)]
+
+    def update(data, val):
+        if not isinstance(data, list) or isinstance(val, list):
+            node.update(data, val)
+        elif callable(val):
+            for i in range(len(data)):
+                result = val(data[i], data, i)
+                if result is not None:
+                    data[i] = result
+        else:
+            for i in range(len(data)):
+                data[i] = val
+
+    def filter_(fn, data):
+        if isinstance(data, list):
+            data[:] = [item for item in data if not fn(item)]
+        else:
+            node.filter(fn, data)
+
+    return CompiledNode(find, update, filter_)
+
+
+def _index(node: Index) -> CompiledNode:
+    indices = node.indices
+
+    def find(data):
+        if isinstance(data, list):
+            n = len(data)
+            return [data[i] for i in indices if -n <= i < n]
+        return [datum.value for datum in node.find(data)]
+
+    def update(data, val):
+        if not isinstance(data, list) or isinstance(val, list):
+            node.update(data, val)
+        elif callable(val):
+            for i in indices:
+                result = val(data[i], data, i)
+                if result is not None:
+                    data[i] = result
+        else:
+            for i in indices:
+                if len(data) > i:
+                    data[i] = val
+
+    def filter_(fn, data):
+        if not isinstance(data, list):
+            node.filter(fn, data)
+            return
+        for i in indices:
+            if fn(data[i]):
+                data.pop(i)
+
+    return CompiledNode(find, update, filter_)
+
+
+def _expression(expression: Expression) -> Callable[[Any], bool] | None:
+    if type(expression) is not Expression or (expression.op is not None and expression.op not in {"!", *OPERATOR_MAP}):
+        return None
+    target = compile_node(expression.target)
+    if target is None:
+        return None
+    op, literal = expression.op, expression.value
+    compare = OPERATOR_MAP.get(op)
+    coerce = type(literal) is int
+
+    def matches(item) -> bool:
+        found = target.find(item)
+        if op == "!":
+            return not found
+        if op is None:
+            return bool(found)
+        results = []
+        for value in found:
+            if coerce and isinstance(value, str):
+                try:
+                    value = int(value)  # noqa: PLW2901
+                except ValueError:
+                    continue
+            results.append(compare(value, literal))
+        return any(results)
+
+    return matches
+
+
+def _filter(node: Filter) -> CompiledNode | None:
+    expressions = [_expression(expression) for expression in node.expressions]
+    if not expressions or None in expressions:
+        return None
+
+    def selected(item) -> bool:
+        return all(matches(item) for matches in expressions)
+
+    def find(data):
+        if isinstance(data, dict):
+            return [value for value in data.values() if selected(value)]
+        if isinstance(data, list):
+            return [item for item in data if selected(item)]
+        return []
+
+    def update(data, val):
+        if type(data) is not list:
+            return
+        for i, item in enumerate(data):
+            # Every expression is evaluated, as jsonpath_ng does here.
+            if all([matches(item) for matches in expressions]):  # noqa: C419
+                if callable(val):
+                    val(item, data, i)
+                else:
+                    data[i] = val
+
+    def filter_(fn, data):
+        if isinstance(data, dict):
+            for key in reversed([key for key, value in data.items() if selected(value)]):
+                if key in data and fn(data[key]):
+                    data.pop(key)
+        elif isinstance(data, list):
+            for i in reversed([i for i, item in enumerate(data) if selected(item)]):
+                if fn(data[i]):
+                    data.pop(i)
+
+    return CompiledNode(find, update, filter_)
+
+
+_LEAVES = {This: _this, Fields: _fields, Index: _index, Slice: _star, Filter: _filter}
+
+
+def _child(left: CompiledNode, right: CompiledNode) -> CompiledNode:
+    left_find, right_find, right_update, right_filter = left.find, right.find, right.update, right.filter
+
+    def find(data):
+        return [value for parent in left_find(data) for value in right_find(parent)]
+
+    def update(data, val):
+        for parent in left_find(data):
+            right_update(parent, val)
+
+    def filter_(fn, data):
+        for parent in left_find(data):
+            right_filter(fn, parent)
+
+    return CompiledNode(find, update, filter_)
+
+
+def _descendants(left: CompiledNode, right: CompiledNode) -> CompiledNode:
+    left_find, right_find, right_update, right_filter = left.find, right.find, right.update, right.filter
+
+    def find(data):
+        found = []
+
+        def visit(value):
+            found.extend(right_find(value))
+            if isinstance(value, list):
+                for item in value:
+                    visit(item)
+            elif isinstance(value, dict):
+                for item in value.values():
+                    visit(item)
+
+        for value in left_find(data):
+            visit(value)
+        return found
+
+    def update(data, val):
+        def visit(value):
+            # Only containers are visited, and after `right` changed them, as in jsonpath_ng.
+            if isinstance(value, list):
+                right_update(value, val)
+                for i in range(len(value)):
+                    visit(value[i])
+            elif isinstance(value, dict):
+                right_update(value, val)
+                for key in value:
+                    visit(value[key])
+
+        for value in left_find(data):
+            visit(value)
+
+    def filter_(fn, data):
+        def visit(value):
+            if isinstance(value, list):
+                right_filter(fn, value)
+                for i in range(len(value)):
+                    visit(value[i])
+            elif isinstance(value, dict):
+                right_filter(fn, value)
+                for key in value:
+                    visit(value[key])
+
+        for value in left_find(data):
+            visit(value)
+
+    return CompiledNode(find, update, filter_)
@@ -1,7 +1,32 @@
+import atexit
 import json
 import logging
 import os
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
+
+from guardette.exceptions import ConfigurationException
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+LOG_MODES = ("sync", "queue")
+
+# Attributes every LogRecord has; anything else on a record was passed in `extra`.
+_RESERVED_KEYS = frozenset(logging.LogRecord(None, None, None, None, "", (), None).__dict__) | {"message"}
+
+
+def _dumps(log_record: dict) -> str:
+    if orjson is not None:
+        try:
+            return orjson.dumps(log_record, default=str).decode()
+        except TypeError:
+            # e.g. integers wider than 64 bits, which the stdlib encoder still handles.
+            pass
+    return json.dumps(log_record, default=str)
 
 
 class CustomJSONFormatter(logging.Formatter):
@@ -15,25 +40,35 @@ class CustomJSONFormatter(logging.Formatter):
             "logger": "guardette",
         }
 
-        # Include exception info if present
+        # Include exception info if present (already rendered to text when logged through a queue)
         if record.exc_info:
             log_record["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            log_record["exception"] = record.exc_text
 
         # Include other extra attributes
-        extra_attributes = (
-            set(record.__dict__.keys())
-            - set(logging.LogRecord(None, None, None, None, "", (), None).__dict__.keys())
-            - {"exc_info"}
-        )
-        for key in extra_attributes:
-            if key not in log_record:
-                log_record[key] = record.__dict__.get(key)
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_KEYS and key not in log_record:
+                log_record[key] = value
+
+        return _dumps(log_record)
 
-        return json.dumps(log_record)
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record):
+        # Records are formatted on the listener's thread. Only what could change or go away before
+        # then is resolved here: the message arguments and the traceback.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
 
 
 def setup_logging():
     log_level = os.getenv("LOG_LEVEL", "INFO").upper()
+    log_mode = os.getenv("LOG_MODE", "sync").lower()
     formatter = CustomJSONFormatter()
 
     logger = logging.getLogger("guardette")
@@ -43,4 +78,16 @@ def setup_logging():
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(log_level)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+
+    if log_mode not in LOG_MODES:
+        raise ConfigurationException(f"Invalid LOG_MODE: '{log_mode}'. Options: {', '.join(LOG_MODES)}.")
+    if log_mode == "queue":
+        # Formatting and writing to stdout happen on a background thread, so a slow stdout never
+        # holds up the event loop. The queue is unbounded, so no record is ever dropped.
+        log_queue = queue.SimpleQueue()
+        listener = QueueListener(log_queue, console_handler, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+        logger.addHandler(_QueueHandler(log_queue))
+    else:
+        logger.addHandler(console_handler)
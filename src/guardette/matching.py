@@ -54,9 +54,16 @@ class SourceMatcher:
 
 
 class Matcher:
-    def __init__(self, policy: Policy):
+    def __init__(self, policy: Policy, previous: "Matcher | None" = None):
+        """Sources that `previous` was built for (the same objects) reuse its compiled matchers."""
         self.policy = policy
-        self.target_matchers = {target.host: SourceMatcher(target) for target in self.policy.sources}
+        previous_matchers = previous.target_matchers if previous is not None else {}
+        self.target_matchers = {}
+        for target in self.policy.sources:
+            matcher = previous_matchers.get(target.host)
+            if matcher is None or matcher.target is not target:
+                matcher = SourceMatcher(target)
+            self.target_matchers[target.host] = matcher
 
     def match(self, request: Request, target_host: str):
         if target_host not in self.target_matchers:
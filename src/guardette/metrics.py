@@ -0,0 +1,232 @@
+import math
+from bisect import bisect_left
+from collections.abc import Callable, Iterable, Iterator
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds, tuned for a proxy: from cache hits to slow upstream calls.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = tuple(float(4**i * 256) for i in range(10))  # 256 bytes to 64 MiB
+
+Labels = tuple[str, ...]
+Sample = tuple[str, dict[str, str], float]
+
+
+class CacheStats:
+    """Hit and miss counts of an in-process cache. Updates aren't locked, so counts from threads are approximate."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def hit(self):
+        self.hits += 1
+
+    def miss(self):
+        self.misses += 1
+
+    @property
+    def ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _format_sample(name: str, labels: dict[str, str], value: float) -> str:
+    if labels:
+        label_text = ",".join(f'{key}="{_escape(str(val))}"' for key, val in labels.items())
+        return f"{name}{{{label_text}}} {_format_value(value)}"
+    return f"{name} {_format_value(value)}"
+
+
+class _Metric:
+    type: str
+
+    def __init__(self, name: str, description: str, labelnames: Labels = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = labelnames
+
+    def _labels(self, values: Labels) -> dict[str, str]:
+        return dict(zip(self.labelnames, values, strict=True))
+
+    def samples(self) -> Iterator[Sample]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, description: str, labelnames: Labels = ()):
+        super().__init__(name, description, labelnames)
+        self._values: dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterator[Sample]:
+        for labels, value in self._values.items():
+            yield self.name, self._labels(labels), value
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, labels: Labels = (), amount: float = 1):
+        self.inc(labels, -amount)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: Labels = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, description, labelnames)
+        self.buckets = buckets
+        # Observations per bucket (not cumulative), the last one being +Inf.
+        self._counts: dict[Labels, list[int]] = {}
+        self._sums: dict[Labels, float] = {}
+
+    def observe(self, value: float, labels: Labels = ()):
+        counts = self._counts.get(labels)
+        if counts is None:
+            counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[labels] = self._sums.get(labels, 0.0) + value
+
+    def samples(self) -> Iterator[Sample]:
+        for labels, counts in self._counts.items():
+            label_dict = self._labels(labels)
+            cumulative = 0
+            for bound, count in zip([*self.buckets, math.inf], counts, strict=True):
+                cumulative += count
+                yield f"{self.name}_bucket", {**label_dict, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", label_dict, self._sums[labels]
+            yield f"{self.name}_count", label_dict, cumulative
+
+
+class Collector(_Metric):
+    """A metric whose samples are read from elsewhere (e.g. cache statistics) when scraped."""
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        type: str,
+        collect: Callable[[], Iterable[tuple[Labels, float]]],
+        labelnames: Labels = (),
+    ):
+        super().__init__(name, description, labelnames)
+        self.type = type
+        self._collect = collect
+
+    def samples(self) -> Iterator[Sample]:
+        for labels, value in self._collect():
+            yield self.name, self._labels(labels), value
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[_Metric] = []
+
+    def register(self, metric: _Metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Renders every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(_format_sample(name, labels, value) for name, labels, value in metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+class ProxyMetrics(Registry):
+    """The metrics Guardette exposes at `/_guardette/metrics`."""
+
+    def __init__(self):
+        super().__init__()
+        self.requests = self.register(
+            Counter("guardette_requests_total", "Requests handled.", ("host", "route", "method", "status"))
+        )
+        self.request_duration = self.register(
+            Histogram(
+                "guardette_request_duration_seconds",
+                "Time to handle a request, up to its response headers.",
+                ("host", "route", "method", "status"),
+            )
+        )
+        self.response_size = self.register(
+            Histogram(
+                "guardette_response_size_bytes",
+                "Size of buffered response bodies sent to clients.",
+                ("host", "route", "method"),
+                buckets=SIZE_BUCKETS,
+            )
+        )
+        self.in_flight = self.register(Gauge("guardette_requests_in_flight", "Requests being handled."))
+        self.upstream_duration = self.register(
+            Histogram(
+                "guardette_upstream_duration_seconds",
+                "Time for upstreams to answer with response headers, retries included.",
+                ("host", "method", "status"),
+            )
+        )
+        self.upstream_in_flight = self.register(
+            Gauge("guardette_upstream_requests_in_flight", "Upstream requests awaiting response headers.", ("host",))
+        )
+        self._caches: dict[str, Callable[[], CacheStats | None]] = {}
+        self.register(
+            Collector(
+                "guardette_cache_hits_total",
+                "Lookups answered by an in-process cache.",
+                "counter",
+                lambda: self._collect_caches(lambda stats: stats.hits),
+                ("cache",),
+            )
+        )
+        self.register(
+            Collector(
+                "guardette_cache_misses_total",
+                "Lookups an in-process cache could not answer.",
+                "counter",
+                lambda: self._collect_caches(lambda stats: stats.misses),
+                ("cache",),
+            )
+        )
+        self.register(
+            Collector(
+                "guardette_cache_hit_ratio",
+                "Share of lookups answered by an in-process cache.",
+                "gauge",
+                lambda: self._collect_caches(lambda stats: stats.ratio),
+                ("cache",),
+            )
+        )
+
+    def watch_cache(self, name: str, stats: Callable[[], CacheStats | None]):
+        """Reports the hit counts of a cache; `stats` is called when scraped and may return None to skip it."""
+        self._caches[name] = stats
+
+    def _collect_caches(self, value: Callable[[CacheStats], float]) -> Iterator[tuple[Labels, float]]:
+        for name, get_stats in self._caches.items():
+            stats = get_stats()
+            if stats is not None:
+                yield (name,), value(stats)
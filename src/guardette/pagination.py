@@ -0,0 +1,61 @@
+import re
+from collections.abc import Mapping
+from typing import Any
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit
+
+# `<https://api.github.com/...?page=2>; rel="next"` entries of a `Link` header.
+_LINK_RE = re.compile(r'<(?P<url>[^>]*)>\s*;[^,]*?\brel="?(?P<rel>[^",]*)"?')
+
+
+def _with_query(url: str, **params: Any) -> str:
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query, keep_blank_values=True))
+    query.update({k: str(v) for k, v in params.items()})
+    return parts._replace(query=urlencode(query)).geturl()
+
+
+def _link_next(url: str, link: str) -> str | None:
+    for m in _LINK_RE.finditer(link):
+        if "next" in m["rel"].split():
+            return urljoin(url, m["url"])
+    return None
+
+
+def _jira_next(url: str, json_data: Any) -> str | None:
+    if not isinstance(json_data, dict):
+        return None
+    start_at, max_results = json_data.get("startAt"), json_data.get("maxResults")
+    if not isinstance(start_at, int) or not isinstance(max_results, int) or max_results <= 0:
+        return None
+    if json_data.get("isLast") is True:
+        return None
+    next_start = start_at + max_results
+    total = json_data.get("total")
+    if isinstance(total, int):
+        if next_start >= total:
+            return None
+    else:
+        values = next((v for v in json_data.values() if isinstance(v, list)), None)
+        if values is None or len(values) < max_results:
+            return None
+    return _with_query(url, startAt=next_start)
+
+
+def next_page_url(url: str, headers: Mapping[str, str], json_data: Any) -> str | None:
+    """
+    Returns the URL of the page after this one for paginated list responses: a GitHub style
+    `Link: <...>; rel="next"` header, GitLab's `X-Next-Page`, or Jira's `startAt`/`maxResults`.
+    The result is only ever on the same host as `url`.
+    """
+    next_url = None
+    if link := headers.get("link"):
+        next_url = _link_next(url, link)
+    elif "x-next-page" in headers:
+        next_page = headers["x-next-page"].strip()
+        next_url = _with_query(url, page=next_page) if next_page.isdigit() else None
+    else:
+        next_url = _jira_next(url, json_data)
+
+    if next_url is None or urlsplit(next_url).netloc != urlsplit(url).netloc:
+        return None
+    return next_url
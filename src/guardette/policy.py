@@ -1,16 +1,36 @@
 import re
+from functools import cached_property
 from pathlib import Path
-from typing import Any
+from typing import Any, Literal
 
 import yaml
-from pydantic import BaseModel, model_validator
+from jsonpath_ng.exceptions import JSONPathError
+from pydantic import BaseModel, Field, field_serializer, model_validator
 
-from guardette.actions import Action, action_registry
+from guardette.actions import Action, action_registry, get_json_path_expr
+from guardette.fusion import fuse_actions
+from guardette.streaming import StreamPlan, compile_stream_plan
+
+
+class Cache(BaseModel):
+    ttl_secs: float = 60.0
+    max_entries: int = 1024
+    max_bytes: int = 64 * 1024 * 1024
+
+
+class Prefetch(BaseModel):
+    # How many pages ahead of the last one served are fetched.
+    depth: int = 1
+    ttl_secs: float = 30.0
+    max_entries: int = 64
+    max_bytes: int = 16 * 1024 * 1024
 
 
 class Rule(BaseModel):
     route: str
     actions: list[Action]
+    cache: Cache | None = None
+    prefetch: Prefetch | None = None
 
     @model_validator(mode="before")
     def create_actions(cls, values: dict[str, Any]):
@@ -20,10 +40,78 @@ class Rule(BaseModel):
         ]
         return values
 
+    @model_validator(mode="after")
+    def compile_json_paths(self):
+        # Compiled once here rather than on the first response an action runs on.
+        for action in self.actions:
+            for path in getattr(action, "json_paths", None) or []:
+                try:
+                    get_json_path_expr(path)
+                except JSONPathError as e:
+                    raise ValueError(f"Invalid JSONPath `{path}`: {e}") from e
+        return self
+
+    @field_serializer("actions")
+    def serialize_actions(self, actions: list[Action]) -> list[dict[str, Any]]:
+        # Dumped as written in the policy file; `list[Action]` alone would only dump the fields of the base class.
+        return [{"kind": action.kind, **action.model_dump()} for action in actions]
+
+    @property
+    def passthrough(self) -> bool:
+        """No action touches the response, so the upstream body can be streamed to the client untouched."""
+        return not any(action.has_response_hook() for action in self.actions)
+
+    @cached_property
+    def response_actions(self) -> list[Action]:
+        """The actions run on a buffered response, with fusable ones merged by `fuse_actions`."""
+        return fuse_actions(self.actions)
+
+    @cached_property
+    def stream_plan(self) -> StreamPlan | None:
+        return compile_stream_plan(self.actions)
+
+
+class ConnectionPool(BaseModel):
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry_secs: float = 5.0
+    http2: bool = False
+
+
+class RateLimit(BaseModel):
+    # Token bucket pacing; unlimited when unset.
+    requests_per_second: float | None = None
+    burst: int = 10
+    max_concurrency: int | None = None
+    # Requests that would have to wait longer than this for a slot are rejected instead of queued.
+    max_wait_secs: float = 30.0
+
+
+class Retry(BaseModel):
+    # Applies to GET, HEAD and OPTIONS requests only; 1 disables retries.
+    max_attempts: int = 1
+    backoff_secs: float = 0.1
+    max_backoff_secs: float = 2.0
+    status_codes: list[int] = Field(default_factory=lambda: [502, 503, 504])
+    # Sends a second attempt when the first hasn't answered within this percentile of recent latencies.
+    hedge: bool = False
+    hedge_percentile: float = 95.0
+    hedge_min_delay_secs: float = 0.05
+
 
 class Source(BaseModel):
     host: str
+    # `http` is meant for local upstreams, such as the fake upstream of the benchmarks.
+    scheme: Literal["https", "http"] = "https"
     auth: str | None = None
+    pool: ConnectionPool = Field(default_factory=ConnectionPool)
+    rate_limit: RateLimit = Field(default_factory=RateLimit)
+    retry: Retry = Field(default_factory=Retry)
+    # Share of successful requests to this source that get a completion log line; defaults to
+    # LOG_SUCCESS_SAMPLE_RATE. Errors are always logged.
+    log_sample_rate: float | None = Field(default=None, ge=0.0, le=1.0)
+    # Largest (decoded) response body accepted from this source; defaults to RESPONSE_MAX_BYTES.
+    max_response_bytes: int | None = Field(default=None, gt=0)
     rules: list[Rule]
 
     @model_validator(mode="before")
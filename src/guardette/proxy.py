@@ -1,38 +1,78 @@
+import asyncio
+import contextlib
 import functools
 import json
 import logging
+import random
+import signal
 import time
 import uuid
+from collections.abc import AsyncIterator, Callable, Mapping
+from pathlib import Path
 from secrets import compare_digest
+from urllib.parse import urlsplit
 
 import httpx
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask, BackgroundTasks
 from starlette.datastructures import URL, MutableHeaders
 
-from guardette.actions import ActionContext, action_registry
+from guardette import timing, tracing
+from guardette.actions import ActionContext, action_registry, json_path_cache_stats
 from guardette.auth import AuthHandlerRegistry, auth_registry
+from guardette.batch import Batch, BatchRequest, batch_result, read_body
+from guardette.buffering import (
+    MemoryBudget,
+    UpstreamBody,
+    check_declared_size,
+    limit_stream,
+    read_upstream_body,
+)
+from guardette.cache import CacheKey, ResponseCache, make_cache_key
+from guardette.compression import UPSTREAM_ACCEPT_ENCODING, compress_response, compress_stream, negotiate
 from guardette.config import ConfigManager
-from guardette.constants import PROXY_ERROR_HEADER, PROXY_HOST_HEADER
-from guardette.datastructures import ProxyRequest, ProxyResponse
+from guardette.constants import PROXY_CACHE_HEADER, PROXY_ERROR_HEADER, PROXY_HOST_HEADER
+from guardette.datastructures import BufferedResponse, ProxyRequest, ProxyResponse
+from guardette.default_auth.oauth2_client_credentials import token_cache_stats
 from guardette.exceptions import (
     AuthException,
     ConfigurationException,
     GuardetteException,
     HttpMethodNotSupportedException,
+    InvalidPolicyException,
+    InvalidRequestException,
     MatchNotFoundException,
     ProxyClientTimeoutException,
+    ResponseTooLargeException,
     TransformationException,
+    UpstreamRateLimitedException,
 )
+from guardette.executors import ActionExecutor
+from guardette.json_codec import JsonCodec, get_json_codec
 from guardette.logging import setup_logging
 from guardette.matching import Matcher, SourceMatcherResult
-from guardette.policy import Policy
+from guardette.metrics import CONTENT_TYPE, ProxyMetrics
+from guardette.pagination import next_page_url
+from guardette.policy import Policy, Rule, Source
+from guardette.recording import make_recorder, response_entry, streamed_response_entry, upstream_entry
+from guardette.revalidation import (
+    CONDITIONAL_REQUEST_HEADERS,
+    entity_tag,
+    is_not_modified,
+    not_modified_response,
+    upstream_validators,
+)
 from guardette.secrets import (
     AwsSecretsManager,
     ConfigSecretsManager,
     SecretManagerType,
     SecretsManager,
 )
+from guardette.singleflight import SingleFlight
+from guardette.streaming import transform_json_stream
+from guardette.subrequests import make_subrequest
+from guardette.upstream import UpstreamPool
 from guardette.utils import copy_signature
 from guardette.version import VERSION
 
@@ -51,8 +91,27 @@ STRIP_RESPONSE_HEADERS = {
     "content-length",
     "content-encoding",
     "transfer-encoding",
+    # Describes the untransformed body; buffered responses get an ETag of their own.
+    "etag",
 }
 
+# Pass-through responses keep the upstream body bytes as-is, so only hop-by-hop headers are dropped.
+PASSTHROUGH_STRIP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "transfer-encoding",
+}
+
+SUPPORTED_METHODS = {"GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"}
+
+BODY_METHODS = {"POST", "PUT", "PATCH"}
+
+# Idempotent methods whose concurrent identical requests are coalesced into one upstream call.
+COALESCED_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# Called with the request, its response and the phase timings once a request has been handled.
+TimingHook = Callable[[Request, Response, timing.Timings], None]
+
 
 setup_logging()
 
@@ -63,6 +122,10 @@ _EXCEPTION_RESPONSES: dict[type[GuardetteException], tuple[int, str, str]] = {
     # exception class -> (status_code, response_message, log_message)
     AuthException: (401, "Unauthorized", "Authentication failed"),
     MatchNotFoundException: (404, "Not Found", "No matching route found"),
+    InvalidRequestException: (400, "Bad Request", "Invalid request"),
+    UpstreamRateLimitedException: (429, "Too Many Requests", "Upstream rate limit budget exhausted"),
+    ResponseTooLargeException: (502, "Upstream response too large", "Upstream response exceeds the size limit"),
+    InvalidPolicyException: (400, "Invalid policy", "Policy reload rejected"),
 }
 
 
@@ -80,72 +143,100 @@ def _make_error_response(correlation_id: str, status_code: int, message: str, **
     )
 
 
-def guardette_route():
+def _request_log_fields(request: Request) -> dict[str, str]:
+    return {
+        "method": request.method,
+        "url": str(request.url),
+        "client_host": request.client.host if request.client else "unknown",
+        "proxy_host": request.headers.get(PROXY_HOST_HEADER, "unknown"),
+    }
+
+
+def _handle_exception(
+    exc: Exception,
+    correlation_id: str,
+    start_time: float,
+    timings: timing.Timings | None = None,
+    request: Request | None = None,
+) -> JSONResponse:
+    """Logs an exception raised while handling a request and turns it into an error response."""
+    elapsed_time = time.time() - start_time
+    extra = {
+        "correlation_id": correlation_id,
+        **(_request_log_fields(request) if request is not None else {}),
+        "exception": str(exc),
+        "elapsed_time": f"{elapsed_time:.3f}s",
+    }
+    if timings is not None:
+        extra["timings"] = timings.as_dict()
+    if isinstance(exc, GuardetteException):
+        status_code, message, log_message = _EXCEPTION_RESPONSES.get(
+            type(exc), (500, "Internal Server Error", "GuardetteException encountered")
+        )
+        log_func = logger.warning if status_code < 500 else logger.error
+        log_func(
+            log_message,
+            exc_info=exc if status_code >= 500 else None,
+            extra=extra,
+        )
+        return _make_error_response(correlation_id, status_code, message)
+
+    logger.error(
+        "Unexpected error occurred",
+        exc_info=exc,
+        extra=extra,
+    )
+    return _make_error_response(
+        correlation_id,
+        500,
+        "Internal Server Error",
+        details="An unexpected error occurred.",
+    )
+
+
+def guardette_route(route: str = ""):
+    """
+    Wraps a route handler with logging, error handling, timings and metrics. `route` labels its
+    metrics unless the request matched a policy rule, whose route is used instead.
+    """
+
     def wrapper(func):
         @functools.wraps(func)
-        async def wrapped(*args, **kwargs):
+        async def wrapped(self: "Guardette", *args, **kwargs):
             request: Request = kwargs.get("request") or args[0]
             correlation_id = str(uuid.uuid4())
             request.state.correlation_id = correlation_id
-            logger.info(
-                "Incoming guardette request",
-                extra={
-                    "correlation_id": correlation_id,
-                    "method": request.method,
-                    "url": str(request.url),
-                    "client_host": request.client.host if request.client else "unknown",
-                    "proxy_host": request.headers.get(PROXY_HOST_HEADER, "unknown"),
-                },
-            )
+            if logger.isEnabledFor(logging.DEBUG):
+                # The line completing the request repeats these fields.
+                logger.debug(
+                    "Incoming guardette request",
+                    extra={"correlation_id": correlation_id, **_request_log_fields(request)},
+                )
             start_time = time.time()
 
+            self.metrics.in_flight.inc()
+            trace = self.tracer.trace(
+                "guardette.request",
+                request.headers.get(tracing.TRACEPARENT_HEADER),
+                {"http.request.method": request.method, "url.path": request.url.path, "correlation_id": correlation_id},
+            )
             try:
-                response = await func(*args, **kwargs)
-            except GuardetteException as ge:
-                elapsed_time = time.time() - start_time
-                status_code, message, log_message = _EXCEPTION_RESPONSES.get(
-                    type(ge), (500, "Internal Server Error", "GuardetteException encountered")
-                )
-                log_func = logger.warning if status_code < 500 else logger.error
-                log_func(
-                    log_message,
-                    exc_info=status_code >= 500,
-                    extra={
-                        "correlation_id": correlation_id,
-                        "exception": str(ge),
-                        "elapsed_time": f"{elapsed_time:.3f}s",
-                    },
-                )
-                return _make_error_response(correlation_id, status_code, message)
-            except Exception as exc:
-                elapsed_time = time.time() - start_time
-                logger.error(
-                    "Unexpected error occurred",
-                    exc_info=True,
-                    extra={
-                        "correlation_id": correlation_id,
-                        "exception": str(exc),
-                        "elapsed_time": f"{elapsed_time:.3f}s",
-                    },
-                )
-                return _make_error_response(
-                    correlation_id,
-                    500,
-                    "Internal Server Error",
-                    details="An unexpected error occurred.",
-                )
-            else:
-                elapsed_time = time.time() - start_time
-                logger.info(
-                    "Guardette request processed successfully",
-                    extra={
-                        "correlation_id": correlation_id,
-                        "status_code": response.status_code,
-                        "content_type": response.headers.get("Content-Type", "unknown"),
-                        "elapsed_time": f"{elapsed_time:.3f}s",
-                    },
-                )
-                return response
+                with trace as span, timing.record() as timings:
+                    try:
+                        response = await func(self, *args, **kwargs)
+                    except Exception as exc:
+                        response = _handle_exception(exc, correlation_id, start_time, timings, request)
+                    else:
+                        self._log_success(request, response, time.time() - start_time, timings)
+                    if span is not None:
+                        span.set("http.response.status_code", response.status_code)
+                        span.set("guardette.host", getattr(request.state, "source_host", ""))
+                        span.set("guardette.route", getattr(request.state, "rule_route", route))
+            finally:
+                self.metrics.in_flight.dec()
+            self._record_metrics(request, response, timings.total, route)
+            self._report_timings(request, response, timings)
+            return response
 
         return wrapped
 
@@ -156,13 +247,12 @@ class Guardette:
     def __init__(self, policy_path: str):
         self.actions = action_registry
         self.auth = auth_registry
-        self.policy = Policy.from_file(policy_path)
         self.config = ConfigManager()
-
-        for source in self.policy.sources:
-            for rule in source.rules:
-                for action in rule.actions:
-                    action.validate_config(self.config)
+        self.policy_path = policy_path
+        self.policy = self._load_policy(policy_path)
+        self._policy_mtime = self._policy_file_mtime()
+        self._reload_lock = asyncio.Lock()
+        self._reloads: set[asyncio.Task] = set()
 
         logger.info("Guardette policy loaded", extra={"policy": json.dumps(self.policy.model_dump())})
 
@@ -174,30 +264,201 @@ class Guardette:
         else:
             raise ConfigurationException("Invalid secret manager option: " + conf_secret_manager)
 
+        self.json_codec = get_json_codec(self.config.JSON_CODEC)
+        self.action_executor = ActionExecutor(
+            self.config.ACTION_EXECUTOR, self.config.ACTION_EXECUTOR_WORKERS, self.json_codec
+        )
+        self.upstreams = UpstreamPool(self.config)
+        self.inflight = SingleFlight()
+        self.memory_budget = MemoryBudget(self.config.BUFFER_BUDGET_BYTES) if self.config.BUFFER_BUDGET_BYTES else None
+        self._prefetches: set[asyncio.Task] = set()
+        self.timing_hooks: list[TimingHook] = []
+
+        self.tracer = tracing.Tracer(
+            tracing.make_exporter(self.config.TRACE_EXPORTER, self.config.TRACE_FILE),
+            sample_rate=self.config.TRACE_SAMPLE_RATE,
+        )
+        self.recorder = make_recorder(
+            self.config.RECORD_FILE, self.config.RECORD_SAMPLE_RATE, self.config.RECORD_RAW_BODIES
+        )
+        self.metrics = ProxyMetrics()
+        self.metrics.watch_cache("secrets", lambda: getattr(self.secrets, "cache_stats", None))
+        self.metrics.watch_cache("oauth2_token", lambda: token_cache_stats)
+        self.metrics.watch_cache("json_path", lambda: json_path_cache_stats)
+
     @property
     def policy(self):
         return self._policy
 
     @policy.setter
     def policy(self, value):
+        # Nothing here awaits, so requests see either the old policy or the new one, never a mix.
+        # Requests already matched keep the source and rule they matched, and finish with them.
+        previous = {source.host: source for source in self._policy.sources} if hasattr(self, "_policy") else {}
+        carried_over = {source.host for source in value.sources if previous.get(source.host) is source}
+
         self._policy = value
-        self._matcher = Matcher(self._policy)
+        self._matcher = Matcher(self._policy, getattr(self, "_matcher", None))
+        self._log_sample_rates = {
+            source.host: source.log_sample_rate for source in self._policy.sources if source.log_sample_rate is not None
+        }
+        self.response_caches = self._rule_caches("cache", getattr(self, "response_caches", {}), carried_over)
+        self.prefetch_caches = self._rule_caches("prefetch", getattr(self, "prefetch_caches", {}), carried_over)
+
+    def _rule_caches(
+        self,
+        setting: str,
+        previous: dict[tuple[str, str], ResponseCache],
+        carried_over: set[str],
+    ) -> dict[tuple[str, str], ResponseCache]:
+        """A cache per rule with `setting`; sources carried over from the previous policy keep their warm caches."""
+        caches = {}
+        for source in self._policy.sources:
+            for rule in source.rules:
+                settings = getattr(rule, setting)
+                if settings is None:
+                    continue
+                key = (source.host, rule.route)
+                if source.host in carried_over and key in previous:
+                    caches[key] = previous[key]
+                else:
+                    caches[key] = ResponseCache(
+                        ttl_secs=settings.ttl_secs,
+                        max_entries=settings.max_entries,
+                        max_bytes=settings.max_bytes,
+                    )
+        return caches
 
     @property
     def matcher(self):
         return self._matcher
 
+    def _load_policy(self, path: str) -> Policy:
+        policy = Policy.from_file(path)
+        for source in policy.sources:
+            for rule in source.rules:
+                for action in rule.actions:
+                    action.validate_config(self.config)
+        return policy
+
+    def _policy_file_mtime(self) -> float | None:
+        try:
+            return Path(self.policy_path).stat().st_mtime
+        except OSError:
+            return None
+
+    async def reload_policy(self) -> dict[str, list[str]]:
+        """
+        Reads and validates the policy file again, off the event loop, then swaps it in. Sources that
+        didn't change are carried over as they are, along with their compiled matchers, actions and
+        caches; the others are compiled anew. Returns the hosts of the sources that changed.
+        """
+        async with self._reload_lock:
+            self._policy_mtime = self._policy_file_mtime()
+            try:
+                policy = await asyncio.to_thread(self._load_policy, self.policy_path)
+            except Exception as e:
+                raise InvalidPolicyException(f"Invalid policy {self.policy_path}: {e!s}") from e
+
+            current = {source.host: source for source in self.policy.sources}
+            sources, changes = [], {"added": [], "changed": [], "removed": []}
+            for source in policy.sources:
+                previous = current.get(source.host)
+                if previous is not None and previous.model_dump() == source.model_dump():
+                    sources.append(previous)
+                    continue
+                sources.append(source)
+                if previous is None:
+                    changes["added"].append(source.host)
+                    continue
+                changes["changed"].append(source.host)
+                if (previous.pool, previous.rate_limit) != (source.pool, source.rate_limit):
+                    self.upstreams.retire(source.host)
+            changes["removed"] = sorted(current.keys() - {source.host for source in policy.sources})
+            for host in changes["removed"]:
+                self.upstreams.retire(host)
+            policy.sources = sources
+
+            self.policy = policy
+            self.upstreams.open(self.policy.sources)
+        logger.info("Guardette policy reloaded", extra=changes)
+        return changes
+
+    async def _reload_in_background(self, trigger: str):
+        try:
+            await self.reload_policy()
+        except InvalidPolicyException as e:
+            logger.warning(
+                "Policy reload rejected, keeping the current policy",
+                extra={"trigger": trigger, "exception": str(e)},
+            )
+
+    def _schedule_reload(self, trigger: str):
+        task = asyncio.create_task(self._reload_in_background(trigger))
+        self._reloads.add(task)
+        task.add_done_callback(self._reloads.discard)
+
+    async def _watch_policy_file(self, interval_secs: float):
+        while True:
+            await asyncio.sleep(interval_secs)
+            if self._policy_file_mtime() != self._policy_mtime:
+                await self._reload_in_background("file")
+
     async def _validate_client_secret(self, request: Request):
         req_client_secret = request.headers.get("authorization")
         if not req_client_secret:
             raise AuthException("Missing authorization header.")
 
-        client_secret = await self.secrets.get("CLIENT_SECRET", correlation_id=request.state.correlation_id)
+        with timing.phase("secrets"):
+            client_secret = await self.secrets.get("CLIENT_SECRET", correlation_id=request.state.correlation_id)
 
         if not compare_digest(req_client_secret, client_secret):
             raise AuthException("Invalid authorization header.")
 
-    @guardette_route()
+    def _log_success(self, request: Request, response: Response, elapsed_time: float, timings: timing.Timings):
+        sample_rate = 1.0
+        if response.status_code < 400:
+            host = getattr(request.state, "source_host", None)
+            sample_rate = self._log_sample_rates.get(host, self.config.LOG_SUCCESS_SAMPLE_RATE)
+            if sample_rate < 1.0 and random.random() >= sample_rate:  # noqa: S311
+                return
+        logger.info(
+            "Guardette request processed successfully",
+            extra={
+                "correlation_id": request.state.correlation_id,
+                **_request_log_fields(request),
+                "status_code": response.status_code,
+                "content_type": response.headers.get("Content-Type", "unknown"),
+                "elapsed_time": f"{elapsed_time:.3f}s",
+                "timings": timings.as_dict(),
+                # Each logged line stands for 1 / sample_rate requests.
+                **({"sample_rate": sample_rate} if sample_rate < 1.0 else {}),
+            },
+        )
+
+    def _record_metrics(self, request: Request, response: Response, elapsed_secs: float, route: str = ""):
+        # Labels only come from the policy, so a client can't make up new series.
+        host = getattr(request.state, "source_host", "")
+        route = getattr(request.state, "rule_route", route)
+        self.metrics.requests.inc((host, route, request.method, str(response.status_code)))
+        self.metrics.request_duration.observe(elapsed_secs, (host, route, request.method, str(response.status_code)))
+        content_length = response.headers.get("content-length", "")
+        if content_length.isdigit():
+            self.metrics.response_size.observe(int(content_length), (host, route, request.method))
+
+    def _report_timings(self, request: Request, response: Response, timings: timing.Timings):
+        if self.config.SERVER_TIMING:
+            response.headers["server-timing"] = timings.server_timing()
+        for hook in self.timing_hooks:
+            try:
+                hook(request, response, timings)
+            except Exception as e:
+                logger.warning(
+                    "Timing hook failed",
+                    extra={"correlation_id": request.state.correlation_id, "exception": str(e)},
+                )
+
+    @guardette_route("/_guardette/meta")
     async def _meta_route(self, request: Request):
         await self._validate_client_secret(request)
 
@@ -205,14 +466,124 @@ class Guardette:
             content={
                 "version": VERSION,
                 "policy": self.policy.model_dump(),
+                "response_caches": [
+                    {"host": host, "route": route, **cache.stats()}
+                    for (host, route), cache in self.response_caches.items()
+                ],
+                "prefetch_caches": [
+                    {"host": host, "route": route, **cache.stats()}
+                    for (host, route), cache in self.prefetch_caches.items()
+                ],
+                "inflight": self.inflight.stats(),
+                "upstreams": self.upstreams.stats(),
+                "memory_budget": self.memory_budget.stats() if self.memory_budget is not None else None,
             },
             status_code=200,
         )
 
+    @guardette_route("/_guardette/metrics")
+    async def _metrics_route(self, request: Request):
+        await self._validate_client_secret(request)
+        return Response(content=self.metrics.render(), media_type=CONTENT_TYPE)
+
+    @guardette_route("/_guardette/reload")
+    async def _reload_route(self, request: Request):
+        await self._validate_client_secret(request)
+        return JSONResponse(content=await self.reload_policy(), status_code=200)
+
+    @guardette_route("/_guardette/batch")
+    async def _batch_route(self, request: Request):
+        await self._validate_client_secret(request)
+
+        try:
+            batch = Batch.model_validate(self.json_codec.loads(await request.body()))
+        except ValueError as e:
+            raise InvalidRequestException(f"Invalid batch: {e!s}") from e
+        if len(batch.requests) > self.config.BATCH_MAX_REQUESTS:
+            raise InvalidRequestException(f"A batch holds at most {self.config.BATCH_MAX_REQUESTS} requests.")
+
+        semaphore = asyncio.Semaphore(self.config.BATCH_MAX_CONCURRENCY)
+
+        async def run(index: int, sub: BatchRequest) -> dict:
+            async with semaphore:
+                subrequest = make_subrequest(
+                    request,
+                    sub.method,
+                    sub.path,
+                    sub.query,
+                    # The client's Accept picks the batch's own format (NDJSON or not), not the upstreams'.
+                    headers={PROXY_HOST_HEADER: sub.host, "accept": None, "accept-encoding": "identity"},
+                )
+                start_time = time.time()
+                try:
+                    response = await self._proxy(subrequest)
+                    body = await read_body(response)
+                except Exception as exc:
+                    response = _handle_exception(exc, subrequest.state.correlation_id, start_time, request=subrequest)
+                    body = response.body
+                self._record_metrics(subrequest, response, time.time() - start_time)
+                return batch_result(index, response, body, self.json_codec)
+
+        tasks = [asyncio.create_task(run(index, sub)) for index, sub in enumerate(batch.requests)]
+
+        if "application/x-ndjson" in request.headers.get("accept", ""):
+
+            async def results() -> AsyncIterator[bytes]:
+                try:
+                    for task in asyncio.as_completed(tasks):
+                        yield self.json_codec.dumps(await task) + b"\n"
+                finally:
+                    for task in tasks:
+                        task.cancel()
+
+            return StreamingResponse(results(), media_type="application/x-ndjson")
+
+        results = await asyncio.gather(*tasks)
+        with timing.phase("serialize"):
+            response = Response(content=self.json_codec.dumps({"results": results}), media_type="application/json")
+        with timing.phase("compress"):
+            return compress_response(
+                response,
+                negotiate(request.headers.get("accept-encoding"), self.config.RESPONSE_COMPRESSION_ENCODINGS),
+                level=self.config.RESPONSE_COMPRESSION_LEVEL,
+                min_bytes=self.config.RESPONSE_COMPRESSION_MIN_BYTES,
+            )
+
     @guardette_route()
-    async def _proxy_route(self, request: Request):  # noqa: PLR0912
+    async def _proxy_route(self, request: Request):
         await self._validate_client_secret(request)
+        if self.recorder is None or not self.recorder.sample():
+            return await self._proxy(request)
 
+        # Read up front, as forwarding it upstream would consume the stream.
+        body = await request.body()
+        request.state.recording = {}
+        start_time, start = time.time(), time.perf_counter()
+        response = await self._proxy(request)
+
+        def record():
+            # A streamed body that failed or that the client stopped reading midway isn't recorded.
+            if "response" in request.state.recording:
+                self.recorder.record(request, body, start_time, time.perf_counter() - start)
+
+        if isinstance(response, StreamingResponse):
+            # Recorded once the body is sent.
+            response.background = BackgroundTasks([response.background, BackgroundTask(record)])
+        else:
+            record()
+        return response
+
+    def _transformer(self, match: SourceMatcherResult) -> "ProxyTransformer":
+        return ProxyTransformer(
+            auth=self.auth,
+            config=self.config,
+            secrets=self.secrets,
+            codec=self.json_codec,
+            executor=self.action_executor,
+            match=match,
+        )
+
+    async def _proxy(self, request: Request) -> Response:
         target_host = request.headers.get(PROXY_HOST_HEADER)
         if not target_host:
             raise GuardetteException(f"{PROXY_HOST_HEADER} header is missing.")
@@ -220,75 +591,303 @@ class Guardette:
         match = self.matcher.match(request, target_host=target_host)
         if match is None:
             raise MatchNotFoundException("Match not found.")
+        request.state.source_host = match["target"].host
+        request.state.rule_route = match["rule"].route
 
-        proxy_transformer = ProxyTransformer(
-            auth=self.auth,
-            config=self.config,
-            secrets=self.secrets,
-            match=match,
-        )
+        proxy_transformer = self._transformer(match)
         try:
-            proxy_request = await proxy_transformer.transform_request(request)
+            with tracing.span("transform_request"):
+                proxy_request = await proxy_transformer.transform_request(request)
         except Exception as e:
             raise TransformationException(f"Error transforming request: {e!s}") from e
 
-        client_timeout: int = self.config.PROXY_CLIENT_TIMEOUT_SECS
-        async with httpx.AsyncClient(timeout=client_timeout) as client:
+        if request.method not in SUPPORTED_METHODS:
+            raise HttpMethodNotSupportedException(f"Unexpected http method: {request.method}")
+
+        cache = None
+        if request.method == "GET":
+            cache = self.response_caches.get((match["target"].host, match["rule"].route))
+        rule = proxy_transformer.rule
+        if proxy_transformer.buffers_response(request.method):
+            buffered, cache_status = await self._buffered_exchange(request, proxy_transformer, proxy_request, cache)
+            if buffered.next_url is not None:
+                self._schedule_prefetch(request, rule, buffered.next_url)
+            return self._render(request, buffered, cache_status=cache_status)
+
+        response = await self._send(request, match["target"], proxy_request)
+
+        max_bytes = proxy_transformer.max_response_bytes
+        try:
+            check_declared_size(response, max_bytes)
+        except ResponseTooLargeException:
+            await response.aclose()
+            raise
+
+        if rule.passthrough:
+            return StreamingResponse(
+                self._recorded_stream(request, proxy_request, response, limit_stream(response.aiter_raw(), max_bytes)),
+                status_code=response.status_code,
+                headers={k: v for k, v in response.headers.items() if k.lower() not in PASSTHROUGH_STRIP_HEADERS},
+                background=BackgroundTask(response.aclose),
+            )
+
+        if proxy_transformer.can_stream_response(response):
+            body = proxy_transformer.stream_response(request, response)
+            headers = proxy_transformer.response_headers(response)
+            encoding = negotiate(request.headers.get("accept-encoding"), self.config.RESPONSE_COMPRESSION_ENCODINGS)
+            if encoding is not None:
+                body = compress_stream(body, encoding, self.config.RESPONSE_COMPRESSION_LEVEL)
+                headers["content-encoding"] = encoding
+                headers.append("vary", "Accept-Encoding")
+            return StreamingResponse(
+                self._recorded_stream(request, proxy_request, response, body),
+                status_code=response.status_code,
+                headers=dict(headers),
+                background=BackgroundTask(response.aclose),
+            )
+
+        return self._render(request, await self._buffer(request, proxy_transformer, proxy_request, response))
+
+    async def _recorded_stream(
+        self,
+        request: Request,
+        proxy_request: ProxyRequest,
+        upstream_response: httpx.Response,
+        body: AsyncIterator[bytes],
+    ) -> AsyncIterator[bytes]:
+        """`body`, adding its exchange to the recording by size once it's all sent, if the request is recorded."""
+        sent = 0
+        async for chunk in body:
+            sent += len(chunk)
+            yield chunk
+        if (recording := getattr(request.state, "recording", None)) is not None:
+            # httpx closes the upstream response once read, so its size and timing are known by now.
+            recording["upstream"] = upstream_entry(proxy_request.url, upstream_response, None)
+            recording["response"] = streamed_response_entry(upstream_response.status_code, sent)
+
+    async def _buffered_exchange(
+        self,
+        request: Request,
+        proxy_transformer: "ProxyTransformer",
+        proxy_request: ProxyRequest,
+        cache: ResponseCache | None,
+    ) -> tuple[BufferedResponse, str | None]:
+        host, route = proxy_transformer.target.host, proxy_transformer.rule.route
+        key = make_cache_key(host, request.method, proxy_request)
+        if cache is not None and (cached := cache.get(key)) is not None:
+            return cached, "HIT"
+        prefetched = self.prefetch_caches.get((host, route))
+        if prefetched is not None and (cached := prefetched.get(key)) is not None:
+            return cached, "PREFETCHED"
+
+        # Identical requests in flight at the same time (including prefetches) share one upstream
+        # call and transformation.
+        return await self.inflight.do(
+            key,
+            functools.partial(self._fetch, request, proxy_transformer, proxy_request, cache, key),
+        )
+
+    async def _fetch(
+        self,
+        request: Request,
+        proxy_transformer: "ProxyTransformer",
+        proxy_request: ProxyRequest,
+        cache: ResponseCache | None,
+        key: CacheKey,
+    ) -> tuple[BufferedResponse, str | None]:
+        if cache is None:
+            response = await self._send(request, proxy_transformer.target, proxy_request)
+            return await self._buffer(request, proxy_transformer, proxy_request, response), None
+
+        stale = cache.get_stale(key)
+        if stale is not None:
+            proxy_request.headers.update(stale.validators)
+
+        response = await self._send(request, proxy_transformer.target, proxy_request)
+
+        if stale is not None and response.status_code == 304:
+            # Unchanged upstream: neither the body nor the actions are needed to answer.
+            await response.aclose()
+            cache.refresh(key)
+            return stale, "REVALIDATED"
+
+        buffered = await self._buffer(request, proxy_transformer, proxy_request, response)
+        if buffered.status_code == 200:
+            cache.set(key, buffered)
+        return buffered, "MISS"
+
+    def _schedule_prefetch(self, request: Request, rule: Rule, next_url: str):
+        if len(self._prefetches) >= self.config.PREFETCH_MAX_CONCURRENCY:
+            return
+        task = asyncio.create_task(self._prefetch(request, rule.prefetch.depth, next_url))
+        self._prefetches.add(task)
+        task.add_done_callback(self._prefetches.discard)
+
+    async def _prefetch(self, request: Request, depth: int, next_url: str | None):
+        """Fetches and transforms the pages following the one just served, ahead of the client asking."""
+        timing.detach()
+        tracing.detach()
+        for _ in range(depth):
+            if next_url is None:
+                return
+            url = urlsplit(next_url)
+            subrequest = make_subrequest(request, "GET", url.path, url.query)
             try:
-                if request.method == "GET":
-                    response = await client.get(
-                        proxy_request.url,
-                        headers=proxy_request.headers,
-                    )
-                elif request.method == "POST":
-                    response = await client.post(
-                        proxy_request.url,
-                        headers=proxy_request.headers,
-                        data=proxy_request.json_data,
-                    )
-                elif request.method == "PUT":
-                    response = await client.put(
-                        proxy_request.url,
-                        headers=proxy_request.headers,
-                        data=proxy_request.json_data,
-                    )
-                elif request.method == "PATCH":
-                    response = await client.patch(
-                        proxy_request.url,
-                        headers=proxy_request.headers,
-                        data=proxy_request.json_data,
-                    )
-                elif request.method == "DELETE":
-                    response = await client.delete(
-                        proxy_request.url,
-                        headers=proxy_request.headers,
-                    )
-                elif request.method == "HEAD":
-                    response = await client.head(
-                        proxy_request.url,
-                        headers=proxy_request.headers,
-                    )
-                elif request.method == "OPTIONS":
-                    response = await client.options(
-                        proxy_request.url,
-                        headers=proxy_request.headers,
-                    )
-                else:
-                    raise HttpMethodNotSupportedException(f"Unexpected http method: {request.method}")
-            except httpx.TimeoutException as e:
-                raise ProxyClientTimeoutException(f"Request timed out: {e!s}") from e
+                match = self.matcher.match(subrequest, target_host=request.headers[PROXY_HOST_HEADER])
+                if match is None or match["rule"].prefetch is None:
+                    return
+                proxy_transformer = self._transformer(match)
+                proxy_request = await proxy_transformer.transform_request(subrequest)
+                cache = self.response_caches.get((match["target"].host, match["rule"].route))
+                buffered, cache_status = await self._buffered_exchange(
+                    subrequest, proxy_transformer, proxy_request, cache
+                )
+            except Exception as e:
+                logger.warning(
+                    "Prefetching next page failed",
+                    extra={"correlation_id": request.state.correlation_id, "url": next_url, "exception": str(e)},
+                )
+                return
 
+            if cache_status is None and buffered.status_code == 200:
+                # Rules with a response cache already stored it there.
+                key = make_cache_key(match["target"].host, "GET", proxy_request)
+                self.prefetch_caches[(match["target"].host, match["rule"].route)].set(key, buffered)
+            logger.debug(
+                "Prefetched next page",
+                extra={"correlation_id": request.state.correlation_id, "url": next_url, "cache": cache_status},
+            )
+            next_url = buffered.next_url
+
+    async def _send(self, request: Request, target: Source, proxy_request: ProxyRequest) -> httpx.Response:
+        client = self.upstreams.client(target)
+        upstream_request = client.build_request(
+            request.method,
+            proxy_request.url,
+            headers=proxy_request.headers,
+            content=proxy_request.content if request.method in BODY_METHODS else None,
+        )
+        status = "error"
+        start_time = time.perf_counter()
+        self.metrics.upstream_in_flight.inc((target.host,))
         try:
-            proxy_response = await proxy_transformer.transform_response(request, response)
-        except Exception as e:
-            raise TransformationException(f"Error transforming response: {e!s}") from e
+            with timing.phase("upstream"):
+                if (span := tracing.current()) is not None:
+                    span.set("url.full", str(upstream_request.url.copy_with(query=None)))
+                    upstream_request.headers[tracing.TRACEPARENT_HEADER] = span.traceparent
+                response = await self.upstreams.send(target, upstream_request)
+        except httpx.TimeoutException as e:
+            status = "timeout"
+            raise ProxyClientTimeoutException(f"Request timed out: {e!s}") from e
+        else:
+            status = str(response.status_code)
+            return response
+        finally:
+            self.metrics.upstream_in_flight.dec((target.host,))
+            self.metrics.upstream_duration.observe(
+                time.perf_counter() - start_time, (target.host, request.method, status)
+            )
 
-        return JSONResponse(
-            content=proxy_response.json_data,
-            status_code=proxy_response.status_code,
-            headers=dict(proxy_response.headers),
+    async def _buffer(
+        self,
+        request: Request,
+        proxy_transformer: "ProxyTransformer",
+        proxy_request: ProxyRequest,
+        response: httpx.Response,
+    ) -> BufferedResponse:
+        try:
+            with timing.phase("upstream_body"):
+                body = await read_upstream_body(
+                    response,
+                    proxy_transformer.max_response_bytes,
+                    spill_bytes=self.config.BUFFER_SPILL_BYTES,
+                    budget=self.memory_budget,
+                )
+        except httpx.TimeoutException as e:
+            raise ProxyClientTimeoutException(f"Request timed out: {e!s}") from e
+        finally:
+            await response.aclose()
+        try:
+            return await self._transform_body(request, proxy_transformer, proxy_request, response, body)
+        finally:
+            body.close()
+
+    async def _transform_body(
+        self,
+        request: Request,
+        proxy_transformer: "ProxyTransformer",
+        proxy_request: ProxyRequest,
+        response: httpx.Response,
+        upstream_body: UpstreamBody,
+    ) -> BufferedResponse:
+        json_data = None
+        if proxy_transformer.rule.passthrough:
+            buffered = self._buffered_response(
+                response, response.status_code, response.headers, upstream_body.getvalue()
+            )
+        else:
+            try:
+                with tracing.span("transform_response"):
+                    proxy_response = await proxy_transformer.transform_response(request, response, upstream_body.view())
+            except Exception as e:
+                raise TransformationException(f"Error transforming response: {e!s}") from e
+
+            json_data = proxy_response.json_data
+            with timing.phase("serialize"):
+                body = self.json_codec.dumps(json_data)
+            buffered = self._buffered_response(
+                response,
+                proxy_response.status_code,
+                {"content-type": "application/json", **proxy_response.headers},
+                body,
+            )
+
+        if (recording := getattr(request.state, "recording", None)) is not None:
+            raw_bodies = self.recorder is not None and self.recorder.raw_bodies
+            recorded_body = upstream_body.getvalue() if raw_bodies else buffered.body
+            recording["upstream"] = upstream_entry(proxy_request.url, response, recorded_body)
+
+        if proxy_transformer.rule.prefetch is not None and buffered.status_code == 200:
+            buffered.next_url = next_page_url(proxy_request.url, response.headers, json_data)
+        return buffered
+
+    def _buffered_response(
+        self,
+        upstream_response: httpx.Response,
+        status_code: int,
+        headers: Mapping[str, str],
+        body: bytes,
+    ) -> BufferedResponse:
+        headers = MutableHeaders({k: v for k, v in headers.items() if k.lower() not in STRIP_RESPONSE_HEADERS})
+        headers["etag"] = entity_tag(body)
+        return BufferedResponse(
+            status_code=status_code,
+            headers=headers,
+            body=body,
+            validators=upstream_validators(upstream_response.headers),
         )
 
+    def _render(self, request: Request, buffered: BufferedResponse, cache_status: str | None = None) -> Response:
+        if (recording := getattr(request.state, "recording", None)) is not None:
+            recording["response"] = response_entry(buffered.status_code, buffered.body, cache_status)
+        if buffered.status_code == 200 and is_not_modified(request.headers, buffered.headers):
+            response = not_modified_response(buffered)
+            if cache_status is not None:
+                response.headers[PROXY_CACHE_HEADER] = cache_status
+            response.headers.append("vary", "Accept-Encoding")
+            return response
+
+        response = Response(content=buffered.body, status_code=buffered.status_code, headers=dict(buffered.headers))
+        if cache_status is not None:
+            response.headers[PROXY_CACHE_HEADER] = cache_status
+        with timing.phase("compress"):
+            return compress_response(
+                response,
+                negotiate(request.headers.get("accept-encoding"), self.config.RESPONSE_COMPRESSION_ENCODINGS),
+                level=self.config.RESPONSE_COMPRESSION_LEVEL,
+                min_bytes=self.config.RESPONSE_COMPRESSION_MIN_BYTES,
+            )
+
     @copy_signature(action_registry.register)
     def action(self, *args, **kwargs):
         return self.actions.register(*args, **kwargs)
@@ -297,8 +896,48 @@ class Guardette:
     def auth_handler(self, *args, **kwargs):
         return self.auth.register(*args, **kwargs)
 
+    def trace_exporter(self, exporter: tracing.SpanExporter) -> tracing.SpanExporter:
+        """Sends the spans of sampled requests to `exporter`, in place of the one configured."""
+        self.tracer.shutdown()
+        self.tracer.exporter = exporter
+        return exporter
+
+    def timing_hook(self, hook: TimingHook) -> TimingHook:
+        """Registers a callable that receives the phase timings of every request once it's handled."""
+        self.timing_hooks.append(hook)
+        return hook
+
+    async def startup(self):
+        self.upstreams.open(self.policy.sources)
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, self._schedule_reload, "SIGHUP")
+        except (AttributeError, NotImplementedError, RuntimeError, ValueError):
+            # No SIGHUP on Windows, and signal handlers can only be set from the main thread.
+            logger.debug("Policy reload on SIGHUP unavailable")
+        if self.config.POLICY_RELOAD_INTERVAL_SECS:
+            task = asyncio.create_task(self._watch_policy_file(self.config.POLICY_RELOAD_INTERVAL_SECS))
+            self._reloads.add(task)
+            task.add_done_callback(self._reloads.discard)
+
+    async def shutdown(self):
+        with contextlib.suppress(AttributeError, NotImplementedError, RuntimeError, ValueError):
+            asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+        for task in [*self._prefetches, *self._reloads]:
+            task.cancel()
+        await asyncio.gather(*self._prefetches, *self._reloads, return_exceptions=True)
+        await self.upstreams.aclose()
+        self.action_executor.shutdown()
+        self.tracer.shutdown()
+        if self.recorder is not None:
+            self.recorder.shutdown()
+
     def to_fastapi(self, app: FastAPI):
+        app.router.add_event_handler("startup", self.startup)
+        app.router.add_event_handler("shutdown", self.shutdown)
         app.api_route("/_guardette/meta", methods=["GET"])(self._meta_route)
+        app.api_route("/_guardette/metrics", methods=["GET"])(self._metrics_route)
+        app.api_route("/_guardette/reload", methods=["POST"])(self._reload_route)
+        app.api_route("/_guardette/batch", methods=["POST"])(self._batch_route)
         app.api_route(
             "/{path:path}",
             methods=["GET", "POST", "PUT", "DELETE", "HEAD", "OPTIONS", "PATCH"],
@@ -312,21 +951,41 @@ class ProxyTransformer:
         auth: AuthHandlerRegistry,
         config: ConfigManager,
         secrets: SecretsManager,
+        codec: JsonCodec,
         match: SourceMatcherResult,
+        executor: ActionExecutor | None = None,
     ):
         self.auth = auth
         self.config = config
         self.secrets = secrets
+        self.codec = codec
+        self.executor = executor
         self.target = match["target"]
         self.rule = match["rule"]
         self.path_params = match["path_params"]
         self._proxy_request: ProxyRequest | None = None
 
+    @property
+    def max_response_bytes(self) -> int:
+        """Largest upstream body accepted for this source, 0 meaning no limit."""
+        return self.target.max_response_bytes or self.config.RESPONSE_MAX_BYTES
+
+    def buffers_response(self, method: str) -> bool:
+        """
+        Whether the upstream body is read whole (to be coalesced, cached or prefetched, or transformed
+        outside of a stream) rather than streamed to the client.
+        """
+        if method not in COALESCED_METHODS:
+            return False
+        rule = self.rule
+        cached = method == "GET" and rule.cache is not None
+        return cached or rule.prefetch is not None or not (rule.passthrough or rule.stream_plan)
+
     async def transform_request(self, in_request: Request) -> ProxyRequest:
         correlation_id = in_request.state.correlation_id
         url = str(
             URL(
-                scheme="https",
+                scheme=self.target.scheme,
                 hostname=self.target.host,  # Your new hostname
                 path=in_request.url.path,
                 query=in_request.url.query,
@@ -337,25 +996,43 @@ class ProxyTransformer:
         headers = MutableHeaders(
             {k: v for k, v in in_request.headers.items() if k.lower() not in STRIP_REQUEST_HEADERS},
         )
-        body = await in_request.body()
-        if body:
-            json_data = await in_request.json()
+        if self.rule.passthrough and not self.buffers_response(in_request.method):
+            # The upstream body is relayed byte for byte, so it must arrive in an encoding the client accepts.
+            headers["accept-encoding"] = in_request.headers.get("accept-encoding", "identity")
         else:
-            json_data = None
+            headers["accept-encoding"] = UPSTREAM_ACCEPT_ENCODING
+            for name in CONDITIONAL_REQUEST_HEADERS:
+                del headers[name]
+        request_actions = [action for action in self.rule.actions if action.has_request_hook()]
+        json_data = None
+        content = None
+        if request_actions:
+            # Request hooks may rewrite the body, so it's decoded here and re-encoded once they ran.
+            body = await in_request.body()
+            if body:
+                with timing.phase("parse"):
+                    json_data = self.codec.loads(body)
+        elif "content-length" in in_request.headers or "transfer-encoding" in in_request.headers:
+            content = in_request.stream()
+            if "content-length" in in_request.headers:
+                # Keeps httpx from switching the forwarded body to chunked encoding.
+                headers["content-length"] = in_request.headers["content-length"]
 
         self._proxy_request = ProxyRequest(
             url=url,
             headers=headers,
             json_data=json_data,
+            content=content,
         )
         if self.target.auth:
             logger.debug(f"Using target auth handler: {self.target.auth}", extra={"correlation_id": correlation_id})
-            await self.auth(
-                self.target.auth,
-                request=self._proxy_request,
-                secrets=self.secrets,
-                config=self.config,
-            )
+            with timing.phase("auth"):
+                await self.auth(
+                    self.target.auth,
+                    request=self._proxy_request,
+                    secrets=self.secrets,
+                    config=self.config,
+                )
 
         ctx = ActionContext(
             config=self.config,
@@ -374,11 +1051,21 @@ class ProxyTransformer:
                 "actions": [action.__class__.__name__ for action in self.rule.actions],
             },
         )
-        for action in self.rule.actions:
-            await action.request(ctx)
+        for action in request_actions:
+            with timing.phase(action.phase_name):
+                await action.request(ctx)
+        if self._proxy_request.json_data is not None:
+            with timing.phase("serialize"):
+                self._proxy_request.content = self.codec.dumps(self._proxy_request.json_data)
         return self._proxy_request
 
-    async def transform_response(self, in_request: Request, in_response: httpx.Response) -> ProxyResponse:
+    async def transform_response(
+        self,
+        in_request: Request,
+        in_response: httpx.Response,
+        body: bytes | memoryview | None = None,
+    ) -> ProxyResponse:
+        """Runs the rule's actions on the upstream response, whose body is `body` when already read by the caller."""
         correlation_id = in_request.state.correlation_id
 
         if self._proxy_request is None:
@@ -386,11 +1073,12 @@ class ProxyTransformer:
                 "Cannot call transform_response() without first calling transform_request()",
             )
         status_code = in_response.status_code
-        headers = MutableHeaders(
-            {k: v for k, v in in_response.headers.items() if k.lower() not in STRIP_RESPONSE_HEADERS},
-        )
+        headers = self.response_headers(in_response)
+        if body is None:
+            body = in_response.content
         try:
-            json_data = in_response.json()
+            with timing.phase("parse"):
+                json_data = self.codec.loads(body)
         except Exception as e:
             raise TransformationException("Upstream returned non-JSON response") from e
         ctx = ActionContext(
@@ -402,6 +1090,8 @@ class ProxyTransformer:
                 headers=headers,
                 json_data=json_data,
             ),
+            # Small bodies are transformed faster than they can be handed to another thread.
+            executor=self.executor if len(body) >= self.config.ACTION_EXECUTOR_MIN_BYTES else None,
         )
         logger.debug(
             "Transforming response",
@@ -410,6 +1100,70 @@ class ProxyTransformer:
                 "actions": [action.__class__.__name__ for action in self.rule.actions],
             },
         )
-        for action in self.rule.actions:
-            await action.response(ctx)
+        for action in self.rule.response_actions:
+            with timing.phase(action.phase_name):
+                await action.response(ctx)
         return ctx.response
+
+    def response_headers(self, in_response: httpx.Response) -> MutableHeaders:
+        return MutableHeaders(
+            {k: v for k, v in in_response.headers.items() if k.lower() not in STRIP_RESPONSE_HEADERS},
+        )
+
+    def can_stream_response(self, in_response: httpx.Response) -> bool:
+        if self.rule.stream_plan is None or not in_response.is_success:
+            return False
+        if "json" not in in_response.headers.get("content-type", ""):
+            return False
+        # Upstreams that don't announce a size (chunked) are assumed to be large.
+        content_length = in_response.headers.get("content-length", "")
+        return not content_length.isdigit() or int(content_length) >= self.config.STREAM_TRANSFORM_MIN_BYTES
+
+    async def stream_response(self, in_request: Request, in_response: httpx.Response) -> AsyncIterator[bytes]:
+        correlation_id = in_request.state.correlation_id
+
+        if self._proxy_request is None:
+            raise TransformationException(
+                "Cannot call stream_response() without first calling transform_request()",
+            )
+        plan = self.rule.stream_plan
+        ctx = ActionContext(
+            config=self.config,
+            secrets=self.secrets,
+            request=self._proxy_request,
+            response=ProxyResponse(
+                status_code=in_response.status_code,
+                headers=self.response_headers(in_response),
+                json_data=None,
+            ),
+            executor=self.executor,
+        )
+
+        async def apply(batch: list):
+            ctx.response.json_data = batch
+            for action in plan.fused_actions:
+                await action.response(ctx)
+            if ctx.response.json_data is not batch:
+                # Actions run in a worker process return a copy.
+                batch[:] = ctx.response.json_data
+
+        logger.debug(
+            "Streaming response transformation",
+            extra={
+                "correlation_id": correlation_id,
+                "actions": [action.__class__.__name__ for action in plan.actions],
+                "stream_key": plan.key,
+            },
+        )
+        try:
+            chunks = limit_stream(in_response.aiter_bytes(), self.max_response_bytes)
+            async for data in transform_json_stream(chunks, plan, apply, dumps=self.codec.dumps):
+                yield data
+        except Exception as e:
+            # Headers are already sent at this point, so the client only sees a truncated body.
+            logger.error(
+                "Error transforming streamed response",
+                exc_info=True,
+                extra={"correlation_id": correlation_id, "exception": str(e)},
+            )
+            raise
@@ -0,0 +1,174 @@
+import base64
+import hashlib
+import json
+import logging
+import random
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any
+from urllib.parse import unquote_plus, urlsplit, urlunsplit
+
+import httpx
+from starlette.requests import Request
+
+from guardette.constants import PROXY_HOST_HEADER
+
+logger = logging.getLogger("guardette")
+
+# Headers never written to a recording: credentials, and headers describing a body's encoding on the
+# wire (recorded bodies are decoded). Any header or query parameter whose name contains one of the
+# markers (`_` read as `-`) is dropped too.
+_DROPPED_HEADERS = frozenset(
+    {
+        PROXY_HOST_HEADER.lower(),
+        "connection",
+        "content-encoding",
+        "content-length",
+        "keep-alive",
+        "transfer-encoding",
+    }
+)
+_SENSITIVE_MARKERS = (
+    "auth",
+    "cookie",
+    "token",
+    "secret",
+    "password",
+    "api-key",
+    "apikey",
+    "session",
+    "signature",
+)
+
+
+def _is_sensitive(name: str) -> bool:
+    name = name.lower().replace("_", "-")
+    return any(marker in name for marker in _SENSITIVE_MARKERS)
+
+
+def sanitize_headers(headers: Mapping[str, str]) -> dict[str, str]:
+    return {
+        name.lower(): value
+        for name, value in headers.items()
+        if name.lower() not in _DROPPED_HEADERS and not _is_sensitive(name)
+    }
+
+
+def sanitize_query(query: str) -> str:
+    """`query` without credential parameters (GitLab's `private_token`, `access_token`, ...), otherwise as sent."""
+    return "&".join(
+        param for param in query.split("&") if param and not _is_sensitive(unquote_plus(param.partition("=")[0]))
+    )
+
+
+def sanitize_url(url: str) -> str:
+    parts = urlsplit(url)
+    return urlunsplit(parts._replace(netloc=parts.netloc.rpartition("@")[2], query=sanitize_query(parts.query)))
+
+
+def encode_body(body: bytes) -> dict[str, str]:
+    """`{"body": text}` for UTF-8 bodies, `{"body_base64": ...}` for anything else."""
+    try:
+        return {"body": body.decode()}
+    except UnicodeDecodeError:
+        return {"body_base64": base64.b64encode(body).decode()}
+
+
+def decode_body(entry: Mapping[str, Any]) -> bytes:
+    if "body_base64" in entry:
+        return base64.b64decode(entry["body_base64"])
+    return entry.get("body", "").encode()
+
+
+def body_digest(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+class Recorder:
+    """
+    Appends a sample of proxied exchanges to a file, one JSON object per line: the client's request,
+    the upstream response it was answered from and a digest of what the client got back.
+
+    Credential headers and query parameters are left out. Upstream bodies are recorded as the client
+    received them, after the actions ran, and client bodies only by size. With `raw_bodies`, both are
+    recorded as received instead: the recording then holds exactly the data the policy keeps from clients.
+    Streamed and passthrough responses are never held in memory whole, so theirs are recorded by size.
+    """
+
+    def __init__(self, path: str, sample_rate: float = 1.0, raw_bodies: bool = False):
+        self.sample_rate = sample_rate
+        self.raw_bodies = raw_bodies
+        self._file = Path(path).open("a", buffering=1)  # noqa: SIM115
+        self._lock = threading.Lock()
+
+    def sample(self) -> bool:
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate  # noqa: S311
+
+    def record(self, request: Request, body: bytes, start_time: float, elapsed_secs: float):
+        """Writes the exchange collected in `request.state.recording` while the request was proxied."""
+        recording = request.state.recording
+        exchange = {
+            "time": start_time,
+            "elapsed_ms": round(elapsed_secs * 1000, 3),
+            # Whether the bodies below are the ones received, rather than transformed or left out.
+            "raw_bodies": self.raw_bodies,
+            "request": {
+                "method": request.method,
+                "host": request.headers.get(PROXY_HOST_HEADER),
+                "path": request.url.path,
+                "query": sanitize_query(request.url.query),
+                "headers": sanitize_headers(request.headers),
+                **self._request_body(body),
+            },
+            # None when the response came from a cache or a concurrent identical request.
+            "upstream": recording.get("upstream"),
+            "response": recording["response"],
+        }
+        line = json.dumps(exchange) + "\n"
+        with self._lock:
+            self._file.write(line)
+
+    def _request_body(self, body: bytes) -> dict[str, Any]:
+        if not body:
+            return {}
+        return encode_body(body) if self.raw_bodies else {"body_size": len(body)}
+
+    def shutdown(self):
+        self._file.close()
+
+
+def upstream_entry(url: str, response: httpx.Response, body: bytes | None) -> dict[str, Any]:
+    """
+    The recorded form of the upstream response to the request sent to `url`, with `body` standing for
+    what it returned: its own body, or the transformed one unless the recorder keeps raw bodies. A
+    response streamed through, without `body`, is recorded by the size it was downloaded at.
+    """
+    try:
+        elapsed_ms = round(response.elapsed.total_seconds() * 1000, 3)
+    except RuntimeError:
+        # Only responses that came over the network know how long they took.
+        elapsed_ms = None
+    return {
+        "url": sanitize_url(url),
+        "status_code": response.status_code,
+        "headers": sanitize_headers(response.headers),
+        "elapsed_ms": elapsed_ms,
+        **(encode_body(body) if body is not None else {"size": response.num_bytes_downloaded}),
+    }
+
+
+def response_entry(status_code: int, body: bytes, cache_status: str | None) -> dict[str, Any]:
+    return {"status_code": status_code, "size": len(body), "sha256": body_digest(body), "cache": cache_status}
+
+
+def streamed_response_entry(status_code: int, size: int) -> dict[str, Any]:
+    return {"status_code": status_code, "size": size, "sha256": None, "cache": None}
+
+
+def make_recorder(path: str, sample_rate: float, raw_bodies: bool = False) -> Recorder | None:
+    if not path:
+        return None
+    if raw_bodies:
+        logger.warning("Recording proxied exchanges, including unredacted bodies", extra={"path": path})
+    return Recorder(path, sample_rate, raw_bodies)
@@ -0,0 +1,44 @@
+import bisect
+import random
+from collections import deque
+
+import httpx
+
+from guardette.policy import Retry
+
+RETRYABLE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# Failures that happen before the upstream could have acted on the request, or a connection reset
+# while waiting for its response.
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError, httpx.ReadError)
+
+# Hedging waits for this many latency samples before it trusts the percentile.
+MIN_LATENCY_SAMPLES = 20
+
+
+def backoff_delay(retry: Retry, attempt: int) -> float:
+    """Exponential backoff with full jitter before the given (1-based) retry."""
+    return random.uniform(0, min(retry.max_backoff_secs, retry.backoff_secs * 2 ** (attempt - 1)))  # noqa: S311
+
+
+class LatencyTracker:
+    """Response latencies of the most recent upstream requests, to derive the hedging delay from."""
+
+    def __init__(self, window: int = 256):
+        self._samples: deque[float] = deque(maxlen=window)
+        self._sorted: list[float] = []
+
+    def __len__(self):
+        return len(self._samples)
+
+    def observe(self, secs: float):
+        if len(self._samples) == self._samples.maxlen:
+            del self._sorted[bisect.bisect_left(self._sorted, self._samples[0])]
+        self._samples.append(secs)
+        bisect.insort(self._sorted, secs)
+
+    def percentile(self, percentile: float) -> float | None:
+        if len(self._sorted) < MIN_LATENCY_SAMPLES:
+            return None
+        index = min(int(len(self._sorted) * percentile / 100), len(self._sorted) - 1)
+        return self._sorted[index]
@@ -0,0 +1,57 @@
+import hashlib
+from collections.abc import Mapping
+from email.utils import parsedate_to_datetime
+
+from starlette.responses import Response
+
+from guardette.datastructures import BufferedResponse
+
+# Client validators refer to the representation Guardette rendered, not to the upstream one, so they
+# are only forwarded when the upstream body is relayed untouched.
+CONDITIONAL_REQUEST_HEADERS = {"if-none-match", "if-modified-since"}
+
+# Headers a 304 carries over from the response it stands in for (RFC 9110, section 15.4.5).
+NOT_MODIFIED_HEADERS = ("cache-control", "content-location", "date", "etag", "expires", "last-modified", "vary")
+
+
+def entity_tag(body: bytes) -> str:
+    # Weak, because the same body is sent with different content encodings.
+    return f'W/"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def upstream_validators(headers: Mapping[str, str]) -> dict[str, str]:
+    """Returns the conditional request headers that revalidate a response with the upstream."""
+    validators = {}
+    if etag := headers.get("etag"):
+        validators["if-none-match"] = etag
+    if last_modified := headers.get("last-modified"):
+        validators["if-modified-since"] = last_modified
+    return validators
+
+
+def _opaque_tag(etag: str) -> str:
+    return etag.strip().removeprefix("W/")
+
+
+def is_not_modified(request_headers: Mapping[str, str], response_headers: Mapping[str, str]) -> bool:
+    """Evaluates the client's If-None-Match / If-Modified-Since against a response we are about to send."""
+    if if_none_match := request_headers.get("if-none-match"):
+        etag = response_headers.get("etag")
+        if etag is None:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or _opaque_tag(etag) in {_opaque_tag(tag) for tag in tags}
+
+    if_modified_since = request_headers.get("if-modified-since")
+    last_modified = response_headers.get("last-modified")
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def not_modified_response(response: BufferedResponse) -> Response:
+    headers = {k: v for k, v in response.headers.items() if k.lower() in NOT_MODIFIED_HEADERS}
+    return Response(status_code=304, headers=headers)
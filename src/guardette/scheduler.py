@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator, Mapping
+from contextlib import asynccontextmanager
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+
+from guardette.exceptions import UpstreamRateLimitedException
+from guardette.policy import RateLimit
+
+logger = logging.getLogger("guardette")
+
+# GitHub and Jira use the `X-` prefixed names, GitLab and the IETF draft the plain ones.
+REMAINING_HEADERS = ("x-ratelimit-remaining", "ratelimit-remaining")
+RESET_HEADERS = ("x-ratelimit-reset", "ratelimit-reset")
+
+# Status codes upstreams use to reject requests over their rate limit.
+THROTTLED_STATUS_CODES = {403, 429, 503}
+
+# Reset values above this are epoch timestamps (GitHub, GitLab), below it a number of seconds.
+_EPOCH_THRESHOLD = 1_000_000_000
+
+
+def parse_delay(value: str, now: float) -> float | None:
+    """
+    Parses a `Retry-After` / rate limit reset header into seconds from `now` (a wall clock time).
+    Accepts delta seconds, epoch timestamps, HTTP dates and ISO 8601 timestamps.
+    """
+    value = value.strip()
+    try:
+        number = float(value)
+    except ValueError:
+        pass
+    else:
+        return max(number - now if number > _EPOCH_THRESHOLD else number, 0.0)
+
+    for parse in (parsedate_to_datetime, datetime.fromisoformat):
+        try:
+            return max(parse(value).timestamp() - now, 0.0)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+class SourceScheduler:
+    """
+    Paces the requests sent to one upstream: a token bucket and a concurrency cap from the source's
+    `rate_limit` settings, and a pause whenever the upstream reports its budget is spent.
+    """
+
+    def __init__(self, host: str, rate_limit: RateLimit):
+        self.host = host
+        self.rate_limit = rate_limit
+        self.queue_depth = 0
+        self.in_flight = 0
+        self.waited = 0
+        self.wait_secs_total = 0.0
+        self.wait_secs_max = 0.0
+        self.rejected = 0
+        self.remaining: int | None = None
+
+        # Requests take turns through the bucket, so they are sent in arrival order.
+        self._lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(rate_limit.max_concurrency) if rate_limit.max_concurrency else None
+        self._tokens = float(rate_limit.burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Waits until a request may be sent upstream, holding a concurrency slot while it is."""
+        start_time = time.monotonic()
+        deadline = start_time + self.rate_limit.max_wait_secs
+        self.queue_depth += 1
+        try:
+            async with asyncio.timeout_at(self._loop_time(deadline)):
+                if self._semaphore is not None:
+                    await self._semaphore.acquire()
+                try:
+                    async with self._lock:
+                        await self._take_token(deadline)
+                except BaseException:
+                    if self._semaphore is not None:
+                        self._semaphore.release()
+                    raise
+        except TimeoutError as e:
+            self.rejected += 1
+            raise UpstreamRateLimitedException(
+                f"No upstream capacity for '{self.host}' within {self.rate_limit.max_wait_secs}s."
+            ) from e
+        finally:
+            self.queue_depth -= 1
+
+        wait_secs = time.monotonic() - start_time
+        if wait_secs > 0.001:
+            self.waited += 1
+        self.wait_secs_total += wait_secs
+        self.wait_secs_max = max(self.wait_secs_max, wait_secs)
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            if self._semaphore is not None:
+                self._semaphore.release()
+
+    def _loop_time(self, monotonic_time: float) -> float:
+        loop = asyncio.get_running_loop()
+        return loop.time() + (monotonic_time - time.monotonic())
+
+    async def _take_token(self, deadline: float):
+        while True:
+            now = time.monotonic()
+            delay = self._paused_until - now
+            if delay <= 0 and self.rate_limit.requests_per_second:
+                rate = self.rate_limit.requests_per_second
+                self._tokens = min(self.rate_limit.burst, self._tokens + (now - self._refilled_at) * rate)
+                self._refilled_at = now
+                delay = (1 - self._tokens) / rate
+            if delay <= 0:
+                self._tokens -= 1
+                return
+            if now + delay > deadline:
+                # No point in holding the queue for a slot that won't come in time.
+                raise TimeoutError
+            await asyncio.sleep(delay)
+
+    def observe(self, status_code: int, headers: Mapping[str, str]):
+        """Updates the remaining budget from an upstream response, pausing when it's spent."""
+        now = time.time()
+        remaining = next((headers[name] for name in REMAINING_HEADERS if name in headers), None)
+        if remaining is not None and remaining.isdigit():
+            self.remaining = int(remaining)
+
+        delay = None
+        if "retry-after" in headers:
+            delay = parse_delay(headers["retry-after"], now)
+        elif self.remaining == 0 or (status_code in THROTTLED_STATUS_CODES and remaining is not None):
+            reset = next((headers[name] for name in RESET_HEADERS if name in headers), None)
+            if reset is not None:
+                delay = parse_delay(reset, now)
+
+        if delay:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            logger.warning(
+                "Upstream rate limit reached, pausing requests",
+                extra={"host": self.host, "status_code": status_code, "pause_secs": f"{delay:.3f}"},
+            )
+
+    def stats(self) -> dict[str, int | float | None]:
+        return {
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "waited": self.waited,
+            "wait_secs_total": round(self.wait_secs_total, 6),
+            "wait_secs_max": round(self.wait_secs_max, 6),
+            "rejected": self.rejected,
+            "remaining": self.remaining,
+            "paused_for_secs": round(max(self._paused_until - time.monotonic(), 0.0), 3),
+        }
@@ -5,8 +5,10 @@ from typing import Protocol
 from aiobotocore.session import get_session
 from types_aiobotocore_secretsmanager import SecretsManagerClient
 
+from guardette import tracing
 from guardette.config import ConfigManager
 from guardette.exceptions import ConfigurationException, SecretsRetrievalException
+from guardette.metrics import CacheStats
 
 logger = logging.getLogger("guardette")
 
@@ -38,6 +40,7 @@ class AwsSecretsManager:
 
         # key: (secret, expiry_time)
         self._cache: dict[str, tuple[str, float]] = {}
+        self.cache_stats = CacheStats()
 
     async def get(self, key, correlation_id: str | None = None) -> str:
         current_time = time.time()
@@ -45,10 +48,12 @@ class AwsSecretsManager:
         if key in self._cache:
             secret, expiry = self._cache[key]
             if current_time < expiry:
+                self.cache_stats.hit()
                 return secret
             # Remove expired secret
             del self._cache[key]
 
+        self.cache_stats.miss()
         secret = await self._fetch_secret(key, correlation_id)
         self._cache[key] = (secret, current_time + self.cache_ttl_secs)
         return secret
@@ -61,10 +66,11 @@ class AwsSecretsManager:
         logger.info(f"Fetching secret from AWS for {key}", extra={"correlation_id": correlation_id})
         session = get_session()
         try:
-            async with session.create_client("secretsmanager") as client:
-                client: SecretsManagerClient
+            with tracing.span("secrets.fetch", key=key):
+                async with session.create_client("secretsmanager") as client:
+                    client: SecretsManagerClient
 
-                secret_value_resp = await client.get_secret_value(SecretId=secret_id)
-                return secret_value_resp["SecretString"]
+                    secret_value_resp = await client.get_secret_value(SecretId=secret_id)
+                    return secret_value_resp["SecretString"]
         except Exception as e:
             raise SecretsRetrievalException(f"Error fetching secret from AWS for {key}: {e!s}") from e
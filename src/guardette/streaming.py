@@ -0,0 +1,258 @@
+import codecs
+import json
+import re
+from collections.abc import AsyncIterable, AsyncIterator, Awaitable, Callable
+from typing import Any, NamedTuple
+
+from guardette.actions import Action
+from guardette.exceptions import TransformationException
+from guardette.fusion import fuse_actions
+
+# `$.key[*]<rest>`, `$['key'][*]<rest>` or `$[*]<rest>`, where <rest> selects something inside each element.
+_SPLIT_PATH_RE = re.compile(
+    r"""^\$
+    (?:\.(?P<key>[A-Za-z_][\w-]*) | \[(?P<quote>['"])(?P<qkey>[^'"]+)(?P=quote)\])?
+    \[\*\]
+    (?P<rest>[.\[].*)$""",
+    re.VERBOSE,
+)
+_WHITESPACE_RE = re.compile(r"[ \t\n\r]*")
+
+# Elements are transformed in batches of roughly this many source characters, and output is
+# flushed to the client once this many bytes are pending.
+_BATCH_CHARS = 256 * 1024
+_FLUSH_BYTES = 64 * 1024
+
+_decoder = json.JSONDecoder()
+
+
+class StreamPlan(NamedTuple):
+    # Top-level key holding the array to stream, or None when the document itself is the array.
+    key: str | None
+    # Copies of the rule's response actions with json_paths rewritten to `$[*]<rest>`, so they run
+    # against a batch (list) of elements instead of the whole document.
+    actions: list[Action]
+    # The same, with fusable ones merged by `fuse_actions`: what runs on each batch.
+    fused_actions: list[Action]
+
+
+def compile_stream_plan(actions: list[Action]) -> StreamPlan | None:
+    """
+    Returns a plan when every response action only touches values inside the elements of one
+    array (e.g. `$.issues[*]...`), so that array can be transformed element by element as it
+    streams past. Returns None when the rule needs the whole document.
+    """
+    response_actions = [action for action in actions if action.has_response_hook()]
+    if not response_actions:
+        return None
+
+    keys = set()
+    batch_actions = []
+    for action in response_actions:
+        json_paths = getattr(action, "json_paths", None)
+        if not action.streamable or not json_paths:
+            return None
+
+        batch_paths = []
+        for path in json_paths:
+            m = _SPLIT_PATH_RE.match(path)
+            if m is None:
+                return None
+            keys.add(m["key"] or m["qkey"])
+            batch_paths.append("$[*]" + m["rest"])
+        batch_actions.append(action.model_copy(update={"json_paths": batch_paths}))
+
+    if len(keys) != 1:
+        return None
+    return StreamPlan(key=keys.pop(), actions=batch_actions, fused_actions=fuse_actions(batch_actions))
+
+
+class _JsonReader:
+    """Buffers just enough of a UTF-8 byte stream to decode the next JSON value."""
+
+    def __init__(self, chunks: AsyncIterable[bytes]):
+        self._chunks = aiter(chunks)
+        self._decode = codecs.getincrementaldecoder("utf-8")().decode
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    async def _fill(self) -> bool:
+        if self._eof:
+            return False
+        # Read at least as much as is already buffered, so re-decoding a value that spans many
+        # chunks stays linear in its size.
+        parts = [self._buf[self._pos :]]
+        target = max(len(parts[0]), 1)
+        read = 0
+        while read < target:
+            try:
+                chunk = await anext(self._chunks)
+            except StopAsyncIteration:
+                parts.append(self._decode(b"", final=True))
+                self._eof = True
+                break
+            text = self._decode(chunk)
+            parts.append(text)
+            read += len(text)
+        self._buf = "".join(parts)
+        self._pos = 0
+        return True
+
+    async def peek(self) -> str:
+        """Skips whitespace and returns the next character, or "" at the end of the stream."""
+        while True:
+            self._pos = _WHITESPACE_RE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not await self._fill():
+                return ""
+
+    async def expect(self, char: str):
+        if await self.peek() != char:
+            raise TransformationException(f"Malformed JSON in upstream response: expected '{char}'")
+        self._pos += 1
+
+    async def value(self) -> tuple[Any, str]:
+        """Decodes the next value, returning it along with its source text."""
+        await self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError as e:
+                if not await self._fill():
+                    raise TransformationException("Malformed JSON in upstream response") from e
+                continue
+            if end == len(self._buf) and not self._eof:
+                # A number at the end of the buffer may continue in the next chunk.
+                await self._fill()
+                continue
+            text = self._buf[self._pos : end]
+            self._pos = end
+            return value, text
+
+
+class _Writer:
+    def __init__(self, dumps: Callable[[Any], bytes]):
+        self.dumps = dumps
+        self._parts: list[bytes] = []
+        self._size = 0
+
+    def write(self, data: bytes):
+        self._parts.append(data)
+        self._size += len(data)
+
+    def write_text(self, text: str):
+        self.write(text.encode())
+
+    def write_value(self, value: Any):
+        self.write(self.dumps(value))
+
+    @property
+    def full(self) -> bool:
+        return self._size >= _FLUSH_BYTES
+
+    def flush(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        self._size = 0
+        return data
+
+
+BatchTransformer = Callable[[list], Awaitable[None]]
+
+
+async def _transform_array(reader: _JsonReader, writer: _Writer, apply: BatchTransformer) -> AsyncIterator[bytes]:
+    if await reader.peek() != "[":
+        # `[*]` treats `null` as an empty array and any other value as a single element, same as
+        # jsonpath_ng does.
+        value, text = await reader.value()
+        if value is None:
+            writer.write_text(text)
+            return
+        batch = [value]
+        await apply(batch)
+        writer.write_value(batch[0])
+        return
+
+    await reader.expect("[")
+    writer.write(b"[")
+    if await reader.peek() == "]":
+        await reader.expect("]")
+        writer.write(b"]")
+        return
+
+    first = True
+    done = False
+    while not done:
+        batch = []
+        batch_chars = 0
+        while not done and batch_chars < _BATCH_CHARS:
+            value, text = await reader.value()
+            batch.append(value)
+            batch_chars += len(text)
+            if await reader.peek() == ",":
+                await reader.expect(",")
+            else:
+                await reader.expect("]")
+                done = True
+
+        await apply(batch)
+        for item in batch:
+            if not first:
+                writer.write(b",")
+            first = False
+            writer.write_value(item)
+        if writer.full:
+            yield writer.flush()
+
+    writer.write(b"]")
+
+
+async def transform_json_stream(
+    chunks: AsyncIterable[bytes],
+    plan: StreamPlan,
+    apply: BatchTransformer,
+    dumps: Callable[[Any], bytes],
+) -> AsyncIterator[bytes]:
+    """
+    Incrementally parses a JSON document and yields it back re-encoded, passing the elements of
+    the plan's array through `apply` in batches and rendering them with `dumps`. Everything outside
+    that array is copied verbatim.
+    """
+    reader = _JsonReader(chunks)
+    writer = _Writer(dumps)
+
+    if plan.key is None:
+        async for data in _transform_array(reader, writer, apply):
+            yield data
+    else:
+        await reader.expect("{")
+        writer.write(b"{")
+        first = True
+        while await reader.peek() != "}":
+            if not first:
+                await reader.expect(",")
+                writer.write(b",")
+            first = False
+
+            key, key_text = await reader.value()
+            if not isinstance(key, str):
+                raise TransformationException("Malformed JSON in upstream response: expected object key")
+            await reader.expect(":")
+            writer.write_text(key_text)
+            writer.write(b":")
+            if key == plan.key:
+                async for data in _transform_array(reader, writer, apply):
+                    yield data
+            else:
+                _, text = await reader.value()
+                writer.write_text(text)
+            if writer.full:
+                yield writer.flush()
+        await reader.expect("}")
+        writer.write(b"}")
+
+    if await reader.peek() != "":
+        raise TransformationException("Malformed JSON in upstream response: unexpected trailing data")
+    yield writer.flush()
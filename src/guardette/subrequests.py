@@ -0,0 +1,42 @@
+import uuid
+from collections.abc import Mapping
+from urllib.parse import unquote
+
+from starlette.requests import Request
+
+# Headers describing the parent request's own body, which sub-requests don't have.
+_BODY_HEADERS = {b"content-length", b"content-type", b"transfer-encoding"}
+
+
+async def _empty_body() -> dict:
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+def make_subrequest(
+    parent: Request,
+    method: str,
+    path: str,
+    query: str = "",
+    headers: Mapping[str, str | None] | None = None,
+) -> Request:
+    """
+    Synthesizes a bodyless request that goes through the proxy pipeline like one received from the
+    client, carrying the parent's headers (and so its credentials) unless overridden; a `None`
+    override drops the parent's header. `path` and `query` are URL-encoded, as they appear in a URL.
+    """
+    overrides = {k.lower().encode("latin-1"): v for k, v in (headers or {}).items()}
+    raw_headers = [(k, v) for k, v in parent.scope["headers"] if k not in _BODY_HEADERS and k not in overrides] + [
+        (k, v.encode("latin-1")) for k, v in overrides.items() if v is not None
+    ]
+    scope = {
+        **parent.scope,
+        "method": method.upper(),
+        "path": unquote(path),
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "headers": raw_headers,
+        "state": {},
+    }
+    request = Request(scope, receive=_empty_body)
+    request.state.correlation_id = str(uuid.uuid4())
+    return request
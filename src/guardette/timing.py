@@ -0,0 +1,66 @@
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from guardette import tracing
+
+
+class Timings:
+    """Time spent per phase of handling one request. Phases entered repeatedly add up."""
+
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.phases: dict[str, float] = {}
+
+    def add(self, name: str, secs: float):
+        self.phases[name] = self.phases.get(name, 0.0) + secs
+
+    @property
+    def total(self) -> float:
+        return time.perf_counter() - self.start_time
+
+    def as_dict(self) -> dict[str, float]:
+        """Phase durations in milliseconds, including the total so far."""
+        return {name: round(secs * 1000, 3) for name, secs in [*self.phases.items(), ("total", self.total)]}
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{name};dur={ms}" for name, ms in self.as_dict().items())
+
+
+_current: ContextVar[Timings | None] = ContextVar("guardette_timings", default=None)
+
+
+@contextmanager
+def record() -> Iterator[Timings]:
+    """Collects the phases entered in this context (and tasks it spawns) into a new Timings."""
+    timings = Timings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def current() -> Timings | None:
+    return _current.get()
+
+
+def detach():
+    """Stops recording into the enclosing request's timings, e.g. in a background task it spawned."""
+    _current.set(None)
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Times a phase of the current request, which is also traced as a span when the request is sampled."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start_time = time.perf_counter()
+    try:
+        with tracing.span(name):
+            yield
+    finally:
+        timings.add(name, time.perf_counter() - start_time)
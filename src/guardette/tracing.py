@@ -0,0 +1,198 @@
+import json
+import logging
+import random
+import re
+import secrets
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Protocol
+
+from guardette.exceptions import ConfigurationException
+
+logger = logging.getLogger("guardette")
+
+TRACEPARENT_HEADER = "traceparent"
+
+TRACE_EXPORTERS = ("none", "memory", "file")
+
+# W3C trace context: version-trace_id-parent_id-flags
+_TRACEPARENT_RE = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+_SAMPLED = 0x01
+
+
+class Span:
+    """One timed step of handling a request. Only exists for sampled requests."""
+
+    __slots__ = ("attributes", "end_time", "error", "name", "parent_id", "span_id", "start_time", "trace_id", "tracer")
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_id: str | None, attributes: dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.error: str | None = None
+        self.start_time = time.time_ns()
+        self.end_time: int | None = None
+
+    def set(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    @property
+    def traceparent(self) -> str:
+        """The `traceparent` header that makes this span the parent of a downstream one."""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration_ms": round((self.end_time - self.start_time) / 1e6, 3) if self.end_time else None,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class SpanExporter(Protocol):
+    def export(self, span: Span): ...
+
+    def shutdown(self): ...
+
+
+class InMemoryExporter:
+    """Keeps finished spans in a list, for tests."""
+
+    def __init__(self):
+        self.spans: list[Span] = []
+
+    def export(self, span: Span):
+        self.spans.append(span)
+
+    def shutdown(self):
+        pass
+
+
+class FileExporter:
+    """Appends finished spans to a file, one JSON object per line."""
+
+    def __init__(self, path: str):
+        self._file = Path(path).open("a", buffering=1)  # noqa: SIM115
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+
+    def shutdown(self):
+        self._file.close()
+
+
+def parse_traceparent(value: str | None) -> tuple[str, str, bool] | None:
+    """Returns (trace_id, parent span_id, sampled) from a `traceparent` header, or None if it's invalid."""
+    if not value:
+        return None
+    m = _TRACEPARENT_RE.match(value.strip().lower())
+    if m is None or m[1] == "ff" or m[2] == "0" * 32 or m[3] == "0" * 16:
+        return None
+    return m[2], m[3], bool(int(m[4], 16) & _SAMPLED)
+
+
+_current: ContextVar[Span | None] = ContextVar("guardette_span", default=None)
+
+
+def current() -> Span | None:
+    return _current.get()
+
+
+def detach():
+    """Stops adding spans to the enclosing request's trace, e.g. in a background task it spawned."""
+    _current.set(None)
+
+
+@contextmanager
+def _activate(active: Span) -> Iterator[Span]:
+    token = _current.set(active)
+    try:
+        yield active
+    except BaseException as e:
+        active.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        active.end_time = time.time_ns()
+        active.tracer.export(active)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span | None]:
+    """Opens a child of the current span. Does nothing (and yields None) outside a sampled request."""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    with _activate(Span(parent.tracer, name, parent.trace_id, parent.span_id, attributes)) as child:
+        yield child
+
+
+class Tracer:
+    def __init__(self, exporter: SpanExporter | None = None, sample_rate: float = 1.0):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    @contextmanager
+    def trace(
+        self,
+        name: str,
+        traceparent: str | None = None,
+        attributes: dict[str, Any] | None = None,
+    ) -> Iterator[Span | None]:
+        """
+        Opens the root span of a request, continuing the caller's trace when `traceparent` is valid.
+        Callers that sent a sampling decision get it honoured; other requests are sampled at `sample_rate`.
+        """
+        if self.exporter is None:
+            yield None
+            return
+        parent = parse_traceparent(traceparent)
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+        else:
+            trace_id, parent_id, sampled = None, None, random.random() < self.sample_rate  # noqa: S311
+        if not sampled:
+            yield None
+            return
+        root = Span(self, name, trace_id or secrets.token_hex(16), parent_id, attributes or {})
+        with _activate(root):
+            yield root
+
+    def export(self, span: Span):
+        if self.exporter is None:
+            return
+        try:
+            self.exporter.export(span)
+        except Exception as e:
+            logger.warning("Exporting trace span failed", extra={"span": span.name, "exception": str(e)})
+
+    def shutdown(self):
+        if self.exporter is not None:
+            self.exporter.shutdown()
+
+
+def make_exporter(name: str, path: str) -> SpanExporter | None:
+    if name == "none":
+        return None
+    if name == "memory":
+        return InMemoryExporter()
+    if name == "file":
+        return FileExporter(path)
+    raise ConfigurationException(f"Invalid trace exporter: '{name}'. Options: {', '.join(TRACE_EXPORTERS)}.")
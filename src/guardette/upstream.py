@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from collections.abc import Iterable
+
+import httpx
+
+from guardette.config import ConfigManager
+from guardette.exceptions import ConfigurationException
+from guardette.policy import Source
+from guardette.retry import RETRYABLE_ERRORS, RETRYABLE_METHODS, LatencyTracker, backoff_delay
+from guardette.scheduler import SourceScheduler
+
+logger = logging.getLogger("guardette")
+
+
+class UpstreamPool:
+    """
+    One long-lived `httpx.AsyncClient` per source host, so keep-alive connections are reused across
+    requests, and one scheduler per host pacing what is sent to it. Idempotent requests are retried
+    and hedged according to the source's `retry` settings.
+    """
+
+    def __init__(self, config: ConfigManager):
+        self.config = config
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._schedulers: dict[str, SourceScheduler] = {}
+        self._latencies: dict[str, LatencyTracker] = {}
+        self._counters: dict[str, Counter] = {}
+        self._closing: set[asyncio.Task] = set()
+        self._retired: set[httpx.AsyncClient] = set()
+
+    def open(self, sources: Iterable[Source]):
+        # Both are created up front, from these sources: requests still running with a source a policy
+        # reload replaced look them up by host, and must not recreate them from their stale settings.
+        for source in sources:
+            self.client(source)
+            self.scheduler(source)
+
+    def client(self, source: Source) -> httpx.AsyncClient:
+        client = self._clients.get(source.host)
+        if client is None:
+            client = self._clients[source.host] = self._create_client(source)
+        return client
+
+    def scheduler(self, source: Source) -> SourceScheduler:
+        scheduler = self._schedulers.get(source.host)
+        if scheduler is None:
+            scheduler = self._schedulers[source.host] = SourceScheduler(source.host, source.rate_limit)
+        return scheduler
+
+    async def send(self, source: Source, request: httpx.Request) -> httpx.Response:
+        """Sends a request once the source's scheduler allows it; the response body is left unread."""
+        retry = source.retry
+        if request.method not in RETRYABLE_METHODS:
+            return await self._send_once(source, request)
+
+        counters = self._counters.setdefault(source.host, Counter())
+        attempt = 1
+        while True:
+            try:
+                if retry.hedge:
+                    response = await self._send_hedged(source, request)
+                else:
+                    response = await self._send_once(source, request)
+            except RETRYABLE_ERRORS as e:
+                if attempt >= retry.max_attempts:
+                    raise
+                logger.warning(
+                    "Upstream request failed, retrying",
+                    extra={"host": source.host, "attempt": attempt, "exception": str(e)},
+                )
+            else:
+                if response.status_code not in retry.status_codes or attempt >= retry.max_attempts:
+                    return response
+                await response.aclose()
+                logger.warning(
+                    "Upstream request failed, retrying",
+                    extra={"host": source.host, "attempt": attempt, "status_code": response.status_code},
+                )
+
+            counters["retries"] += 1
+            await asyncio.sleep(backoff_delay(retry, attempt))
+            attempt += 1
+
+    async def _send_once(self, source: Source, request: httpx.Request) -> httpx.Response:
+        scheduler = self.scheduler(source)
+        async with scheduler.slot():
+            start_time = time.monotonic()
+            response = await self.client(source).send(request, stream=True)
+            self._latencies.setdefault(source.host, LatencyTracker()).observe(time.monotonic() - start_time)
+        scheduler.observe(response.status_code, response.headers)
+        return response
+
+    async def _send_hedged(self, source: Source, request: httpx.Request) -> httpx.Response:
+        retry = source.retry
+        delay = self._latencies.setdefault(source.host, LatencyTracker()).percentile(retry.hedge_percentile)
+        first = asyncio.ensure_future(self._send_once(source, request))
+        if delay is None:
+            return await first
+
+        done, _ = await asyncio.wait({first}, timeout=max(delay, retry.hedge_min_delay_secs))
+        if done:
+            return first.result()
+
+        counters = self._counters.setdefault(source.host, Counter())
+        counters["hedges"] += 1
+        second = asyncio.ensure_future(self._send_once(source, request))
+        pending = {first, second}
+        try:
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in done if task.exception() is None), None)
+                if winner is not None:
+                    if winner is second:
+                        counters["hedge_wins"] += 1
+                    pending |= done - {winner}
+                    return winner.result()
+                if not pending:
+                    return done.pop().result()
+        finally:
+            for task in pending:
+                self._discard(task)
+
+    def _discard(self, task: asyncio.Task):
+        """Cancels the losing attempt of a hedged request, closing its response if it already has one."""
+
+        def close(task: asyncio.Task):
+            if not task.cancelled() and task.exception() is None:
+                closing = asyncio.ensure_future(task.result().aclose())
+                self._closing.add(closing)
+                closing.add_done_callback(self._closing.discard)
+
+        task.cancel()
+        task.add_done_callback(close)
+
+    def retire(self, host: str):
+        """
+        Drops the client and scheduler of a source whose connection settings changed, for `open` to
+        create them anew. Requests still using the old client get until the proxy timeout to finish
+        before it's closed.
+        """
+        self._schedulers.pop(host, None)
+        client = self._clients.pop(host, None)
+        if client is None:
+            return
+        self._retired.add(client)
+        closing = asyncio.ensure_future(self._close_retired(client))
+        self._closing.add(closing)
+        closing.add_done_callback(self._closing.discard)
+
+    async def _close_retired(self, client: httpx.AsyncClient):
+        await asyncio.sleep(self.config.PROXY_CLIENT_TIMEOUT_SECS)
+        self._retired.discard(client)
+        await client.aclose()
+
+    def stats(self) -> dict[str, dict]:
+        stats = {}
+        for host, scheduler in self._schedulers.items():
+            counters = self._counters.get(host, Counter())
+            stats[host] = {
+                **scheduler.stats(),
+                "retries": counters["retries"],
+                "hedges": counters["hedges"],
+                "hedge_wins": counters["hedge_wins"],
+            }
+        return stats
+
+    def _create_client(self, source: Source) -> httpx.AsyncClient:
+        pool = source.pool
+        try:
+            client = httpx.AsyncClient(
+                timeout=self.config.PROXY_CLIENT_TIMEOUT_SECS,
+                limits=httpx.Limits(
+                    max_connections=pool.max_connections,
+                    max_keepalive_connections=pool.max_keepalive_connections,
+                    keepalive_expiry=pool.keepalive_expiry_secs,
+                ),
+                http2=pool.http2,
+            )
+        except ImportError as e:
+            raise ConfigurationException(
+                f"HTTP/2 is enabled for source '{source.host}' but the `h2` package is not installed."
+            ) from e
+        logger.debug(
+            "Upstream connection pool created",
+            extra={"host": source.host, "pool": pool.model_dump()},
+        )
+        return client
+
+    async def aclose(self):
+        clients, self._clients = self._clients, {}
+        retired, self._retired = self._retired, set()
+        for task in self._closing:
+            task.cancel()
+        await asyncio.gather(*(client.aclose() for client in [*clients.values(), *retired]))
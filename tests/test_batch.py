@@ -0,0 +1,24 @@
+import pytest
+from starlette.background import BackgroundTask
+from starlette.responses import StreamingResponse
+
+from guardette.batch import read_body
+from guardette.exceptions import ResponseTooLargeException
+
+
+@pytest.mark.anyio
+async def test_read_body_releases_the_upstream_response_when_the_body_fails():
+    closed = []
+
+    async def chunks():
+        yield b'{"title": '
+        raise ResponseTooLargeException("Upstream response exceeds the limit of 16 bytes.")
+
+    async def close():
+        closed.append(True)
+
+    response = StreamingResponse(chunks(), background=BackgroundTask(close))
+
+    with pytest.raises(ResponseTooLargeException):
+        await read_body(response)
+    assert closed == [True]
@@ -0,0 +1,129 @@
+import asyncio
+
+import httpx
+import pytest
+
+from guardette.buffering import MemoryBudget, UpstreamBody, limit_stream, read_upstream_body
+from guardette.exceptions import ResponseTooLargeException
+
+
+class ChunkedStream(httpx.AsyncByteStream):
+    def __init__(self, *chunks: bytes):
+        self.chunks = chunks
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+@pytest.mark.anyio
+async def test_read_upstream_body_refuses_a_declared_size_over_the_limit():
+    response = httpx.Response(200, headers={"content-length": "11"}, stream=ChunkedStream(b"x" * 11))
+    with pytest.raises(ResponseTooLargeException):
+        await read_upstream_body(response, max_bytes=10)
+
+
+@pytest.mark.anyio
+async def test_read_upstream_body_stops_once_an_undeclared_body_grows_past_the_limit():
+    budget = MemoryBudget(1024)
+    response = httpx.Response(200, stream=ChunkedStream(b"x" * 6, b"x" * 6, b"x" * 6))
+    with pytest.raises(ResponseTooLargeException):
+        await read_upstream_body(response, max_bytes=10, budget=budget)
+    assert budget.in_use == 0
+
+
+@pytest.mark.anyio
+async def test_bodies_over_the_spill_size_are_memory_mapped_from_a_temporary_file():
+    budget = MemoryBudget(1024)
+    response = httpx.Response(200, stream=ChunkedStream(b'{"a": ', b'"' + b"x" * 100 + b'"}'))
+    body = await read_upstream_body(response, spill_bytes=16, budget=budget)
+
+    assert body.spilled
+    assert isinstance(body.view(), memoryview)
+    assert body.getvalue() == b'{"a": "' + b"x" * 100 + b'"}'
+    assert budget.in_use == 0  # Spilled bytes live in the page cache, not on the heap.
+    body.close()
+
+
+@pytest.mark.anyio
+async def test_small_bodies_stay_in_memory_within_the_budget():
+    budget = MemoryBudget(1024)
+    response = httpx.Response(200, stream=ChunkedStream(b"ab", b"cd"))
+    body = await read_upstream_body(response, spill_bytes=16, budget=budget)
+
+    assert not body.spilled
+    assert body.view() == b"abcd"
+    assert budget.in_use == 4
+    body.close()
+    assert budget.in_use == 0
+    assert budget.stats() == {"max_bytes": 1024, "in_use": 0, "peak": 4, "waits": 0}
+
+
+@pytest.mark.anyio
+async def test_budget_holds_new_bodies_back_until_buffered_ones_are_released():
+    budget = MemoryBudget(100)
+    first = UpstreamBody(budget=budget)
+    first.write(b"x" * 80)
+
+    waiting = asyncio.create_task(budget.admit(50))
+    await asyncio.sleep(0)
+    assert not waiting.done()
+    # A body of unknown size fits while the total is within the budget.
+    await asyncio.wait_for(budget.admit(), 1)
+
+    first.close()
+    await asyncio.wait_for(waiting, 1)
+    assert budget.waits == 1
+
+
+class SlowStream(httpx.AsyncByteStream):
+    def __init__(self, *chunks: bytes):
+        self.chunks = chunks
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            await asyncio.sleep(0.01)
+            yield chunk
+
+
+@pytest.mark.anyio
+async def test_budget_reserves_declared_sizes_for_concurrent_bodies():
+    budget = MemoryBudget(100)
+
+    async def read():
+        response = httpx.Response(200, headers={"content-length": "60"}, stream=SlowStream(b"x" * 30, b"x" * 30))
+        body = await read_upstream_body(response, budget=budget)
+        await asyncio.sleep(0.01)
+        body.close()
+
+    await asyncio.wait_for(asyncio.gather(*(read() for _ in range(5))), 5)
+
+    # Each body waited for the one before it to be released, instead of all reading at once.
+    assert budget.stats() == {"max_bytes": 100, "in_use": 0, "peak": 60, "waits": 4}
+
+
+@pytest.mark.anyio
+async def test_reservations_are_settled_to_the_bytes_read():
+    budget = MemoryBudget(100)
+    response = httpx.Response(200, headers={"content-length": "50"}, stream=ChunkedStream(b"x" * 20))
+    body = await read_upstream_body(response, budget=budget)
+    assert budget.in_use == 20
+    body.close()
+    assert budget.in_use == 0
+
+
+@pytest.mark.anyio
+async def test_budget_admits_a_body_larger_than_itself_when_nothing_else_is_buffered():
+    budget = MemoryBudget(100)
+    await asyncio.wait_for(budget.admit(1000), 1)
+
+
+@pytest.mark.anyio
+async def test_limit_stream():
+    async def chunks():
+        yield b"abc"
+        yield b"def"
+
+    assert [chunk async for chunk in limit_stream(chunks(), 6)] == [b"abc", b"def"]
+    with pytest.raises(ResponseTooLargeException):
+        _ = [chunk async for chunk in limit_stream(chunks(), 5)]
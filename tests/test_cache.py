@@ -0,0 +1,96 @@
+from unittest.mock import patch
+
+from starlette.datastructures import MutableHeaders
+
+from guardette.cache import ResponseCache, make_cache_key
+from guardette.datastructures import BufferedResponse, ProxyRequest
+
+
+def make_response(body: bytes = b"{}") -> BufferedResponse:
+    return BufferedResponse(status_code=200, headers=MutableHeaders(), body=body)
+
+
+def test_cache_key_normalizes_query_order():
+    a = make_cache_key(
+        "api.github.com", "GET", ProxyRequest(url="https://api.github.com/x?b=2&a=1", headers={}, json_data=None)
+    )
+    b = make_cache_key(
+        "api.github.com", "GET", ProxyRequest(url="https://api.github.com/x?a=1&b=2", headers={}, json_data=None)
+    )
+
+    assert a == b
+
+
+def test_cache_key_varies_on_credentials_without_holding_them():
+    a = make_cache_key(
+        "h", "GET", ProxyRequest(url="https://h/x", headers={"authorization": "Bearer one"}, json_data=None)
+    )
+    b = make_cache_key(
+        "h", "GET", ProxyRequest(url="https://h/x", headers={"authorization": "Bearer two"}, json_data=None)
+    )
+
+    assert a != b
+    assert "Bearer" not in repr(a)
+
+
+def test_cache_key_varies_on_every_forwarded_header_but_tracing_ones():
+    def key(**headers):
+        return make_cache_key("h", "GET", ProxyRequest(url="https://h/x", headers=headers, json_data=None))
+
+    base = key(accept="application/json")
+    assert key(accept="application/json", **{"X-GitHub-Api-Version": "2022-11-28"}) != base
+    assert key(accept="application/json", **{"If-None-Match": '"abc"'}) != base
+    assert key(Accept="application/json") == base
+    assert key(accept="application/json", traceparent="00-" + "1" * 32 + "-" + "2" * 16 + "-01") == base
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ResponseCache(ttl_secs=60, max_entries=2, max_bytes=1024)
+    cache.set("a", make_response())
+    cache.set("b", make_response())
+    cache.get("a")
+    cache.set("c", make_response())
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.evictions == 1
+
+
+def test_cache_is_bounded_by_bytes():
+    cache = ResponseCache(ttl_secs=60, max_entries=10, max_bytes=10)
+    cache.set("big", make_response(b"x" * 11))
+    cache.set("a", make_response(b"x" * 6))
+    cache.set("b", make_response(b"x" * 6))
+
+    assert cache.get("big") is None
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+    assert cache.size == 6
+
+
+def test_cache_entries_expire():
+    cache = ResponseCache(ttl_secs=5, max_entries=10, max_bytes=1024)
+    with patch("guardette.cache.time.monotonic", return_value=100.0):
+        cache.set("a", make_response())
+    with patch("guardette.cache.time.monotonic", return_value=104.0):
+        assert cache.get("a") is not None
+    with patch("guardette.cache.time.monotonic", return_value=105.0):
+        assert cache.get("a") is None
+
+    assert cache.stats() == {"entries": 0, "bytes": 0, "hits": 1, "misses": 1, "evictions": 0, "revalidations": 0}
+
+
+def test_expired_entries_with_validators_can_be_revalidated():
+    cache = ResponseCache(ttl_secs=5, max_entries=10, max_bytes=1024)
+    response = BufferedResponse(
+        status_code=200, headers=MutableHeaders(), body=b"{}", validators={"if-none-match": '"v1"'}
+    )
+    with patch("guardette.cache.time.monotonic", return_value=100.0):
+        cache.set("a", response)
+    with patch("guardette.cache.time.monotonic", return_value=110.0):
+        assert cache.get("a") is None
+        assert cache.get_stale("a") is response
+        cache.refresh("a")
+        assert cache.get("a") is response
+
+    assert cache.revalidations == 1
@@ -0,0 +1,57 @@
+import gzip
+import zlib
+
+import pytest
+from starlette.responses import Response
+
+from guardette.compression import compress_response, compress_stream, negotiate
+
+ENCODINGS = ("zstd", "br", "gzip")
+
+
+@pytest.mark.parametrize(
+    ("accept_encoding", "expected"),
+    [
+        (None, None),
+        ("", None),
+        ("identity", None),
+        ("gzip", "gzip"),
+        ("GZIP, deflate", "gzip"),
+        ("gzip;q=0", None),
+        ("*", "gzip"),
+        ("*;q=0.5, gzip;q=0", None),
+        ("compress, gzip;q=0.2", "gzip"),
+    ],
+)
+def test_negotiate_picks_an_accepted_encoding(accept_encoding, expected):
+    assert negotiate(accept_encoding, ENCODINGS) == expected
+
+
+def test_negotiate_only_uses_enabled_encodings():
+    assert negotiate("gzip", ()) is None
+
+
+def test_compress_response_respects_min_bytes():
+    small = compress_response(Response(content=b"x" * 10), "gzip", level=6, min_bytes=100)
+    large = compress_response(Response(content=b"x" * 1000), "gzip", level=6, min_bytes=100)
+
+    assert "content-encoding" not in small.headers
+    assert small.body == b"x" * 10
+    assert small.headers["vary"] == "Accept-Encoding"
+    assert large.headers["content-encoding"] == "gzip"
+    assert large.headers["content-length"] == str(len(large.body))
+    assert gzip.decompress(large.body) == b"x" * 1000
+
+
+@pytest.mark.anyio
+async def test_compress_stream_yields_decodable_chunks():
+    async def chunks():
+        yield b'{"items": ['
+        yield b"1, 2, 3"
+        yield b"]}"
+
+    compressed = [chunk async for chunk in compress_stream(chunks(), "gzip", level=6)]
+
+    decoder = zlib.decompressobj(31)
+    assert decoder.decompress(compressed[0]) == b'{"items": ['
+    assert decoder.decompress(b"".join(compressed[1:])) == b"1, 2, 3]}"
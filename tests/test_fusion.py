@@ -0,0 +1,177 @@
+import copy
+import random
+from unittest.mock import patch
+
+import pytest
+
+from guardette import fusion
+from guardette.actions import REMOVE, action_registry, filter_json_path, update_json_path
+from guardette.executors import ActionExecutor
+from guardette.fusion import FusedActions, apply_updates, compile_path, fuse_actions
+from guardette.json_codec import StdlibJsonCodec
+
+PATHS = [
+    "$.a",
+    "$.a.b",
+    "$['a','b']",
+    "$.a.*",
+    "$[*]",
+    "$.*[*]",
+    "$.items[*]",
+    "$.items[*].a",
+    "$.a[*].b",
+    "$..b",
+    "$..*",
+    "$..a.c",
+    "$.a..c",
+    "$..a..b",
+    "$..items[*]",
+    "$..c[*].b",
+]
+
+ACTIONS = {
+    "redact": {},
+    "nullify": {},
+    "remove": {},
+    "redact_regex": {"regex_pattern": "token"},
+    "filter_regex": {"regex_pattern": r"\w+"},
+    "pseudonymize_email": {},
+}
+
+
+def make_action(kind, json_paths, **settings):
+    return action_registry.get_action_cls(kind).model_validate({"json_paths": json_paths, **settings})
+
+
+def random_document(rng, depth=0):
+    r = rng.random()
+    if depth > 3 or r < 0.3:
+        return rng.choice(["a@example.com", "b@gmail.com", "some token", "", None, 3, True])
+    if r < 0.6:
+        return [random_document(rng, depth + 1) for _ in range(rng.randrange(4))]
+    return {key: random_document(rng, depth + 1) for key in rng.sample(["a", "b", "c", "items"], rng.randrange(1, 5))}
+
+
+def apply_sequentially(data, updates):
+    for path, updater in updates:
+        if updater is REMOVE:
+            filter_json_path(data, path, lambda _d: True)
+        else:
+            update_json_path(data, path, updater)
+
+
+def test_fused_updates_match_running_the_actions_one_after_the_other(action_context):
+    config = action_context.config
+    compared = 0
+    for seed in range(2000):
+        rng = random.Random(seed)  # noqa: S311
+        document = random_document(rng)
+        updates = []
+        for _ in range(rng.randrange(1, 5)):
+            kind = rng.choice(list(ACTIONS))
+            action = make_action(kind, rng.sample(PATHS, rng.randrange(1, 3)), **ACTIONS[kind])
+            updater = action.updater(config, {"salt": "salt"})
+            updates += [(path, updater) for path in action.json_paths]
+
+        expected = copy.deepcopy(document)
+        try:
+            apply_sequentially(expected, updates)
+        except Exception:  # noqa: S112
+            # jsonpath_ng fails on some shapes (`[*]` on a string, ...), and may also fail on values
+            # a path has replaced itself, which the fused traversal doesn't go back to.
+            continue
+        fused = copy.deepcopy(document)
+        apply_updates(fused, updates)
+        assert fused == expected, (seed, document, updates)
+        compared += 1
+    assert compared > 1000
+
+
+def test_fused_updates_keep_the_order_of_the_actions(action_context):
+    token = action_context.config.REDACT_TOKEN
+    document = {"labels": ["a", "b"], "user": {"email": "a@example.com", "name": "a"}}
+
+    # Each path acts on what the ones before it left, even where a later one replaces an enclosing value.
+    data = copy.deepcopy(document)
+    apply_updates(data, [("$.labels[*]", token), ("$.labels", REMOVE), ("$.user.name", token), ("$.user", None)])
+    assert data == {"user": None}
+
+    data = copy.deepcopy(document)
+    apply_updates(data, [("$.user", token), ("$.user.name", REMOVE), ("$..name", None)])
+    assert data == {"labels": ["a", "b"], "user": token}
+
+
+def test_fused_updates_walk_the_document_once():
+    document = {"items": [{"a": {"b": "x"}, "c": "y"} for _ in range(10)]}
+    updates = [("$..b", "1"), ("$.items[*].a.b", "2"), ("$.items[*].c", "3")]
+
+    with patch.object(fusion, "_visit", wraps=fusion._visit) as visits:
+        apply_updates(document, updates)
+
+    assert document == {"items": [{"a": {"b": "2"}, "c": "3"} for _ in range(10)]}
+    # The document, `items`, each item and each item's `a`.
+    assert visits.call_count == 1 + 1 + 10 + 10
+
+
+@pytest.mark.parametrize(
+    ("path", "fusable"),
+    [
+        ("$.issues[*].fields.summary", True),
+        ("$['issues'][*]['fields']", True),
+        ("$..email", True),
+        ("$.issues[*]..email", True),
+        ("$", False),
+        ("$.issues[0].key", False),
+        ("$.issues[1:3].key", False),
+        ("$.issues[?(@.state == 'open')].body", False),
+        ("$..[*]", False),
+        ("not a [ path", False),
+    ],
+)
+def test_compile_path(path, fusable):
+    assert (compile_path(path) is not None) is fusable
+
+
+def test_fuse_actions_merges_runs_of_fusable_actions():
+    redact = make_action("redact", ["$.a", "$.b"])
+    remove = make_action("remove", ["$.c"])
+    secrets = make_action("redact_secrets", ["$.d"])
+    filtered = make_action("nullify", ["$.items[?(@.x == 1)].y"])
+    single = make_action("redact_regex", ["$.e"], regex_pattern="x")
+
+    plan = fuse_actions([redact, remove, secrets, filtered, single, redact])
+
+    assert [type(action) for action in plan] == [FusedActions, type(secrets), type(filtered), FusedActions]
+    assert plan[0].actions == [redact, remove]
+    assert plan[3].actions == [single, redact]
+    # A single path gains nothing from fusion.
+    assert fuse_actions([single]) == [single]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("kind", ["inline", "thread", "process"])
+async def test_fused_actions_run_in_every_executor(action_context, kind, monkeypatch):
+    monkeypatch.setenv("PSEUDONYMIZE_SALT", "salt")
+    actions = [
+        make_action("redact_regex", ["$.items[*].title"], regex_pattern=r"\d{3}-\d{4}"),
+        make_action("pseudonymize_email", ["$..email"]),
+        make_action("remove", ["$.items[*].secret"]),
+    ]
+    document = {"items": [{"title": "call 555-1234", "email": "a@example.com", "secret": "x"}]}
+
+    action_context.response.json_data = copy.deepcopy(document)
+    for action in actions:
+        await action.response(action_context)
+    expected = action_context.response.json_data
+
+    executor = ActionExecutor(kind, 1, StdlibJsonCodec())
+    action_context.executor = executor
+    action_context.response.json_data = copy.deepcopy(document)
+    try:
+        [fused] = fuse_actions(actions)
+        await fused.response(action_context)
+    finally:
+        executor.shutdown()
+
+    assert action_context.response.json_data == expected
+    assert "secret" not in expected["items"][0]
@@ -0,0 +1,49 @@
+import pytest
+
+from guardette.exceptions import ConfigurationException
+from guardette.json_codec import JSON_CODECS, StdlibJsonCodec, get_json_codec
+
+DOCUMENT = {"title": "ünïcödé", "count": 3, "ratio": 0.5, "items": [None, True, {"nested": []}]}
+
+
+@pytest.mark.parametrize("name", list(JSON_CODECS))
+def test_json_codecs_round_trip_to_bytes(name):
+    codec = get_json_codec(name)
+
+    data = codec.dumps(DOCUMENT)
+
+    assert isinstance(data, bytes)
+    assert codec.loads(data) == DOCUMENT
+    assert StdlibJsonCodec().loads(data) == DOCUMENT
+
+
+def test_stdlib_codec_renders_like_json_response():
+    assert StdlibJsonCodec().dumps({"a": [1, "é"]}) == '{"a":[1,"é"]}'.encode()
+
+
+def test_auto_json_codec_prefers_installed_fast_codec():
+    assert get_json_codec("auto").name == next(iter(JSON_CODECS))
+
+
+def test_unknown_json_codec_is_rejected():
+    with pytest.raises(ConfigurationException, match="not available"):
+        get_json_codec("simdjson")
+
+
+def test_orjson_codec_falls_back_for_big_integers():
+    pytest.importorskip("orjson")
+    codec = get_json_codec("orjson")
+
+    assert codec.dumps({"id": 2**70}) == b'{"id":1180591620717411303424}'
+
+
+@pytest.mark.parametrize("name", list(JSON_CODECS))
+@pytest.mark.parametrize("number", [2**64 - 1, 2**64, -(2**63), -(2**63) - 1, 123456789012345678901234567890])
+def test_json_codecs_keep_wide_integers_exact(name, number):
+    codec = get_json_codec(name)
+
+    data = b'{"id": %d, "ids": [%d]}' % (number, number)
+
+    assert codec.loads(data) == {"id": number, "ids": [number]}
+    assert codec.loads(memoryview(data))["id"] == number
+    assert codec.dumps(codec.loads(data)) == b'{"id":%d,"ids":[%d]}' % (number, number)
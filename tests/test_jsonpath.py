@@ -0,0 +1,136 @@
+import copy
+import random
+
+import pytest
+from jsonpath_ng.ext import parse
+
+from guardette.jsonpath import JsonPath
+
+COMPILED_PATHS = [
+    "$.a",
+    "a.b",
+    "$.a.b",
+    "$['a','b']",
+    "$.a.*",
+    "$.*",
+    "$[*]",
+    "$.*[*]",
+    "$.items[*].a",
+    "$.items[0]",
+    "$.items[-1].a",
+    "$.items[5]",
+    "$.a[0,1]",
+    "$..b",
+    "$..*",
+    "$..a.c",
+    "$.a..c",
+    "$..a..b",
+    "$..items[*]",
+    "$..[0]",
+    "$.items[?(@.a)]",
+    "$.items[?(!@.a)].b",
+    "$.items[?(@.a == 'x')].b",
+    "$.items[?(@.a != 'x')]",
+    "$.items[?(@.a > 1)].c",
+    "$.items[?(@.a =~ '^x')]",
+    "$.items[?(@.a == 'x' & @.b)].c",
+    "$..items[?(@.a.b == 3)]",
+    "$[?(@.b)]",
+    "$.*[?(@)]",
+    "$.items[*].`this`",
+]
+
+FALLBACK_PATHS = [
+    "$",
+    "$.items[1:3]",
+    "$.items[::2].a",
+    "$.a | $.b",
+    "$.items.`len`",
+    "$.items[?(@.a + 1 == 2)]",
+    "$.a[\\a]",
+]
+
+KEYS = ["a", "b", "c", "items"]
+
+
+def random_document(rng, depth=0):
+    r = rng.random()
+    if depth > 3 or r < 0.3:
+        return rng.choice(["x", "xy", "y", "", "1", "3", None, 0, 1, 3, True, 2.5])
+    if r < 0.6:
+        return [random_document(rng, depth + 1) for _ in range(rng.randrange(5))]
+    return {key: random_document(rng, depth + 1) for key in rng.sample(KEYS, rng.randrange(1, 5))}
+
+
+def replace(value, _parent, _key):
+    return ["replaced", value]
+
+
+def skip(_value, _parent, _key):
+    return None
+
+
+def is_string(value):
+    return isinstance(value, str)
+
+
+OPERATIONS = {
+    "find": lambda expr, data: expr.values(data),
+    "update": lambda expr, data: expr.update(data, "replaced"),
+    "update with a list": lambda expr, data: expr.update(data, ["p", "q"]),
+    "update with a callable": lambda expr, data: expr.update(data, replace),
+    "update with a callable returning None": lambda expr, data: expr.update(data, skip),
+    "filter": lambda expr, data: expr.filter(is_string, data),
+    "remove": lambda expr, data: expr.filter(lambda _value: True, data),
+}
+
+
+def outcome(operation, expr, document):
+    data = copy.deepcopy(document)
+    try:
+        found = operation(expr, data)
+    except Exception as e:
+        return type(e)
+    return found, data
+
+
+class NgPath:
+    """A jsonpath_ng expression, with `values` as `JsonPath` has it."""
+
+    def __init__(self, path):
+        self.expr = parse(path)
+        self.update = self.expr.update
+        self.filter = self.expr.filter
+
+    def values(self, data):
+        return [datum.value for datum in self.expr.find(data)]
+
+
+def test_compiled_paths_match_jsonpath_ng():
+    for path in COMPILED_PATHS:
+        compiled = JsonPath(path)
+        assert compiled.compiled, path
+        expr = NgPath(path)
+        for seed in range(300):
+            rng = random.Random(seed)  # noqa: S311
+            document = random_document(rng)
+            for name, operation in OPERATIONS.items():
+                expected = outcome(operation, expr, document)
+                assert outcome(operation, compiled, document) == expected, (path, name, document)
+
+
+@pytest.mark.parametrize("path", FALLBACK_PATHS)
+def test_paths_outside_the_subset_run_through_jsonpath_ng(path):
+    compiled = JsonPath(path)
+    assert not compiled.compiled
+    expr = NgPath(path)
+    document = {"a": [1, 2], "b": 1, "items": [{"a": 1}, {"a": 2, "b": "x"}, {"a": "1"}]}
+    for operation in OPERATIONS.values():
+        assert outcome(operation, compiled, document) == outcome(operation, expr, document)
+
+
+def test_update_and_filter_return_the_document():
+    data = {"items": [{"a": 1}, {"a": 2}]}
+    assert JsonPath("$.items[*].a").update(data, 0) is data
+    assert JsonPath("$.items[?(@.a == 0)]").filter(lambda _value: True, data) is data
+    assert data == {"items": []}
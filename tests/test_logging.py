@@ -0,0 +1,52 @@
+import io
+import json
+import logging
+import queue
+from logging.handlers import QueueListener
+
+from guardette.logging import CustomJSONFormatter, _QueueHandler
+
+
+def make_logger(name: str, handler: logging.Handler) -> logging.Logger:
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+def test_formatter_includes_extra_attributes_only():
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(CustomJSONFormatter())
+    logger = make_logger("guardette.test.formatter", handler)
+
+    logger.info("hello %s", "world", extra={"correlation_id": "abc", "timings": {"total": 1.5}, "size": 2**70})
+
+    line = json.loads(stream.getvalue())
+    assert line["message"] == "hello world"
+    assert line["correlation_id"] == "abc"
+    assert line["timings"] == {"total": 1.5}
+    assert line["size"] == 2**70
+    assert not {"args", "msg", "lineno", "exc_text", "taskName"} & set(line)
+
+
+def test_queue_handler_formats_on_the_listener_thread():
+    stream = io.StringIO()
+    console = logging.StreamHandler(stream)
+    console.setFormatter(CustomJSONFormatter())
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, console)
+    logger = make_logger("guardette.test.queue", _QueueHandler(log_queue))
+
+    listener.start()
+    try:
+        logger.info("request %d", 1, extra={"correlation_id": "abc"})
+        logger.error("failed", exc_info=ValueError("boom"))
+    finally:
+        listener.stop()
+
+    first, second = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert (first["message"], first["correlation_id"]) == ("request 1", "abc")
+    assert second["message"] == "failed"
+    assert "ValueError: boom" in second["exception"]
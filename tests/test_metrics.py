@@ -0,0 +1,64 @@
+from guardette.metrics import CacheStats, Collector, Counter, Gauge, Histogram, ProxyMetrics, Registry
+
+
+def test_counters_and_gauges_render_one_sample_per_label_set():
+    registry = Registry()
+    requests = registry.register(Counter("requests_total", "Requests.", ("host", "status")))
+    in_flight = registry.register(Gauge("in_flight", "In flight."))
+    requests.inc(("api.github.com", "200"))
+    requests.inc(("api.github.com", "200"))
+    requests.inc(('we"ird\\host', "500"), 0.5)
+    in_flight.inc()
+    in_flight.dec()
+
+    assert registry.render().splitlines() == [
+        "# HELP requests_total Requests.",
+        "# TYPE requests_total counter",
+        'requests_total{host="api.github.com",status="200"} 2',
+        'requests_total{host="we\\"ird\\\\host",status="500"} 0.5',
+        "# HELP in_flight In flight.",
+        "# TYPE in_flight gauge",
+        "in_flight 0",
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency.", ("host",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, ("h",))
+
+    assert [(name, labels.get("le"), value) for name, labels, value in histogram.samples()] == [
+        ("latency_seconds_bucket", "0.1", 2),
+        ("latency_seconds_bucket", "1", 3),
+        ("latency_seconds_bucket", "+Inf", 4),
+        ("latency_seconds_sum", None, 3.65),
+        ("latency_seconds_count", None, 4),
+    ]
+
+
+def test_collectors_are_read_when_rendered():
+    values = []
+    registry = Registry()
+    registry.register(Collector("queue_depth", "Depth.", "gauge", lambda: values, ("queue",)))
+
+    assert "queue_depth{" not in registry.render()
+    values.append((("q",), 3))
+    assert 'queue_depth{queue="q"} 3' in registry.render()
+
+
+def test_proxy_metrics_report_cache_hit_ratios():
+    stats = CacheStats()
+    metrics = ProxyMetrics()
+    metrics.watch_cache("json_path", lambda: stats)
+    metrics.watch_cache("secrets", lambda: None)
+    stats.hit()
+    stats.hit()
+    stats.hit()
+    stats.miss()
+
+    lines = metrics.render().splitlines()
+
+    assert 'guardette_cache_hits_total{cache="json_path"} 3' in lines
+    assert 'guardette_cache_misses_total{cache="json_path"} 1' in lines
+    assert 'guardette_cache_hit_ratio{cache="json_path"} 0.75' in lines
+    assert not any('cache="secrets"' in line for line in lines)
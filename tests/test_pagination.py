@@ -0,0 +1,38 @@
+import pytest
+
+from guardette.pagination import next_page_url
+
+URL = "https://api.example.com/items?state=open&page=1"
+
+
+@pytest.mark.parametrize(
+    ("headers", "json_data", "expected"),
+    [
+        (
+            {"link": '<https://api.example.com/items?state=open&page=2>; rel="next", <...?page=9>; rel="last"'},
+            [],
+            "https://api.example.com/items?state=open&page=2",
+        ),
+        ({"link": '<https://api.example.com/items?page=1>; rel="prev"'}, [], None),
+        ({"link": '<https://elsewhere.example.com/items?page=2>; rel="next"'}, [], None),
+        ({"x-next-page": "2"}, [], "https://api.example.com/items?state=open&page=2"),
+        ({"x-next-page": ""}, [], None),
+        (
+            {},
+            {"startAt": 0, "maxResults": 50, "total": 120, "issues": []},
+            "https://api.example.com/items?state=open&page=1&startAt=50",
+        ),
+        ({}, {"startAt": 100, "maxResults": 50, "total": 120, "issues": []}, None),
+        ({}, {"startAt": 0, "maxResults": 2, "isLast": True, "values": [1, 2]}, None),
+        (
+            {},
+            {"startAt": 0, "maxResults": 2, "values": [1, 2]},
+            "https://api.example.com/items?state=open&page=1&startAt=2",
+        ),
+        ({}, {"startAt": 0, "maxResults": 2, "values": [1]}, None),
+        ({}, {"title": "not paginated"}, None),
+        ({}, None, None),
+    ],
+)
+def test_next_page_url(headers, json_data, expected):
+    assert next_page_url(URL, headers, json_data) == expected
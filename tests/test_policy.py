@@ -35,3 +35,18 @@ def test_policy_rejects_invalid_auth_format():
 
     with pytest.raises(ValidationError, match="Invalid `auth` format"):
         Policy.model_validate(policy_data)
+
+
+def test_policy_rejects_invalid_json_paths():
+    policy_data = {
+        "version": "1",
+        "sources": [
+            {
+                "host": "example.com",
+                "rules": [{"route": "GET /issues", "actions": [{"kind": "redact", "json_paths": ["$.issues[?("]}]}],
+            }
+        ],
+    }
+
+    with pytest.raises(ValidationError, match=r"Invalid JSONPath `\$\.issues\[\?\(`"):
+        Policy.model_validate(policy_data)
@@ -1,13 +1,25 @@
+import asyncio
+import gzip
+import json
+import logging
+import os
+from pathlib import Path
 from unittest.mock import patch
 
 import httpx
+import pytest
+import yaml
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 
-from guardette import Guardette
+from guardette import Guardette, tracing
+from guardette.actions import Action, ActionContext, action_registry
+from guardette.compression import UPSTREAM_ACCEPT_ENCODING
 from guardette.constants import PROXY_ERROR_HEADER, PROXY_HOST_HEADER
 from guardette.datastructures import ProxyRequest, ProxyResponse
 from guardette.exceptions import GuardetteException
+from guardette.policy import Rule, Source
+from guardette.recording import Recorder, body_digest
 
 app = FastAPI()
 
@@ -19,6 +31,15 @@ client = TestClient(app)
 test_client_secret = "test"  # noqa: S105
 
 
+class MockAsyncStream(httpx.AsyncByteStream):
+    def __init__(self, *chunks: bytes):
+        self.chunks = chunks
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
 async def get_secret(key, *args, **kwargs):
     return "test"
 
@@ -36,11 +57,37 @@ def test_yc(mock_get):
     assert response.json()["title"] == guardette.config.REDACT_TOKEN
 
 
-def test_proxy_drops_accept_encoding_before_upstream():
+def test_proxy_requests_decodable_encodings_from_upstream():
     upstream_response = httpx.Response(status_code=200, json={"title": "example"})
 
     with (
-        patch("httpx.AsyncClient.get", return_value=upstream_response) as upstream_get,
+        patch("httpx.AsyncClient.send", return_value=upstream_response) as upstream_send,
+        patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret),
+    ):
+        response = client.get(
+            "/v0/item/8863.json",
+            headers={
+                PROXY_HOST_HEADER: "hacker-news.firebaseio.com",
+                "Authorization": test_client_secret,
+                "Accept-Encoding": "compress",
+            },
+        )
+
+    assert response.status_code == 200, response.text
+    forwarded_headers = upstream_send.call_args.args[0].headers
+    assert forwarded_headers["accept-encoding"] == UPSTREAM_ACCEPT_ENCODING
+
+
+def test_proxy_decodes_compressed_upstream_and_compresses_for_client():
+    body = json.dumps({"title": "example", "padding": "x" * 4096}).encode()
+    upstream_response = httpx.Response(
+        status_code=200,
+        headers={"content-type": "application/json", "content-encoding": "gzip"},
+        stream=MockAsyncStream(gzip.compress(body)),
+    )
+
+    with (
+        patch("httpx.AsyncClient.send", return_value=upstream_response),
         patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret),
     ):
         response = client.get(
@@ -48,13 +95,15 @@ def test_proxy_drops_accept_encoding_before_upstream():
             headers={
                 PROXY_HOST_HEADER: "hacker-news.firebaseio.com",
                 "Authorization": test_client_secret,
-                "Accept-Encoding": "br",
+                "Accept-Encoding": "gzip;q=0.5, identity;q=0.1",
             },
         )
 
     assert response.status_code == 200, response.text
-    forwarded_headers = upstream_get.call_args.kwargs["headers"]
-    assert forwarded_headers.get("accept-encoding") is None
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(body)
+    assert response.json() == {"title": guardette.config.REDACT_TOKEN, "padding": "x" * 4096}
 
 
 @patch("guardette.secrets.ConfigSecretsManager.get", side_effect=GuardetteException("Secret retrieval failed"))
@@ -73,8 +122,41 @@ def test_internal_error(mock_get):
 
 def mock_http_bin_match(*args, **kwargs):
     return {
-        "target": {"host": "httpbin.org"},
-        "rule": {"actions": []},
+        "target": Source(host="httpbin.org", rules=[]),
+        "rule": Rule(route="GET /{path:path}", actions=[]),
+        "path_params": {},
+    }
+
+
+def mock_local_match(*args, **kwargs):
+    return {
+        "target": Source(host="127.0.0.1:8901", scheme="http", rules=[]),
+        "rule": Rule(route="GET /{path:path}", actions=[]),
+        "path_params": {},
+    }
+
+
+@patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
+@patch("guardette.matching.Matcher.match", side_effect=mock_local_match)
+def test_source_scheme_selects_upstream_url(mock_match, mock_get):
+    upstream_response = httpx.Response(status_code=200, stream=httpx.ByteStream(b'{"title": "example"}'))
+
+    with patch("httpx.AsyncClient.send", return_value=upstream_response) as upstream_send:
+        response = client.get(
+            "/items?page=2",
+            headers={PROXY_HOST_HEADER: "127.0.0.1:8901", "Authorization": test_client_secret},
+        )
+
+    assert response.status_code == 200, response.text
+    assert str(upstream_send.call_args.args[0].url) == "http://127.0.0.1:8901/items?page=2"
+
+
+def mock_http_bin_redact_match(*args, **kwargs):
+    return {
+        "target": Source(host="httpbin.org", rules=[]),
+        "rule": Rule.model_validate(
+            {"route": "GET /{path:path}", "actions": [{"kind": "redact", "json_paths": ["$.title"]}]}
+        ),
         "path_params": {},
     }
 
@@ -112,7 +194,7 @@ def test_proxied_error(mock_match, mock_transform_request, mock_transform_respon
     assert PROXY_ERROR_HEADER not in response.headers
 
 
-@patch("httpx.AsyncClient.get", side_effect=httpx.TimeoutException("Request timed out"))
+@patch("httpx.AsyncClient.send", side_effect=httpx.TimeoutException("Request timed out"))
 @patch("guardette.matching.Matcher.match", return_value=mock_http_bin_match())
 @patch("guardette.proxy.ProxyTransformer.transform_request", return_value=mock_transform_404_request())
 @patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
@@ -157,8 +239,8 @@ def mock_html_response():
     )
 
 
-@patch("httpx.AsyncClient.get", return_value=mock_html_response())
-@patch("guardette.matching.Matcher.match", return_value=mock_http_bin_match())
+@patch("httpx.AsyncClient.send", return_value=mock_html_response())
+@patch("guardette.matching.Matcher.match", return_value=mock_http_bin_redact_match())
 @patch("guardette.proxy.ProxyTransformer.transform_request", return_value=mock_transform_404_request())
 @patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
 def test_non_json_upstream_response_is_blocked(mock_get, mock_match, mock_transform_request, mock_secrets_get):
@@ -172,3 +254,784 @@ def test_non_json_upstream_response_is_blocked(mock_get, mock_match, mock_transf
     assert response.status_code == 500
     assert response.json()["error"]["source"] == "proxy"
     assert response.headers.get(PROXY_ERROR_HEADER) == "proxy"
+
+
+def mock_streamed_html_response(*args, **kwargs):
+    return httpx.Response(
+        status_code=200,
+        headers={"content-type": "text/html"},
+        stream=httpx.ByteStream(b"<html><body>Error</body></html>"),
+    )
+
+
+@patch("httpx.AsyncClient.send", side_effect=mock_streamed_html_response)
+@patch("guardette.matching.Matcher.match", return_value=mock_http_bin_match())
+@patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
+def test_passthrough_rule_streams_upstream_body_unparsed(mock_get, mock_match, mock_send):
+    response = client.get(
+        "/some/path",
+        headers={
+            PROXY_HOST_HEADER: "httpbin.org",
+            "Authorization": test_client_secret,
+        },
+    )
+    assert response.status_code == 200, response.text
+    assert response.content == b"<html><body>Error</body></html>"
+    assert response.headers["content-type"] == "text/html"
+    assert PROXY_ERROR_HEADER not in response.headers
+
+
+@patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
+def test_passthrough_rule_supports_head_requests(mock_get):
+    upstream_response = httpx.Response(
+        status_code=200,
+        headers={"content-length": "42", "etag": '"abc"'},
+        stream=httpx.ByteStream(b""),
+    )
+
+    with patch("httpx.AsyncClient.send", return_value=upstream_response) as upstream_send:
+        response = client.head(
+            "/repos/acme/guardette/pulls",
+            headers={
+                PROXY_HOST_HEADER: "api.github.com",
+                "Authorization": test_client_secret,
+                "Accept-Encoding": "gzip",
+            },
+        )
+
+    assert response.status_code == 200, response.text
+    assert response.headers["etag"] == '"abc"'
+    forwarded = upstream_send.call_args.args[0]
+    assert forwarded.method == "HEAD"
+    assert forwarded.headers["accept-encoding"] == "gzip"
+
+
+def mock_http_bin_stream_match(*args, **kwargs):
+    return {
+        "target": Source(host="httpbin.org", rules=[]),
+        "rule": Rule.model_validate(
+            {"route": "GET /{path:path}", "actions": [{"kind": "redact", "json_paths": ["$.items[*].title"]}]}
+        ),
+        "path_params": {},
+    }
+
+
+def mock_chunked_json_response(*args, **kwargs):
+    return httpx.Response(
+        status_code=200,
+        headers={"content-type": "application/json", "transfer-encoding": "chunked"},
+        stream=MockAsyncStream(b'{"total": 2, "items": [{"title": "a", "id": 1},', b' {"title": "b", "id": 2}]}'),
+    )
+
+
+@patch("httpx.AsyncClient.send", side_effect=mock_chunked_json_response)
+@patch("guardette.matching.Matcher.match", return_value=mock_http_bin_stream_match())
+@patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
+def test_large_json_response_is_transformed_while_streaming(mock_get, mock_match, mock_send):
+    with patch("guardette.proxy.ProxyTransformer.transform_response") as transform_response:
+        response = client.get(
+            "/some/path",
+            headers={
+                PROXY_HOST_HEADER: "httpbin.org",
+                "Authorization": test_client_secret,
+            },
+        )
+
+    assert response.status_code == 200, response.text
+    assert response.json() == {
+        "total": 2,
+        "items": [{"title": guardette.config.REDACT_TOKEN, "id": 1}, {"title": guardette.config.REDACT_TOKEN, "id": 2}],
+    }
+    transform_response.assert_not_called()
+
+
+@patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
+def test_request_body_is_forwarded_as_is(mock_get):
+    forwarded = {}
+
+    async def send(request, **kwargs):
+        forwarded["request"] = request
+        forwarded["body"] = await request.aread()
+        return httpx.Response(status_code=200, stream=httpx.ByteStream(b"{}"))
+
+    body = b'[{"query": "{ viewer { login } }"},  1.50]'
+    with patch("httpx.AsyncClient.send", side_effect=send):
+        response = client.post(
+            "/graphql",
+            content=body,
+            headers={
+                PROXY_HOST_HEADER: "api.github.com",
+                "Authorization": test_client_secret,
+                "Content-Type": "application/json",
+            },
+        )
+
+    assert response.status_code == 200, response.text
+    assert forwarded["body"] == body
+    assert forwarded["request"].headers["content-length"] == str(len(body))
+    assert forwarded["request"].headers["content-type"] == "application/json"
+
+
+@action_registry.register("test_set_request_field")
+class SetRequestFieldAction(Action):
+    async def request(self, ctx: ActionContext):
+        ctx.request.json_data["jql"] = "project = SAFE"
+
+
+def mock_http_bin_request_hook_match(*args, **kwargs):
+    return {
+        "target": Source(host="httpbin.org", rules=[]),
+        "rule": Rule.model_validate({"route": "POST /{path:path}", "actions": [{"kind": "test_set_request_field"}]}),
+        "path_params": {},
+    }
+
+
+@patch("guardette.matching.Matcher.match", return_value=mock_http_bin_request_hook_match())
+@patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
+def test_request_body_is_reencoded_when_request_hooks_run(mock_get, mock_match):
+    forwarded = {}
+
+    async def send(request, **kwargs):
+        forwarded["body"] = await request.aread()
+        return httpx.Response(status_code=200, stream=httpx.ByteStream(b"{}"))
+
+    with patch("httpx.AsyncClient.send", side_effect=send):
+        response = client.post(
+            "/rest/api/3/search",
+            json={"jql": "project = ANY", "maxResults": 50},
+            headers={
+                PROXY_HOST_HEADER: "httpbin.org",
+                "Authorization": test_client_secret,
+            },
+        )
+
+    assert response.status_code == 200, response.text
+    assert json.loads(forwarded["body"]) == {"jql": "project = SAFE", "maxResults": 50}
+
+
+@patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
+def test_cached_rule_serves_repeated_reads_without_calling_upstream(mock_get):
+    def upstream_response(*args, **kwargs):
+        return httpx.Response(
+            status_code=200,
+            headers={"content-type": "application/json"},
+            stream=httpx.ByteStream(json.dumps([{"title": "t", "body": "secret"}]).encode()),
+        )
+
+    def get():
+        return client.get(
+            "/repos/octo/repo/issues?state=open&per_page=10",
+            headers={
+                PROXY_HOST_HEADER: "api.github.com",
+                "Authorization": test_client_secret,
+            },
+        )
+
+    with patch("httpx.AsyncClient.send", side_effect=upstream_response) as upstream_send:
+        first = get()
+        second = get()
+
+    assert first.headers["x-guardette-cache"] == "MISS"
+    assert second.headers["x-guardette-cache"] == "HIT"
+    assert second.json() == first.json() == [{"title": "t", "body": guardette.config.REDACT_TOKEN}]
+    assert upstream_send.call_count == 1
+
+
+@patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
+def test_cached_rule_revalidates_with_upstream_and_answers_client_validators(mock_get):
+    sent = []
+
+    async def send(request, **kwargs):
+        sent.append(request)
+        if request.headers.get("if-none-match") == '"upstream-v1"':
+            return httpx.Response(status_code=304, headers={"etag": '"upstream-v1"'})
+        return httpx.Response(
+            status_code=200,
+            headers={"content-type": "application/json", "etag": '"upstream-v1"'},
+            stream=httpx.ByteStream(json.dumps([{"body": "secret"}]).encode()),
+        )
+
+    def get(**headers):
+        return client.get(
+            "/repos/octo/other/issues",
+            headers={PROXY_HOST_HEADER: "api.github.com", "Authorization": test_client_secret, **headers},
+        )
+
+    with patch("httpx.AsyncClient.send", side_effect=send):
+        with patch("guardette.cache.time.monotonic", return_value=0.0):
+            first = get()
+        with patch("guardette.cache.time.monotonic", return_value=1000.0):
+            second = get()
+            third = get(**{"If-None-Match": first.headers["etag"]})
+
+    assert first.headers["x-guardette-cache"] == "MISS"
+    assert first.headers["etag"] != '"upstream-v1"'
+    assert second.headers["x-guardette-cache"] == "REVALIDATED"
+    assert second.json() == first.json() == [{"body": guardette.config.REDACT_TOKEN}]
+    assert third.status_code == 304
+    assert third.headers["etag"] == first.headers["etag"]
+    assert len(sent) == 2
+    assert "if-none-match" not in sent[0].headers
+    assert sent[1].headers["if-none-match"] == '"upstream-v1"'
+
+
+@pytest.mark.anyio
+@patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
+async def test_identical_concurrent_requests_share_one_upstream_call(mock_get):
+    calls = 0
+
+    async def send(*args, **kwargs):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return httpx.Response(status_code=200, stream=httpx.ByteStream(b'{"title": "secret"}'))
+
+    headers = {PROXY_HOST_HEADER: "hacker-news.firebaseio.com", "Authorization": test_client_secret}
+    followers = guardette.inflight.followers
+    with patch.object(guardette, "_send", side_effect=send):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as async_client:
+            responses = await asyncio.gather(*[async_client.get("/v0/item/1.json", headers=headers) for _ in range(4)])
+
+    assert [response.json() for response in responses] == [{"title": guardette.config.REDACT_TOKEN}] * 4
+    assert calls == 1
+    assert guardette.inflight.followers - followers == 3
+
+
+@pytest.mark.anyio
+@patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
+async def test_prefetch_rule_fetches_following_pages_in_the_background(mock_get):
+    requested = []
+
+    async def send(request, target, proxy_request):
+        page = int(httpx.URL(proxy_request.url).params["page"])
+        requested.append(page)
+        return httpx.Response(
+            status_code=200,
+            headers={
+                "content-type": "application/json",
+                "link": f'<https://api.github.com/repos/octo/repo/commits?page={page + 1}>; rel="next"',
+            },
+            stream=httpx.ByteStream(json.dumps([{"page": page}]).encode()),
+        )
+
+    headers = {PROXY_HOST_HEADER: "api.github.com", "Authorization": test_client_secret}
+    with patch.object(guardette, "_send", side_effect=send):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as async_client:
+            first = await async_client.get("/repos/octo/repo/commits?page=1", headers=headers)
+            await asyncio.gather(*guardette._prefetches)
+            assert requested == [1, 2, 3]
+
+            second = await async_client.get("/repos/octo/repo/commits?page=2", headers=headers)
+            await asyncio.gather(*guardette._prefetches)
+
+    assert "x-guardette-cache" not in first.headers
+    assert second.headers["x-guardette-cache"] == "PREFETCHED"
+    assert second.json() == [{"page": 2}]
+    assert requested == [1, 2, 3, 4]
+
+
+@pytest.mark.anyio
+@patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
+async def test_buffered_passthrough_rules_request_decodable_encodings(mock_get):
+    forwarded = []
+
+    async def send(request, target, proxy_request):
+        forwarded.append(proxy_request.headers["accept-encoding"])
+        return httpx.Response(
+            status_code=200,
+            headers={"content-type": "application/json"},
+            stream=httpx.ByteStream(json.dumps([{"sha": "abc"}]).encode()),
+        )
+
+    headers = {PROXY_HOST_HEADER: "api.github.com", "Authorization": test_client_secret, "Accept-Encoding": "br"}
+    with patch.object(guardette, "_send", side_effect=send):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as async_client:
+            response = await async_client.get("/repos/octo/repo/commits", headers=headers)
+            await asyncio.gather(*guardette._prefetches)
+
+    # The prefetch rule's body is read whole, so it must come in an encoding Guardette can decode.
+    assert response.status_code == 200, response.text
+    assert forwarded == [UPSTREAM_ACCEPT_ENCODING]
+    assert response.json() == [{"sha": "abc"}]
+
+
+def mock_batch_send(request, target, proxy_request):
+    path = httpx.URL(proxy_request.url).path
+    if path == "/v0/item/2.json":
+        raise GuardetteException("upstream exploded")
+    return httpx.Response(
+        status_code=200,
+        headers={"content-type": "application/json"},
+        stream=httpx.ByteStream(json.dumps({"title": "secret", "path": path}).encode()),
+    )
+
+
+@patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
+def test_batch_route_runs_sub_requests_through_the_policy(mock_get):
+    batch = {
+        "requests": [
+            {"host": "hacker-news.firebaseio.com", "path": "/v0/item/1.json"},
+            {"host": "hacker-news.firebaseio.com", "path": "/v0/item/2.json"},
+            {"host": "hacker-news.firebaseio.com", "path": "/v0/unknown"},
+        ]
+    }
+
+    with patch.object(guardette, "_send", side_effect=mock_batch_send):
+        response = client.post("/_guardette/batch", json=batch, headers={"Authorization": test_client_secret})
+
+    assert response.status_code == 200, response.text
+    results = response.json()["results"]
+    assert [result["index"] for result in results] == [0, 1, 2]
+    assert [result["status"] for result in results] == [200, 500, 404]
+    assert results[0]["body"] == {"title": guardette.config.REDACT_TOKEN, "path": "/v0/item/1.json"}
+    assert results[2]["body"]["error"]["message"] == "Not Found"
+
+
+@patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
+def test_batch_route_streams_ndjson(mock_get):
+    batch = {"requests": [{"host": "hacker-news.firebaseio.com", "path": f"/v0/item/{i}.json"} for i in (1, 3, 4)]}
+
+    with patch.object(guardette, "_send", side_effect=mock_batch_send):
+        response = client.post(
+            "/_guardette/batch",
+            json=batch,
+            headers={"Authorization": test_client_secret, "Accept": "application/x-ndjson"},
+        )
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(result["index"] for result in results) == [0, 1, 2]
+    assert all(result["body"]["title"] == guardette.config.REDACT_TOKEN for result in results)
+
+
+@patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
+def test_batch_sub_requests_do_not_inherit_the_batch_accept_header(mock_get):
+    batch = {"requests": [{"host": "hacker-news.firebaseio.com", "path": f"/v0/item/{i}.json"} for i in (1, 3)]}
+    upstream_accepts = []
+
+    def send(request, target, proxy_request):
+        upstream_accepts.append(proxy_request.headers.get("accept"))
+        return mock_batch_send(request, target, proxy_request)
+
+    with patch.object(guardette, "_send", side_effect=send):
+        response = client.post(
+            "/_guardette/batch",
+            json=batch,
+            headers={"Authorization": test_client_secret, "Accept": "application/x-ndjson"},
+        )
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert len(upstream_accepts) == 2
+    assert all(accept != "application/x-ndjson" for accept in upstream_accepts)
+
+
+@patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
+def test_batch_route_rejects_invalid_batches(mock_get):
+    for batch in [{"requests": []}, {"requests": [{"host": "h", "path": "/x", "method": "POST"}]}, {"oops": 1}]:
+        response = client.post("/_guardette/batch", json=batch, headers={"Authorization": test_client_secret})
+        assert response.status_code == 400
+
+    response = client.post("/_guardette/batch", json={"requests": [{"host": "h", "path": "/x"}]})
+    assert response.status_code == 401
+
+
+@patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
+def test_proxy_reports_phase_timings(mock_get):
+    upstream_response = httpx.Response(status_code=200, json={"title": "secret"})
+    reported = []
+    hook = guardette.timing_hook(lambda _request, _response, timings: reported.append(timings.as_dict()))
+
+    try:
+        with (
+            patch("httpx.AsyncClient.send", return_value=upstream_response),
+            patch.object(guardette.config, "SERVER_TIMING", True),
+        ):
+            response = client.get(
+                "/v0/item/8863.json",
+                headers={PROXY_HOST_HEADER: "hacker-news.firebaseio.com", "Authorization": test_client_secret},
+            )
+    finally:
+        guardette.timing_hooks.remove(hook)
+
+    assert response.status_code == 200, response.text
+    metrics = [metric.split(";")[0] for metric in response.headers["server-timing"].split(", ")]
+    for name in ["secrets", "upstream", "upstream_body", "parse", "action.redact", "serialize", "compress", "total"]:
+        assert name in metrics
+    assert len(reported) == 1
+    assert set(reported[0]) == set(metrics)
+
+
+@pytest.mark.parametrize(
+    ("actions", "phases"),
+    [
+        ([{"kind": "redact", "json_paths": ["$.title", "$.by"]}], {"action.redact"}),
+        (
+            [
+                {"kind": "redact", "json_paths": ["$.title"]},
+                {"kind": "pseudonymize_email", "json_paths": ["$.email"]},
+                {"kind": "redact", "json_paths": ["$.by"]},
+            ],
+            {"action.redact+pseudonymize_email"},
+        ),
+    ],
+)
+@patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
+def test_fused_actions_are_timed_under_their_kinds(mock_get, monkeypatch, actions, phases):
+    monkeypatch.setenv("PSEUDONYMIZE_SALT", "salt")
+    match = {
+        "target": Source(host="hacker-news.firebaseio.com", rules=[]),
+        "rule": Rule.model_validate({"route": "GET /{path:path}", "actions": actions}),
+        "path_params": {},
+    }
+    upstream_response = httpx.Response(status_code=200, json={"title": "t", "by": "pg", "email": "a@example.com"})
+    reported = []
+    hook = guardette.timing_hook(lambda _request, _response, timings: reported.append(timings.as_dict()))
+
+    try:
+        with (
+            patch("guardette.matching.Matcher.match", return_value=match),
+            patch("httpx.AsyncClient.send", return_value=upstream_response),
+        ):
+            response = client.get(
+                "/v0/item/8863.json",
+                headers={PROXY_HOST_HEADER: "hacker-news.firebaseio.com", "Authorization": test_client_secret},
+            )
+    finally:
+        guardette.timing_hooks.remove(hook)
+
+    assert response.status_code == 200, response.text
+    assert {name for name in reported[0] if name.startswith("action.")} == phases
+
+
+@patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
+def test_server_timing_header_is_opt_in(mock_get):
+    response = client.get("/_guardette/meta", headers={"Authorization": test_client_secret})
+
+    assert response.status_code == 200
+    assert "server-timing" not in response.headers
+
+
+@patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
+def test_metrics_route_exposes_request_and_upstream_metrics(mock_get):
+    upstream_response = httpx.Response(status_code=200, json={"title": "secret"})
+    with patch("httpx.AsyncClient.send", return_value=upstream_response):
+        client.get(
+            "/v0/item/8863.json",
+            headers={PROXY_HOST_HEADER: "hacker-news.firebaseio.com", "Authorization": test_client_secret},
+        )
+    client.get("/unmatched", headers={PROXY_HOST_HEADER: "evil.example.com", "Authorization": test_client_secret})
+
+    assert client.get("/_guardette/metrics").status_code == 401
+    response = client.get("/_guardette/metrics", headers={"Authorization": test_client_secret})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    labels = 'host="hacker-news.firebaseio.com",route="GET /v0/item/{itemId}",method="GET",status="200"'
+    assert f"\nguardette_requests_total{{{labels}}} " in text
+    assert f"\nguardette_request_duration_seconds_count{{{labels}}} " in text
+    assert '\nguardette_requests_total{host="",route="",method="GET",status="404"} ' in text
+    assert '\nguardette_upstream_duration_seconds_count{host="hacker-news.firebaseio.com",method="GET"' in text
+    assert '\nguardette_response_size_bytes_count{host="hacker-news.firebaseio.com"' in text
+    assert "\nguardette_requests_in_flight 1\n" in text
+    assert "evil.example.com" not in text
+    assert '\nguardette_cache_hit_ratio{cache="json_path"} ' in text
+
+
+@patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
+def test_sampled_requests_are_traced_and_propagated_upstream(mock_get):
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    exporter = guardette.trace_exporter(tracing.InMemoryExporter())
+    upstream_response = httpx.Response(status_code=200, json={"title": "secret"})
+
+    try:
+        with patch("httpx.AsyncClient.send", return_value=upstream_response) as upstream_send:
+            response = client.get(
+                "/v0/item/8863.json",
+                headers={
+                    PROXY_HOST_HEADER: "hacker-news.firebaseio.com",
+                    "Authorization": test_client_secret,
+                    "traceparent": f"00-{trace_id}-00f067aa0ba902b7-01",
+                },
+            )
+    finally:
+        guardette.tracer.exporter = None
+
+    assert response.status_code == 200, response.text
+    spans = {span.name: span for span in exporter.spans}
+    assert {"guardette.request", "secrets", "transform_request", "upstream", "action.redact"} <= set(spans)
+    root = spans["guardette.request"]
+    assert root.parent_id == "00f067aa0ba902b7"
+    assert root.attributes["guardette.route"] == "GET /v0/item/{itemId}"
+    assert root.attributes["http.response.status_code"] == 200
+    assert all(span.trace_id == trace_id for span in exporter.spans)
+    assert spans["action.redact"].parent_id == spans["transform_response"].span_id
+    upstream_request = upstream_send.call_args.args[0]
+    assert upstream_request.headers["traceparent"] == spans["upstream"].traceparent
+
+
+@patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
+def test_success_logs_are_sampled_per_source(mock_get, caplog):
+    def get(path):
+        return client.get(
+            path,
+            headers={PROXY_HOST_HEADER: "hacker-news.firebaseio.com", "Authorization": test_client_secret},
+        )
+
+    upstream_response = httpx.Response(status_code=200, json={"title": "secret"})
+    with (
+        patch.dict(guardette._log_sample_rates, {"hacker-news.firebaseio.com": 0.0}),
+        patch("httpx.AsyncClient.send", return_value=upstream_response),
+        caplog.at_level(logging.INFO, logger="guardette"),
+    ):
+        assert get("/v0/item/8863.json").status_code == 200
+        assert get("/v0/unknown").status_code == 404
+
+    messages = [record.message for record in caplog.records]
+    assert "Guardette request processed successfully" not in messages
+    assert "Incoming guardette request" not in messages
+    (not_found,) = [record for record in caplog.records if record.message == "No matching route found"]
+    assert not_found.url == "http://testserver/v0/unknown"
+
+
+@patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
+def test_recording_writes_sanitized_exchanges(mock_get, tmp_path):
+    path = tmp_path / "exchanges.jsonl"
+    guardette.recorder = Recorder(str(path))
+    upstream_response = httpx.Response(status_code=200, headers={"set-cookie": "a=b"}, json={"title": "secret"})
+    try:
+        with patch("httpx.AsyncClient.send", return_value=upstream_response):
+            response = client.get(
+                "/v0/item/8863.json?print=pretty",
+                headers={PROXY_HOST_HEADER: "hacker-news.firebaseio.com", "Authorization": test_client_secret},
+            )
+    finally:
+        guardette.recorder.shutdown()
+        guardette.recorder = None
+
+    assert response.status_code == 200, response.text
+    (exchange,) = [json.loads(line) for line in path.read_text().splitlines()]
+    assert exchange["request"]["method"] == "GET"
+    assert exchange["request"]["host"] == "hacker-news.firebaseio.com"
+    assert exchange["request"]["path"] == "/v0/item/8863.json"
+    assert exchange["request"]["query"] == "print=pretty"
+    assert "authorization" not in exchange["request"]["headers"]
+    assert exchange["upstream"]["url"] == "https://hacker-news.firebaseio.com/v0/item/8863.json?print=pretty"
+    assert json.loads(exchange["upstream"]["body"]) == {"title": guardette.config.REDACT_TOKEN}
+    assert "set-cookie" not in exchange["upstream"]["headers"]
+    assert exchange["response"]["status_code"] == 200
+    assert exchange["response"]["sha256"] == body_digest(response.content)
+
+
+@patch("httpx.AsyncClient.send", side_effect=mock_streamed_html_response)
+@patch("guardette.matching.Matcher.match", return_value=mock_http_bin_match())
+@patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
+def test_recording_writes_passthrough_exchanges_by_size(mock_get, mock_match, mock_send, tmp_path):
+    path = tmp_path / "exchanges.jsonl"
+    guardette.recorder = Recorder(str(path))
+    try:
+        response = client.get(
+            "/some/path", headers={PROXY_HOST_HEADER: "httpbin.org", "Authorization": test_client_secret}
+        )
+    finally:
+        guardette.recorder.shutdown()
+        guardette.recorder = None
+
+    assert response.status_code == 200, response.text
+    (exchange,) = [json.loads(line) for line in path.read_text().splitlines()]
+    assert exchange["request"]["path"] == "/some/path"
+    assert exchange["upstream"]["url"] == "https://httpbin.org/some/path"
+    assert exchange["upstream"]["status_code"] == 200
+    assert exchange["upstream"]["headers"]["content-type"] == "text/html"
+    assert exchange["upstream"]["size"] == len(response.content)
+    assert "body" not in exchange["upstream"]
+    assert exchange["response"] == {"status_code": 200, "size": len(response.content), "sha256": None, "cache": None}
+
+
+@patch("httpx.AsyncClient.send", side_effect=mock_chunked_json_response)
+@patch("guardette.matching.Matcher.match", return_value=mock_http_bin_stream_match())
+@patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
+def test_recording_writes_streamed_exchanges_by_size(mock_get, mock_match, mock_send, tmp_path):
+    path = tmp_path / "exchanges.jsonl"
+    guardette.recorder = Recorder(str(path))
+    try:
+        response = client.get(
+            "/some/path",
+            headers={
+                PROXY_HOST_HEADER: "httpbin.org",
+                "Authorization": test_client_secret,
+                "Accept-Encoding": "identity",
+            },
+        )
+    finally:
+        guardette.recorder.shutdown()
+        guardette.recorder = None
+
+    assert response.status_code == 200, response.text
+    (exchange,) = [json.loads(line) for line in path.read_text().splitlines()]
+    upstream_body = b'{"total": 2, "items": [{"title": "a", "id": 1}, {"title": "b", "id": 2}]}'
+    assert exchange["upstream"]["size"] == len(upstream_body)
+    assert "body" not in exchange["upstream"]
+    assert exchange["response"]["size"] == len(response.content)
+    assert exchange["response"]["sha256"] is None
+
+
+@pytest.mark.parametrize("raw_bodies", [False, True])
+@patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
+def test_recording_leaves_out_redacted_values_and_credential_query_params(mock_get, tmp_path, raw_bodies):
+    path = tmp_path / "exchanges.jsonl"
+    guardette.recorder = Recorder(str(path), raw_bodies=raw_bodies)
+    upstream_response = httpx.Response(status_code=200, json={"title": "Ada Lovelace", "by": "pg"})
+    try:
+        with patch("httpx.AsyncClient.send", return_value=upstream_response):
+            response = client.get(
+                "/v0/item/8863.json?print=pretty&private_token=glpat-leaked&Access_Token=leaked-too",
+                headers={PROXY_HOST_HEADER: "hacker-news.firebaseio.com", "Authorization": test_client_secret},
+            )
+    finally:
+        guardette.recorder.shutdown()
+        guardette.recorder = None
+
+    assert response.status_code == 200, response.text
+    recorded = path.read_text()
+    assert "leaked" not in recorded
+    (exchange,) = [json.loads(line) for line in recorded.splitlines()]
+    assert exchange["request"]["query"] == "print=pretty"
+    assert exchange["upstream"]["url"] == "https://hacker-news.firebaseio.com/v0/item/8863.json?print=pretty"
+    # Raw bodies are only recorded when asked for.
+    assert ("Ada Lovelace" in recorded) is raw_bodies
+
+
+@patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
+def test_upstream_responses_over_the_size_limit_are_refused(mock_get):
+    upstream_response = httpx.Response(status_code=200, json={"title": "x" * 100})
+    with (
+        patch.object(guardette.config, "RESPONSE_MAX_BYTES", 64),
+        patch("httpx.AsyncClient.send", return_value=upstream_response),
+    ):
+        response = client.get(
+            "/v0/item/8863.json",
+            headers={PROXY_HOST_HEADER: "hacker-news.firebaseio.com", "Authorization": test_client_secret},
+        )
+
+    assert response.status_code == 502
+    assert response.json()["error"]["message"] == "Upstream response too large"
+
+
+@patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
+def test_large_upstream_bodies_are_spilled_to_disk_and_transformed(mock_get):
+    upstream_response = httpx.Response(
+        status_code=200, stream=MockAsyncStream(b'{"title": "secret", ', b'"padding": "' + b"x" * 4096 + b'"}')
+    )
+    with (
+        patch.object(guardette.config, "BUFFER_SPILL_BYTES", 1024),
+        patch("httpx.AsyncClient.send", return_value=upstream_response),
+    ):
+        response = client.get(
+            "/v0/item/8863.json",
+            headers={PROXY_HOST_HEADER: "hacker-news.firebaseio.com", "Authorization": test_client_secret},
+        )
+
+    assert response.status_code == 200, response.text
+    assert response.json() == {"title": guardette.config.REDACT_TOKEN, "padding": "x" * 4096}
+
+
+def make_reloadable_guardette(tmp_path) -> tuple[Guardette, FastAPI, Path]:
+    policy_path = tmp_path / "policy.yml"
+    policy_path.write_text(Path("tests/test_policy.yml").read_text())
+    reloadable = Guardette(policy_path=str(policy_path))
+    reloadable_app = FastAPI()
+    reloadable.to_fastapi(reloadable_app)
+    return reloadable, reloadable_app, policy_path
+
+
+@patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
+def test_policy_reload_recompiles_only_changed_sources(mock_get, tmp_path):
+    reloadable, reloadable_app, policy_path = make_reloadable_guardette(tmp_path)
+    github = next(source for source in reloadable.policy.sources if source.host == "api.github.com")
+    github_cache = reloadable.response_caches[("api.github.com", "GET /repos/{owner}/{repo}/issues")]
+    github_matcher = reloadable.matcher.target_matchers["api.github.com"]
+
+    policy = yaml.safe_load(policy_path.read_text())
+    policy["sources"][0]["rules"][0]["actions"][0]["json_paths"] = ["$.by"]
+    policy["sources"].append({"host": "api.example.com", "rules": [{"route": "GET /items"}]})
+    policy_path.write_text(yaml.safe_dump(policy))
+
+    headers = {PROXY_HOST_HEADER: "hacker-news.firebaseio.com", "Authorization": test_client_secret}
+    upstream_response = httpx.Response(status_code=200, json={"title": "t", "by": "someone"})
+    with TestClient(reloadable_app) as reloadable_client:
+        response = reloadable_client.post("/_guardette/reload", headers={"Authorization": test_client_secret})
+        with patch("httpx.AsyncClient.send", return_value=upstream_response):
+            proxied = reloadable_client.get("/v0/item/1.json", headers=headers)
+
+    assert response.status_code == 200, response.text
+    assert response.json() == {"added": ["api.example.com"], "changed": ["hacker-news.firebaseio.com"], "removed": []}
+    assert proxied.json() == {"title": "t", "by": reloadable.config.REDACT_TOKEN}
+    assert next(source for source in reloadable.policy.sources if source.host == "api.github.com") is github
+    assert reloadable.response_caches[("api.github.com", "GET /repos/{owner}/{repo}/issues")] is github_cache
+    assert reloadable.matcher.target_matchers["api.github.com"] is github_matcher
+
+
+@patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
+def test_invalid_policy_reload_keeps_the_current_policy(mock_get, tmp_path):
+    reloadable, reloadable_app, policy_path = make_reloadable_guardette(tmp_path)
+    policy = reloadable.policy
+    policy_path.write_text("version: '1'\nsources:\n- host: a.example.com\n  rules:\n  - route: GET\n    actions: 1\n")
+
+    with TestClient(reloadable_app) as reloadable_client:
+        response = reloadable_client.post("/_guardette/reload", headers={"Authorization": test_client_secret})
+        unauthorized = reloadable_client.post("/_guardette/reload")
+
+    assert response.status_code == 400
+    assert response.json()["error"]["message"] == "Invalid policy"
+    assert unauthorized.status_code == 401
+    assert reloadable.policy is policy
+
+
+@pytest.mark.anyio
+@patch("guardette.secrets.ConfigSecretsManager.get", side_effect=get_secret)
+async def test_requests_in_flight_during_a_reload_finish_on_the_old_policy(mock_get, tmp_path):
+    reloadable, reloadable_app, policy_path = make_reloadable_guardette(tmp_path)
+    policy = yaml.safe_load(policy_path.read_text())
+    policy["sources"][0]["rules"][0]["actions"] = []
+    policy_path.write_text(yaml.safe_dump(policy))
+    sent = asyncio.Event()
+    release = asyncio.Event()
+
+    async def send(*args, **kwargs):
+        sent.set()
+        await release.wait()
+        return httpx.Response(status_code=200, stream=httpx.ByteStream(b'{"title": "secret"}'))
+
+    headers = {PROXY_HOST_HEADER: "hacker-news.firebaseio.com", "Authorization": test_client_secret}
+    with patch.object(reloadable, "_send", side_effect=send):
+        transport = httpx.ASGITransport(app=reloadable_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            in_flight = asyncio.create_task(async_client.get("/v0/item/1.json", headers=headers))
+            await sent.wait()
+            await reloadable.reload_policy()
+            release.set()
+            response = await in_flight
+
+    assert response.json() == {"title": reloadable.config.REDACT_TOKEN}
+    assert reloadable.matcher.target_matchers["hacker-news.firebaseio.com"].rule_matchers[0].rule.actions == []
+
+
+@pytest.mark.anyio
+async def test_policy_file_changes_are_picked_up_by_the_watcher(tmp_path):
+    reloadable, _, policy_path = make_reloadable_guardette(tmp_path)
+    policy = yaml.safe_load(policy_path.read_text())
+    policy["sources"] = policy["sources"][:1]
+
+    watcher = asyncio.create_task(reloadable._watch_policy_file(0.01))
+    try:
+        policy_path.write_text(yaml.safe_dump(policy))
+        os.utime(policy_path, (0, 0))
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if len(reloadable.policy.sources) == 1:
+                break
+    finally:
+        watcher.cancel()
+
+    assert [source.host for source in reloadable.policy.sources] == ["hacker-news.firebaseio.com"]
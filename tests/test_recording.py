@@ -0,0 +1,71 @@
+import httpx
+import pytest
+
+from guardette.recording import (
+    decode_body,
+    encode_body,
+    make_recorder,
+    sanitize_headers,
+    sanitize_query,
+    upstream_entry,
+)
+
+
+def test_sanitize_headers_drops_credentials_and_wire_encoding():
+    headers = {
+        "Authorization": "Bearer abc",
+        "Cookie": "session=1",
+        "X-Api-Key": "abc",
+        "Private-Token": "abc",
+        "X-Guardette-Host": "api.github.com",
+        "Content-Encoding": "gzip",
+        "Accept": "application/json",
+        "X-Request-Id": "42",
+    }
+    assert sanitize_headers(headers) == {"accept": "application/json", "x-request-id": "42"}
+
+
+@pytest.mark.parametrize(
+    ("query", "sanitized"),
+    [
+        ("", ""),
+        ("page=2&per_page=100", "page=2&per_page=100"),
+        ("private_token=glpat-x&page=2", "page=2"),
+        ("q=a%20b&access_token=x&API_KEY=y&client_secret=z&sig=1", "q=a%20b&sig=1"),
+        ("private%5Ftoken=x&state=opened", "state=opened"),
+    ],
+)
+def test_sanitize_query_drops_credential_params(query, sanitized):
+    assert sanitize_query(query) == sanitized
+
+
+@pytest.mark.parametrize("body", [b'{"a": "\xc3\xa9"}', b"\x1f\x8b\x08\x00\xff"])
+def test_bodies_round_trip(body):
+    assert decode_body(encode_body(body)) == body
+
+
+def test_upstream_entry_records_the_decoded_body():
+    response = httpx.Response(200, headers={"set-cookie": "a=b", "etag": '"1"'}, json={"title": "secret"})
+    entry = upstream_entry("https://user:pw@api.github.com/issues?page=2&access_token=x", response, response.content)
+    assert entry == {
+        "url": "https://api.github.com/issues?page=2",
+        "status_code": 200,
+        "headers": {"content-type": "application/json", "etag": '"1"'},
+        "elapsed_ms": None,
+        "body": '{"title":"secret"}',
+    }
+
+
+def test_recorder_is_off_without_a_file(tmp_path):
+    assert make_recorder("", 1.0) is None
+    recorder = make_recorder(str(tmp_path / "exchanges.jsonl"), 0.0)
+    assert not recorder.sample()
+    recorder.shutdown()
+
+
+def test_upstream_entry_records_streamed_responses_by_size():
+    response = httpx.Response(200, headers={"content-type": "text/html"}, stream=httpx.ByteStream(b"<html></html>"))
+    response.read()
+    entry = upstream_entry("https://httpbin.org/html", response, None)
+    assert entry["size"] == len(b"<html></html>")
+    assert "body" not in entry
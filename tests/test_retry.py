@@ -0,0 +1,30 @@
+from guardette.policy import Retry
+from guardette.retry import MIN_LATENCY_SAMPLES, LatencyTracker, backoff_delay
+
+
+def test_backoff_delay_grows_exponentially_up_to_the_cap():
+    retry = Retry(backoff_secs=0.1, max_backoff_secs=0.5)
+
+    for attempt, cap in [(1, 0.1), (2, 0.2), (3, 0.4), (4, 0.5), (10, 0.5)]:
+        delays = [backoff_delay(retry, attempt) for _ in range(50)]
+        assert all(0 <= delay <= cap for delay in delays)
+
+
+def test_latency_tracker_needs_enough_samples():
+    latencies = LatencyTracker()
+    for _ in range(MIN_LATENCY_SAMPLES - 1):
+        latencies.observe(0.1)
+
+    assert latencies.percentile(95) is None
+
+
+def test_latency_tracker_percentile_over_a_sliding_window():
+    latencies = LatencyTracker(window=100)
+    for i in range(100):
+        latencies.observe(10 + i)
+    for i in range(100):
+        latencies.observe(i / 100)
+
+    assert len(latencies) == 100
+    assert latencies.percentile(95) == 0.95
+    assert latencies.percentile(50) == 0.5
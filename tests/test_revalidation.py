@@ -0,0 +1,57 @@
+import pytest
+
+from guardette.datastructures import BufferedResponse
+from guardette.revalidation import entity_tag, is_not_modified, not_modified_response, upstream_validators
+
+ETAG = entity_tag(b'{"title":"[REDACTED]"}')
+LAST_MODIFIED = "Wed, 21 Oct 2015 07:28:00 GMT"
+
+
+def test_entity_tag_is_weak_and_stable():
+    assert ETAG.startswith('W/"')
+    assert entity_tag(b'{"title":"[REDACTED]"}') == ETAG
+    assert entity_tag(b"{}") != ETAG
+
+
+def test_upstream_validators():
+    assert upstream_validators({"etag": '"abc"', "last-modified": LAST_MODIFIED}) == {
+        "if-none-match": '"abc"',
+        "if-modified-since": LAST_MODIFIED,
+    }
+    assert upstream_validators({}) == {}
+
+
+@pytest.mark.parametrize(
+    ("request_headers", "expected"),
+    [
+        ({}, False),
+        ({"if-none-match": ETAG}, True),
+        ({"if-none-match": ETAG.removeprefix("W/")}, True),
+        ({"if-none-match": f'"other", {ETAG}'}, True),
+        ({"if-none-match": "*"}, True),
+        ({"if-none-match": '"other"'}, False),
+        # If-None-Match takes precedence over If-Modified-Since.
+        ({"if-none-match": '"other"', "if-modified-since": LAST_MODIFIED}, False),
+        ({"if-modified-since": LAST_MODIFIED}, True),
+        ({"if-modified-since": "Tue, 20 Oct 2015 07:28:00 GMT"}, False),
+        ({"if-modified-since": "not a date"}, False),
+    ],
+)
+def test_is_not_modified(request_headers, expected):
+    assert is_not_modified(request_headers, {"etag": ETAG, "last-modified": LAST_MODIFIED}) is expected
+
+
+def test_not_modified_response_keeps_only_validator_headers():
+    response = not_modified_response(
+        BufferedResponse(
+            status_code=200,
+            headers={"etag": ETAG, "content-type": "application/json", "cache-control": "private"},
+            body=b"{}",
+        )
+    )
+
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["etag"] == ETAG
+    assert response.headers["cache-control"] == "private"
+    assert "content-type" not in response.headers
@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+import pytest
+
+from guardette.exceptions import UpstreamRateLimitedException
+from guardette.policy import RateLimit
+from guardette.scheduler import SourceScheduler, parse_delay
+
+NOW = 1_700_000_000.0
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        ("30", 30.0),
+        ("0", 0.0),
+        (str(int(NOW) + 60), 60.0),
+        (str(int(NOW) - 60), 0.0),
+        ("Tue, 14 Nov 2023 22:12:20 GMT", 0.0),
+        ("Tue, 14 Nov 2023 22:14:20 GMT", 60.0),
+        ("2023-11-14T22:14:20Z", 60.0),
+        ("soon", None),
+    ],
+)
+def test_parse_delay(value, expected):
+    assert parse_delay(value, NOW) == expected
+
+
+@pytest.mark.anyio
+async def test_token_bucket_paces_requests_beyond_the_burst():
+    scheduler = SourceScheduler("h", RateLimit(requests_per_second=50, burst=2))
+
+    start_time = time.monotonic()
+    for _ in range(4):
+        async with scheduler.slot():
+            pass
+
+    # Two requests go out right away, the next two are 20ms apart.
+    assert time.monotonic() - start_time >= 0.035
+    assert scheduler.waited == 2
+
+
+@pytest.mark.anyio
+async def test_concurrency_is_capped_per_source():
+    scheduler = SourceScheduler("h", RateLimit(max_concurrency=2))
+    peak = 0
+
+    async def request():
+        nonlocal peak
+        async with scheduler.slot():
+            peak = max(peak, scheduler.in_flight)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*[request() for _ in range(6)])
+
+    assert peak == 2
+    assert scheduler.stats()["queue_depth"] == 0
+
+
+@pytest.mark.anyio
+async def test_retry_after_pauses_requests():
+    scheduler = SourceScheduler("h", RateLimit())
+    scheduler.observe(429, {"retry-after": "0.05"})
+
+    start_time = time.monotonic()
+    async with scheduler.slot():
+        pass
+
+    assert time.monotonic() - start_time >= 0.04
+
+
+@pytest.mark.anyio
+async def test_exhausted_budget_pauses_until_reset_and_rejects_long_waits():
+    scheduler = SourceScheduler("h", RateLimit(max_wait_secs=1))
+    scheduler.observe(200, {"x-ratelimit-remaining": "0", "x-ratelimit-reset": str(int(time.time()) + 600)})
+
+    with pytest.raises(UpstreamRateLimitedException):
+        async with scheduler.slot():
+            pass
+
+    stats = scheduler.stats()
+    assert stats["remaining"] == 0
+    assert stats["rejected"] == 1
+    assert stats["paused_for_secs"] > 500
+
+
+def test_remaining_budget_without_throttling_does_not_pause():
+    scheduler = SourceScheduler("h", RateLimit())
+    scheduler.observe(200, {"ratelimit-remaining": "42", "ratelimit-reset": "60"})
+
+    assert scheduler.stats()["remaining"] == 42
+    assert scheduler.stats()["paused_for_secs"] == 0
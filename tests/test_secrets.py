@@ -102,3 +102,4 @@ async def test_aws_secrets_manager_caches_secrets(caplog):
     ]
     assert len(info_logs) == 1
     assert info_logs[0].correlation_id == "ijkl-9012"
+    assert (aws_secrets_manager.cache_stats.hits, aws_secrets_manager.cache_stats.misses) == (1, 1)
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from guardette.singleflight import SingleFlight
+
+
+@pytest.mark.anyio
+async def test_concurrent_calls_share_one_result():
+    inflight = SingleFlight()
+    release = asyncio.Event()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return object()
+
+    waiters = [asyncio.create_task(inflight.do("key", fetch)) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*waiters)
+
+    assert calls == 1
+    assert all(result is results[0] for result in results)
+    assert inflight.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 4}
+
+
+@pytest.mark.anyio
+async def test_calls_are_not_coalesced_once_finished_or_across_keys():
+    inflight = SingleFlight()
+
+    async def fetch():
+        return object()
+
+    first = await inflight.do("a", fetch)
+    second = await inflight.do("a", fetch)
+    other = await inflight.do("b", fetch)
+
+    assert len({id(first), id(second), id(other)}) == 3
+    assert inflight.leaders == 3
+
+
+@pytest.mark.anyio
+async def test_errors_are_shared_with_followers():
+    inflight = SingleFlight()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        raise ValueError("upstream failed")
+
+    waiters = [asyncio.create_task(inflight.do("key", fetch)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+@pytest.mark.anyio
+async def test_cancelling_the_leader_does_not_cancel_followers():
+    inflight = SingleFlight()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return "ok"
+
+    leader = asyncio.create_task(inflight.do("key", fetch))
+    follower = asyncio.create_task(inflight.do("key", fetch))
+    await asyncio.sleep(0)
+    leader.cancel()
+    release.set()
+
+    assert await follower == "ok"
+    assert leader.cancelled()
@@ -0,0 +1,149 @@
+import copy
+import json
+
+import pytest
+
+from guardette.actions import action_registry
+from guardette.exceptions import TransformationException
+from guardette.json_codec import StdlibJsonCodec
+from guardette.streaming import compile_stream_plan, transform_json_stream
+
+ISSUES = {
+    "startAt": 0,
+    "maxResults": 3,
+    "names": {"summary": "Summary"},
+    "issues": [
+        {"key": "A-1", "fields": {"summary": "first", "reporter": {"email": "a@example.com"}, "worklog": [1]}},
+        {"key": "A-2", "fields": {"summary": "ünïcödé", "reporter": {"email": "b@example.com"}, "worklog": []}},
+        {"key": "A-3", "fields": {"summary": 3.5e10, "reporter": None}},
+    ],
+    "total": 3,
+}
+
+
+def make_actions(*specs):
+    return [action_registry.get_action_cls(spec.pop("kind")).model_validate(spec) for spec in specs]
+
+
+async def chunked(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i : i + size]
+
+
+async def run_stream(action_context, plan, data: bytes, chunk_size: int):
+    async def apply(batch):
+        action_context.response.json_data = batch
+        for action in plan.actions:
+            await action.response(action_context)
+
+    stream = transform_json_stream(chunked(data, chunk_size), plan, apply, dumps=StdlibJsonCodec().dumps)
+    return b"".join([chunk async for chunk in stream])
+
+
+def test_compile_stream_plan_rewrites_paths_relative_to_elements():
+    plan = compile_stream_plan(
+        make_actions(
+            {"kind": "redact", "json_paths": ["$.issues[*].fields.summary"]},
+            {"kind": "remove", "json_paths": ["$['issues'][*].fields.worklog"]},
+        )
+    )
+
+    assert plan is not None
+    assert plan.key == "issues"
+    assert [action.json_paths for action in plan.actions] == [["$[*].fields.summary"], ["$[*].fields.worklog"]]
+
+
+@pytest.mark.parametrize(
+    "json_paths",
+    [
+        ["$.total"],
+        ["$..email"],
+        ["$.issues[*]"],
+        ["$.issues[*].key", "$.values[*].key"],
+        ["$.issues[0].key"],
+    ],
+)
+def test_compile_stream_plan_rejects_paths_outside_a_single_array(json_paths):
+    assert compile_stream_plan(make_actions({"kind": "redact", "json_paths": json_paths})) is None
+
+
+def test_compile_stream_plan_requires_response_actions():
+    assert compile_stream_plan([]) is None
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 20])
+async def test_transform_json_stream_matches_buffered_transformation(action_context, chunk_size):
+    actions = make_actions(
+        {"kind": "redact", "json_paths": ["$.issues[*].fields.summary"]},
+        {"kind": "nullify", "json_paths": ["$.issues[*].fields.reporter.email"]},
+        {"kind": "remove", "json_paths": ["$.issues[*].fields.worklog"]},
+    )
+    expected = copy.deepcopy(ISSUES)
+    action_context.response.json_data = expected
+    for action in actions:
+        await action.response(action_context)
+
+    plan = compile_stream_plan(actions)
+    data = json.dumps(ISSUES, indent=2, ensure_ascii=False).encode()
+    result = await run_stream(action_context, plan, data, chunk_size)
+
+    assert json.loads(result) == expected
+    assert list(json.loads(result)) == list(ISSUES)
+
+
+@pytest.mark.anyio
+async def test_transform_json_stream_handles_top_level_arrays(action_context):
+    plan = compile_stream_plan(make_actions({"kind": "redact", "json_paths": ["$[*].diff"]}))
+    data = json.dumps([{"diff": "secret", "path": "a"}, {"path": "b"}]).encode()
+
+    result = await run_stream(action_context, plan, data, 5)
+
+    assert json.loads(result) == [{"diff": "[REDACTED]", "path": "a"}, {"path": "b"}]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    ("document", "expected"),
+    [
+        ({"issues": []}, {"issues": []}),
+        ({"issues": None}, {"issues": None}),
+        ({"issues": {"key": "x"}}, {"issues": {"key": "[REDACTED]"}}),
+        ({}, {}),
+    ],
+)
+async def test_transform_json_stream_handles_degenerate_arrays(action_context, document, expected):
+    plan = compile_stream_plan(make_actions({"kind": "redact", "json_paths": ["$.issues[*].key"]}))
+
+    result = await run_stream(action_context, plan, json.dumps(document).encode(), 3)
+
+    assert json.loads(result) == expected
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "document",
+    [{"items": None}, {"items": []}, {"items": [[1, {"a": 1}], [], [None]]}, {}],
+)
+@pytest.mark.parametrize("json_path", ["$.items[*][*]", "$.items[*][0].a"])
+async def test_transform_json_stream_matches_buffered_transformation_of_degenerate_arrays(
+    action_context, document, json_path
+):
+    actions = make_actions({"kind": "remove", "json_paths": [json_path]})
+    expected = copy.deepcopy(document)
+    action_context.response.json_data = expected
+    for action in actions:
+        await action.response(action_context)
+
+    result = await run_stream(action_context, compile_stream_plan(actions), json.dumps(document).encode(), 3)
+
+    assert json.loads(result) == expected
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("data", [b'{"issues": [{"key": 1}', b'{"issues": []} trailing', b"[1, 2]"])
+async def test_transform_json_stream_rejects_malformed_json(action_context, data):
+    plan = compile_stream_plan(make_actions({"kind": "redact", "json_paths": ["$.issues[*].key"]}))
+
+    with pytest.raises(TransformationException, match="Malformed JSON"):
+        await run_stream(action_context, plan, data, 4)
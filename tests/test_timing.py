@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+from guardette import timing
+
+
+def test_phase_is_a_no_op_outside_a_request():
+    with timing.phase("upstream"):
+        pass
+
+    assert timing.current() is None
+
+
+def test_repeated_phases_add_up():
+    with timing.record() as timings:
+        with timing.phase("action.redact"):
+            pass
+        timings.add("action.redact", 0.5)
+        timings.add("upstream", 0.25)
+
+    assert timing.current() is None
+    assert timings.phases["action.redact"] >= 0.5
+    result = timings.as_dict()
+    assert result["upstream"] == 250.0
+    assert list(result) == ["action.redact", "upstream", "total"]
+
+
+def test_server_timing_header_value():
+    timings = timing.Timings()
+    timings.add("secrets", 0.0012)
+    timings.add("upstream", 0.25)
+
+    metrics = timings.server_timing().split(", ")
+
+    assert metrics[:2] == ["secrets;dur=1.2", "upstream;dur=250.0"]
+    assert metrics[2].startswith("total;dur=")
+
+
+@pytest.mark.anyio
+async def test_tasks_record_into_the_request_unless_detached():
+    async def work(detach: bool):
+        if detach:
+            timing.detach()
+        with timing.phase("upstream" if not detach else "prefetch"):
+            await asyncio.sleep(0)
+
+    with timing.record() as timings:
+        await asyncio.gather(asyncio.create_task(work(False)), asyncio.create_task(work(True)))
+
+    assert set(timings.phases) == {"upstream"}
@@ -0,0 +1,91 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+from guardette import timing, tracing
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        (f"00-{TRACE_ID}-{PARENT_ID}-01", (TRACE_ID, PARENT_ID, True)),
+        (f"00-{TRACE_ID.upper()}-{PARENT_ID}-00", (TRACE_ID, PARENT_ID, False)),
+        (f"ff-{TRACE_ID}-{PARENT_ID}-01", None),
+        (f"00-{'0' * 32}-{PARENT_ID}-01", None),
+        (f"00-{TRACE_ID}-{PARENT_ID}", None),
+        (None, None),
+    ],
+)
+def test_parse_traceparent(value, expected):
+    assert tracing.parse_traceparent(value) == expected
+
+
+def test_spans_nest_under_the_request_and_continue_the_callers_trace():
+    exporter = tracing.InMemoryExporter()
+    tracer = tracing.Tracer(exporter)
+
+    with tracer.trace("request", f"00-{TRACE_ID}-{PARENT_ID}-01") as root:
+        with tracing.span("upstream", host="example.com") as upstream:
+            assert tracing.current() is upstream
+            assert upstream.traceparent == f"00-{TRACE_ID}-{upstream.span_id}-01"
+        with pytest.raises(ValueError), tracing.span("action.redact"):
+            raise ValueError("boom")
+
+    assert tracing.current() is None
+    assert [span.name for span in exporter.spans] == ["upstream", "action.redact", "request"]
+    assert all(span.trace_id == TRACE_ID for span in exporter.spans)
+    assert root.parent_id == PARENT_ID
+    assert [span.parent_id for span in exporter.spans[:2]] == [root.span_id, root.span_id]
+    assert exporter.spans[0].attributes == {"host": "example.com"}
+    assert exporter.spans[1].error == "ValueError: boom"
+
+
+def test_timing_phases_are_traced():
+    exporter = tracing.InMemoryExporter()
+
+    with tracing.Tracer(exporter).trace("request"), timing.record(), timing.phase("parse"):
+        pass
+
+    assert [span.name for span in exporter.spans] == ["parse", "request"]
+
+
+@pytest.mark.parametrize(
+    ("exporter", "sample_rate", "traceparent", "sampled"),
+    [
+        (None, 1.0, f"00-{TRACE_ID}-{PARENT_ID}-01", False),
+        (tracing.InMemoryExporter(), 0.0, None, False),
+        (tracing.InMemoryExporter(), 0.0, f"00-{TRACE_ID}-{PARENT_ID}-01", True),
+        (tracing.InMemoryExporter(), 1.0, f"00-{TRACE_ID}-{PARENT_ID}-00", False),
+        (tracing.InMemoryExporter(), 1.0, "garbage", True),
+    ],
+)
+def test_sampling(exporter, sample_rate, traceparent, sampled):
+    with tracing.Tracer(exporter, sample_rate).trace("request", traceparent) as root, tracing.span("child") as child:
+        pass
+
+    assert (root is not None) == (child is not None) == sampled
+
+
+def test_file_exporter_writes_json_lines(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = tracing.Tracer(tracing.make_exporter("file", str(path)))
+
+    with tracer.trace("request"), tracing.span("upstream"):
+        pass
+    tracer.shutdown()
+
+    spans = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [span["name"] for span in spans] == ["upstream", "request"]
+    assert spans[0]["parent_id"] == spans[1]["span_id"]
+    assert spans[0]["duration_ms"] >= 0
+
+
+def test_failing_exporter_does_not_fail_the_request():
+    exporter = tracing.InMemoryExporter()
+
+    with patch.object(exporter, "export", side_effect=OSError("disk full")), tracing.Tracer(exporter).trace("request"):
+        pass
@@ -0,0 +1,191 @@
+import asyncio
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from guardette import Guardette
+from guardette.config import ConfigManager
+from guardette.exceptions import ConfigurationException
+from guardette.policy import Source
+from guardette.upstream import UpstreamPool
+
+
+def make_source(retry=None, **pool):
+    return Source.model_validate({"host": "api.example.com", "pool": pool, "retry": retry or {}, "rules": []})
+
+
+@pytest.mark.anyio
+async def test_upstream_pool_reuses_client_per_host():
+    upstreams = UpstreamPool(ConfigManager())
+    source = make_source()
+
+    client = upstreams.client(source)
+
+    assert upstreams.client(source) is client
+    assert upstreams.client(Source(host="other.example.com", rules=[])) is not client
+
+    await upstreams.aclose()
+    assert client.is_closed
+
+
+@pytest.mark.anyio
+async def test_upstream_pool_applies_source_pool_limits():
+    upstreams = UpstreamPool(ConfigManager())
+
+    client = upstreams.client(make_source(max_connections=7, max_keepalive_connections=3, keepalive_expiry_secs=9))
+
+    pool = client._transport._pool
+    assert pool._max_connections == 7
+    assert pool._max_keepalive_connections == 3
+    assert pool._keepalive_expiry == 9
+    await upstreams.aclose()
+
+
+def test_upstream_pool_reports_missing_http2_dependency():
+    upstreams = UpstreamPool(ConfigManager())
+
+    with (
+        patch("httpx.AsyncClient.__init__", side_effect=ImportError("h2")),
+        pytest.raises(ConfigurationException, match="`h2` package"),
+    ):
+        upstreams.client(make_source(http2=True))
+
+
+@pytest.mark.anyio
+async def test_retired_clients_are_replaced_and_closed_once_their_requests_had_time_to_finish():
+    config = ConfigManager()
+    config.PROXY_CLIENT_TIMEOUT_SECS = 0.01
+    upstreams = UpstreamPool(config)
+    retired = upstreams.client(make_source())
+
+    upstreams.retire("api.example.com")
+    replacement = upstreams.client(make_source(max_connections=1))
+
+    assert replacement is not retired
+    assert not retired.is_closed
+    await asyncio.sleep(0.05)
+    assert retired.is_closed
+    await upstreams.aclose()
+
+
+@pytest.mark.anyio
+async def test_reopened_sources_replace_retired_schedulers_for_requests_still_in_flight():
+    upstreams = UpstreamPool(ConfigManager())
+    old_source = make_source()
+    upstreams.open([old_source])
+    new_source = Source.model_validate(
+        {"host": "api.example.com", "rate_limit": {"requests_per_second": 5}, "rules": []}
+    )
+
+    upstreams.retire("api.example.com")
+    upstreams.open([new_source])
+
+    # A request that matched the old source before the reload gets the new settings.
+    assert upstreams.scheduler(old_source).rate_limit.requests_per_second == 5
+    assert upstreams.client(old_source) is upstreams.client(new_source)
+    await upstreams.aclose()
+
+
+def test_upstream_pool_follows_app_lifecycle():
+    guardette = Guardette(policy_path="tests/test_policy.yml")
+    app = FastAPI()
+    guardette.to_fastapi(app)
+
+    with TestClient(app):
+        clients = dict(guardette.upstreams._clients)
+        assert set(clients) == {source.host for source in guardette.policy.sources}
+
+    assert guardette.upstreams._clients == {}
+    assert all(client.is_closed for client in clients.values())
+
+
+@pytest.mark.anyio
+async def test_upstream_pool_send_reports_rate_limits_to_the_scheduler():
+    upstreams = UpstreamPool(ConfigManager())
+    source = make_source()
+    upstream_response = httpx.Response(status_code=429, headers={"retry-after": "120"})
+
+    with patch("httpx.AsyncClient.send", return_value=upstream_response):
+        response = await upstreams.send(source, httpx.Request("GET", "https://api.example.com/"))
+
+    assert response is upstream_response
+    assert upstreams.stats()["api.example.com"]["paused_for_secs"] > 100
+    await upstreams.aclose()
+
+
+def upstream_responses(*outcomes):
+    outcomes = iter(outcomes)
+
+    async def send(*args, **kwargs):
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return httpx.Response(status_code=outcome)
+
+    return send
+
+
+@pytest.mark.anyio
+async def test_upstream_pool_retries_idempotent_requests():
+    upstreams = UpstreamPool(ConfigManager())
+    source = make_source(retry={"max_attempts": 3, "backoff_secs": 0})
+
+    with patch("httpx.AsyncClient.send", side_effect=upstream_responses(httpx.ConnectError("reset"), 503, 200)):
+        response = await upstreams.send(source, httpx.Request("GET", "https://api.example.com/"))
+
+    assert response.status_code == 200
+    assert upstreams.stats()["api.example.com"]["retries"] == 2
+    await upstreams.aclose()
+
+
+@pytest.mark.anyio
+async def test_upstream_pool_returns_last_response_when_retries_are_exhausted():
+    upstreams = UpstreamPool(ConfigManager())
+    source = make_source(retry={"max_attempts": 2, "backoff_secs": 0})
+
+    with patch("httpx.AsyncClient.send", side_effect=upstream_responses(502, 504)):
+        response = await upstreams.send(source, httpx.Request("GET", "https://api.example.com/"))
+
+    assert response.status_code == 504
+    await upstreams.aclose()
+
+
+@pytest.mark.anyio
+async def test_upstream_pool_does_not_retry_non_idempotent_requests():
+    upstreams = UpstreamPool(ConfigManager())
+    source = make_source(retry={"max_attempts": 3, "backoff_secs": 0})
+
+    with (
+        patch("httpx.AsyncClient.send", side_effect=upstream_responses(httpx.ConnectError("reset"), 200)),
+        pytest.raises(httpx.ConnectError),
+    ):
+        await upstreams.send(source, httpx.Request("POST", "https://api.example.com/"))
+    await upstreams.aclose()
+
+
+@pytest.mark.anyio
+async def test_upstream_pool_hedges_slow_requests():
+    upstreams = UpstreamPool(ConfigManager())
+    source = make_source(retry={"hedge": True, "hedge_min_delay_secs": 0.01})
+    calls = 0
+
+    async def send(*args, **kwargs):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0 if calls != 21 else 10)
+        return httpx.Response(status_code=200)
+
+    with patch("httpx.AsyncClient.send", side_effect=send):
+        for _ in range(20):
+            await upstreams.send(source, httpx.Request("GET", "https://api.example.com/"))
+        response = await asyncio.wait_for(upstreams.send(source, httpx.Request("GET", "https://api.example.com/")), 1)
+
+    assert response.status_code == 200
+    assert calls == 22
+    stats = upstreams.stats()["api.example.com"]
+    assert stats["hedges"] == 1
+    assert stats["hedge_wins"] == 1
+    await upstreams.aclose()